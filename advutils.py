@@ -1,9 +1,273 @@
 __author__ = 'Sergio Sykes'
 __version__ = 'Fall 2015'
 
+import maya.OpenMaya as om
 import pymel.core as pmc
 
 ROO_XYZ, ROO_YZX, ROO_ZXY, ROO_XZY, ROO_YXZ, ROO_ZYX = range(6)
+NODE_STATE_NORMAL, NODE_STATE_HAS_NO_EFFECT, NODE_STATE_BLOCKING = range(3)
+
+_activeNodeCache = None
+_activeTransformPlan = None
+
+
+class NodeCache(object):
+    """
+    Build-scoped cache of PyNode and Attribute wrappers.
+    Nodes are matched on their MObjectHandle, so the same wrapper comes back for a node no matter
+    which name it was looked up by, and renaming a node doesn't invalidate its entry.
+    Entries for deleted nodes are dropped when a lookup runs into them, or all at once with purge().
+    Attribute wrappers live as long as their node's entry, attributes deleted during a build aren't noticed
+
+    Usage:
+        with NodeCache() as cache:
+            RiggingLeg(...)
+            RiggingArm(...)
+        print cache.hits, cache.misses
+    """
+
+    def __init__(self):
+        self._entries = dict()  # handle key -> list of [MObjectHandle, PyNode, {attrName: Attribute}]
+        self._names = dict()  # looked up name -> entry
+        self._paths = dict()  # full path or name a node was last registered under -> entry
+        self._previousCache = None
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        global _activeNodeCache
+
+        self._previousCache = _activeNodeCache
+        _activeNodeCache = self
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        global _activeNodeCache
+
+        _activeNodeCache = self._previousCache
+        self._previousCache = None
+        self.clear()
+
+    @staticmethod
+    def _handleKey(handle):
+        try:
+            return handle.hashCode()
+        except AttributeError:
+            # MObjectHandle.hashCode() isn't wrapped in older versions of maya, bucket by api type instead
+            return handle.object().apiType()
+
+    @staticmethod
+    def _pathKey(mobj):
+        if mobj.hasFn(om.MFn.kDagNode):
+            return om.MFnDagNode(mobj).fullPathName()
+        return om.MFnDependencyNode(mobj).name()
+
+    @staticmethod
+    def _isAlive(entry):
+        return entry[0].isValid() and entry[0].isAlive()
+
+    def _register(self, pynode):
+        """
+        Returns the entry for pynode and whether it was just created
+        """
+        mobj = pynode.__apimobject__()
+        path = self._pathKey(mobj)
+
+        # the current path finds the entry directly, until the node is renamed or reparented
+        entry = self._paths.get(path)
+        if entry is not None and self._isAlive(entry) and entry[0].object() == mobj:
+            return entry, False
+
+        handle = om.MObjectHandle(mobj)
+        bucket = self._entries.setdefault(self._handleKey(handle), list())
+        bucket[:] = [entry for entry in bucket if self._isAlive(entry)]
+
+        # the handles are what identify a node, a renamed one is found here and keeps its wrapper
+        for entry in bucket:
+            if entry[0].object() == mobj:
+                self._paths[path] = entry
+                return entry, False
+
+        entry = [handle, pynode, dict()]
+        bucket.append(entry)
+        self._paths[path] = entry
+        return entry, True
+
+    def _count(self, created):
+        if created:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def _entry(self, node):
+        if isinstance(node, pmc.PyNode):
+            entry, created = self._register(node)
+            self._count(created)
+            return entry
+
+        name = str(node)
+        entry = self._names.get(name)
+
+        # cached names are only trusted while the node is alive and still goes by that name
+        if entry is not None:
+            if self._isAlive(entry) and entry[1].name() == name:
+                self.hits += 1
+                return entry
+            del self._names[name]
+
+        entry, created = self._register(pmc.PyNode(name))
+        self._count(created)
+        self._names[name] = entry
+        return entry
+
+    def node(self, node):
+        """
+        Returns the cached PyNode for node, which can be a name or an existing PyNode
+        """
+
+        return self._entry(node)[1]
+
+    def attribute(self, node, attr):
+        """
+        Returns the cached Attribute for node.attr
+        """
+
+        entry = self._entry(node)
+        result = entry[2].get(attr)
+        if result is None:
+            result = pmc.Attribute('{0:s}.{1:s}'.format(entry[1], attr))
+            entry[2][attr] = result
+
+        return result
+
+    def purge(self):
+        """
+        Drops entries for nodes that no longer exist. Returns the number of entries dropped
+        """
+
+        dropped = 0
+        for key, bucket in self._entries.items():
+            alive = [entry for entry in bucket if self._isAlive(entry)]
+            dropped += len(bucket) - len(alive)
+
+            if alive:
+                self._entries[key] = alive
+            else:
+                del self._entries[key]
+
+        for lookup in self._names, self._paths:
+            for name, entry in lookup.items():
+                if not self._isAlive(entry):
+                    del lookup[name]
+
+        return dropped
+
+    def clear(self):
+        self._entries.clear()
+        self._names.clear()
+        self._paths.clear()
+
+
+class TransformPlan(object):
+    """
+    Build-scoped record of the world transforms alignObjects reads from its joint targets.
+    While a plan is active, joints already in it are not queried again, new ones are queried and added.
+    Other targets are always queried, they aren't mirrored with joint behavior
+    mirrored() returns the plan of the opposite side, so a mirrored build can align without querying the scene.
+    Every alignment to a joint goes through the plan, makeDuplicateJoints included, so the mirror side's own
+    joints are never read: its skeleton has to be the first side's mirrored with behavior
+
+    Usage:
+        with TransformPlan() as plan:
+            RiggingLeg(name='left_leg', ...)
+        with plan.mirrored(lambda name: name.replace('left_', 'right_', 1)):
+            RiggingLeg(name='right_leg', ...)
+    """
+
+    def __init__(self, transforms=None):
+        self.transforms = dict(transforms or {})  # (target name, viaRotatePivot) -> (position, rotation, rotateOrder)
+        self._previousPlan = None
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        global _activeTransformPlan
+
+        self._previousPlan = _activeTransformPlan
+        _activeTransformPlan = self
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        global _activeTransformPlan
+
+        _activeTransformPlan = self._previousPlan
+        self._previousPlan = None
+
+    def lookup(self, target, viaRotatePivot):
+        entry = self.transforms.get((str(target), viaRotatePivot))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def record(self, target, viaRotatePivot, position, rotation, rotateOrder):
+        self.transforms[(str(target), viaRotatePivot)] = (list(position), list(rotation), rotateOrder)
+
+    def mirrored(self, rename):
+        """
+        Returns a new plan with every transform mirrored across the YZ plane, joint behavior style
+        (all three axes flipped so rotating both sides the same way mirrors the motion), under rename(target)
+        """
+        import numpy as np
+
+        import npmath
+
+        keys = list(self.transforms)
+        if not keys:
+            return TransformPlan()
+
+        positions = [list(self.transforms[key][0]) for key in keys]
+        rotations = [list(self.transforms[key][1]) for key in keys]
+        orders = [self.transforms[key][2] for key in keys]
+
+        mirroredPositions = np.array(positions) * (-1.0, 1.0, 1.0)
+        mirroredRotations = np.zeros((len(keys), 3))
+        for order in set(orders):
+            rows = [i for i, o in enumerate(orders) if o == order]
+            matrices = npmath.matricesFromEuler(np.array(rotations)[rows], order)
+            # reflect each axis across YZ, then flip all three to keep a right handed frame
+            matrices[:, :, 1:] *= -1.0
+            mirroredRotations[rows] = npmath.eulerFromMatrices(matrices, order)
+
+        return TransformPlan(dict(((rename(key[0]), key[1]), (position, rotation, order)) for key, position, rotation,
+                                  order in zip(keys, mirroredPositions.tolist(), mirroredRotations.tolist(), orders)))
+
+
+def cachedNode(node):
+    """
+    Returns PyNode for node, reusing the wrapper from the active NodeCache if there is one
+    """
+
+    if _activeNodeCache is None:
+        return pmc.PyNode(node)
+
+    return _activeNodeCache.node(node)
+
+
+def cachedAttribute(attribute):
+    """
+    Returns Attribute for a 'node.attr' string, reusing the wrapper from the active NodeCache if there is one
+    """
+
+    if isinstance(attribute, pmc.Attribute):
+        return attribute
+
+    if _activeNodeCache is None:
+        return pmc.Attribute(attribute)
+
+    node, attr = str(attribute).split('.', 1)
+    return _activeNodeCache.attribute(node, attr)
 
 
 def getAttribute(node, attr, **kwargs):
@@ -16,14 +280,48 @@ def getAttribute(node, attr, **kwargs):
     if not pmc.attributeQuery(attr, node=node, exists=True):
         pmc.addAttr(node, ln=attr, **kwargs)
 
+    if _activeNodeCache is not None:
+        return _activeNodeCache.attribute(node, attr)
+
     return pmc.Attribute('{0:s}.{1:s}'.format(node, attr))
 
 
-def alignObjects(sources, target, position=True, rotation=True, rotateOrder=False, viaRotatePivot=False):
+def _flattenValue(value):
+    if hasattr(value, 'tolist'):
+        value = value.tolist()
+
+    if isinstance(value, (bool, int, long, float)):
+        return [value]
+
+    return [item for entry in value for item in _flattenValue(entry)]
+
+
+def batchSetAttr(plugValues):
     """
-    Aligns list of sources to match target
-    If target has a different rotation order,
-    sources rotation order will be set to that of the target
+    Sets many plugs with a single mel call, one command and one undo instead of one setAttr per plug
+    plugValues is a list of (plug, value) pairs. value can be a number, a sequence of numbers
+    or a 4x4 matrix (pymel Matrix, nested lists or numpy array)
+    """
+
+    lines = list()
+    for plug, value in plugValues:
+        values = _flattenValue(value)
+        valueText = ' '.join(repr(float(v)) for v in values)
+
+        if len(values) == 16:
+            lines.append('setAttr "{0}" -type "matrix" {1};'.format(plug, valueText))
+        else:
+            lines.append('setAttr "{0}" {1};'.format(plug, valueText))
+
+    if lines:
+        pmc.mel.eval('\n'.join(lines))
+
+    return len(lines)
+
+
+def _queryTransform(target, viaRotatePivot, rotation):
+    """
+    Returns the world position, world rotation and rotate order alignObjects aligns to
     """
 
     rotateOrderXYZ = pmc.getAttr(target + '.rotateOrder')
@@ -45,6 +343,26 @@ def alignObjects(sources, target, position=True, rotation=True, rotateOrder=Fals
     else:
         targetRot = pmc.xform(target, q=True, worldSpace=True, rotation=True)
 
+    return targetPos, targetRot, rotateOrderXYZ
+
+
+def alignObjects(sources, target, position=True, rotation=True, rotateOrder=False, viaRotatePivot=False):
+    """
+    Aligns list of sources to match target
+    If target has a different rotation order,
+    sources rotation order will be set to that of the target
+    """
+
+    entry = _activeTransformPlan.lookup(target, viaRotatePivot) if _activeTransformPlan is not None else None
+    if entry is not None:
+        targetPos, targetRot, rotateOrderXYZ = entry
+    else:
+        targetPos, targetRot, rotateOrderXYZ = _queryTransform(target, viaRotatePivot, rotation)
+        # only joints are recorded: the plan mirrors with joint behavior, which is wrong for world aligned
+        # targets like ik controls, those get queried on the mirrored side instead
+        if _activeTransformPlan is not None and rotation and isinstance(cachedNode(target), pmc.nodetypes.Joint):
+            _activeTransformPlan.record(target, viaRotatePivot, targetPos, targetRot, rotateOrderXYZ)
+
     if isinstance(sources, (str, pmc.PyNode)):
         sources = [sources]
 
@@ -73,7 +391,7 @@ def makeControlNode(name, targetObject=None, alignRotation=True):
 
 
 def zeroOut(node, prefix='pre'):
-    node = pmc.PyNode(node)
+    node = cachedNode(node)
     preTransform = pmc.createNode('transform', n='{0}_{1}'.format(prefix, node))
     alignObjects([preTransform, ], node)
 
@@ -4,16 +4,96 @@
 Example code for a modular rigging system. This code was tested in the creation of goldie and daniel
 """
 
+import maya.OpenMaya as om
+import numpy as np
 import pymel.core as pmc
 
-from advutils import getAttribute, alignObjects, makeControlNode, ROO_XZY, ROO_YXZ
+from advutils import getAttribute, alignObjects, makeControlNode, ROO_XZY, ROO_YXZ, NODE_STATE_NORMAL, \
+    NODE_STATE_HAS_NO_EFFECT, TransformPlan
 
+# Level of detail for rig modules: full hero rig, ik/fk without extras, fk only with no duplicate joint chains
+LOD_FULL, LOD_LIGHT, LOD_FK = range(3)
+
+# name prefixes swapped by mirrorBuild
+MIRROR_SIDES = ('left_', 'right_')
+
+_activeNodeTracker = None
+
+
+class NodeTracker(object):
+    """
+    Build-scoped tracking of the nodes Rigging modules create, for createdNodes() and nodeCounts().
+    A single node added callback is registered for the block and removed when it exits, even if a build fails.
+    Modules built outside a tracker don't track their nodes
+
+    Usage:
+        with NodeTracker():
+            leftLeg = RiggingLeg(...)
+        print leftLeg.nodeCounts()
+    """
+
+    def __init__(self):
+        self._module = None
+        self._callback = None
+        self._previousTracker = None
+
+    def __enter__(self):
+        global _activeNodeTracker
+
+        self._previousTracker = _activeNodeTracker
+        _activeNodeTracker = self
+        self._callback = om.MDGMessage.addNodeAddedCallback(self._trackNode)
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        global _activeNodeTracker
+
+        om.MMessage.removeCallback(self._callback)
+        self._callback = None
+        self._module = None
+
+        _activeNodeTracker = self._previousTracker
+        self._previousTracker = None
+
+    def _trackNode(self, node, clientData):
+        if self._module is not None:
+            self._module._createdNodes.append(om.MObjectHandle(node))
+
+    def start(self, module):
+        self._module = module
+
+    def stop(self, module):
+        if self._module is module:
+            self._module = None
+
+
+def makePoleVectorLine(startObj, endObj, parent=None, useClusters=True):
+    """
+    Creates a guide line between startObj and endObj
+    If useClusters is False, each control point of the curve shape is driven straight from a
+    decomposeMatrix on the object's worldMatrix, no clusters, constraints or extra transforms
+    """
 
-def makePoleVectorLine(startObj, endObj, parent=None):
     curve = pmc.curve(degree=1, point=[(0, 0, 0), (0, 0, 1)], knot=range(2),
                        name='spl_{0}To{1}_poleLine'.format(startObj, endObj))
 
     curveShape = pmc.listRelatives(curve, s=True, f=True)[0]
+
+    pmc.setAttr(curve + '.inheritsTransform', 0)
+    pmc.setAttr(curveShape + '.overrideEnabled', 1)
+    pmc.setAttr(curveShape + '.overrideDisplayType', 1)
+
+    if not useClusters:
+        for i, obj, suffix in (0, startObj, '_start'), (1, endObj, '_end'):
+            pointNode = pmc.createNode('decomposeMatrix', name=curve.replace('spl_', 'dcm_', 1) + suffix)
+            pmc.connectAttr(obj + '.worldMatrix[0]', pointNode + '.inputMatrix')
+            pmc.connectAttr(pointNode + '.outputTranslate', '{0}.controlPoints[{1:d}]'.format(curveShape, i))
+
+        if parent:
+            pmc.parent(curve, parent)
+
+        return curve
+
     startClu = pmc.cluster(curveShape + '.cv[0]', relative=True,
                             name=curve.replace('spl_', 'clu_', 1) + '_start')[1]
     endClu = pmc.cluster(curveShape + '.cv[1]', relative=True,
@@ -22,11 +102,9 @@ def makePoleVectorLine(startObj, endObj, parent=None):
     pmc.pointConstraint(startObj, startClu)
     pmc.pointConstraint(endObj, endClu)
 
-    for node in curve, startClu, endClu:
+    for node in startClu, endClu:
         pmc.setAttr(node + '.inheritsTransform', 0)
 
-    pmc.setAttr(curveShape + '.overrideEnabled', 1)
-    pmc.setAttr(curveShape + '.overrideDisplayType', 1)
     pmc.setAttr(startClu + '.visibility', 0)
     pmc.setAttr(endClu + '.visibility', 0)
 
@@ -36,9 +114,11 @@ def makePoleVectorLine(startObj, endObj, parent=None):
     return curve
 
 
-def makePoleVectorControlFromHandle(name, ikHandle, offset=10, parent=None):
+def makePoleVectorControlFromHandle(name, ikHandle, offset=10, parent=None, useClusters=True, guideLine=True):
     """
     Creates pole position using the poleVector attribute from the specified ikHandle
+    useClusters is passed on to makePoleVectorLine
+    If guideLine is False, no guide line is made and None is returned in its place
     """
     polePosition = [i * offset for i in pmc.getAttr(ikHandle + '.poleVector')]
 
@@ -52,10 +132,12 @@ def makePoleVectorControlFromHandle(name, ikHandle, offset=10, parent=None):
     # offset along pole vector (move relative)
     pmc.xform(preTransform, relative=True, objectSpace=True, translation=polePosition)
 
-    midJoint = pmc.ikHandle(ikHandle, q=True, jointList=True)
-    curve = makePoleVectorLine(midJoint[len(midJoint) / 2], ctrl, parent)
+    curve = None
+    if guideLine:
+        midJoint = pmc.ikHandle(ikHandle, q=True, jointList=True)
+        curve = makePoleVectorLine(midJoint[len(midJoint) / 2], ctrl, parent, useClusters)
 
-    pmc.connectAttr(ctrl + '.visibility', curve + '.visibility')
+        pmc.connectAttr(ctrl + '.visibility', curve + '.visibility')
 
     if parent:
         pmc.parent(preTransform, parent)
@@ -63,13 +145,151 @@ def makePoleVectorControlFromHandle(name, ikHandle, offset=10, parent=None):
     return ctrl, curve
 
 
+def migrateAnimation(sourceNamespace, targetNamespace, startFrame=None, endFrame=None, bakeJoints=True):
+    """
+    Moves animation between two LODs of the same character, referenced under different namespaces.
+    Animation curves on ctl_ controls are copied to the control of the same name in the target namespace.
+    If bakeJoints is True, target controls that drive a joint's rotation directly (LOD_FK rigs) and have no
+    animated counterpart get keyed every frame from the rotation of the matching source joint, which
+    carries over ik animation
+    Returns a dictionary with the 'copied', 'baked' and 'missing' control names
+    """
+
+    if startFrame is None:
+        startFrame = pmc.playbackOptions(q=True, minTime=True)
+    if endFrame is None:
+        endFrame = pmc.playbackOptions(q=True, maxTime=True)
+
+    sourcePrefix = sourceNamespace.rstrip(':') + ':' if sourceNamespace else ''
+    targetPrefix = targetNamespace.rstrip(':') + ':' if targetNamespace else ''
+
+    result = {'copied': list(), 'baked': list(), 'missing': list()}
+    for source in pmc.ls(sourcePrefix + 'ctl_*', type='transform'):
+        if not pmc.keyframe(source, q=True, keyframeCount=True):
+            continue
+
+        target = targetPrefix + source.stripNamespace()
+        if not pmc.objExists(target):
+            result['missing'].append(source.stripNamespace())
+            continue
+
+        for attr in pmc.listAttr(source, keyable=True):
+            if pmc.keyframe(source.attr(attr), q=True, keyframeCount=True) and \
+                    pmc.attributeQuery(attr, node=target, exists=True) and pmc.getAttr(target + '.' + attr, settable=True):
+                pmc.copyKey(source, attribute=attr)
+                pmc.pasteKey(target, attribute=attr, option='replace')
+
+        result['copied'].append(target)
+
+    if not bakeJoints:
+        return result
+
+    # pairs of (target control, source joint) for direct connected controls left without animation
+    bakePairs = list()
+    for target in pmc.ls(targetPrefix + 'ctl_*', type='transform'):
+        if target.name() in result['copied']:
+            continue
+
+        joints = pmc.listConnections(target.rotate, source=False, destination=True, type='joint')
+        if joints and pmc.objExists(sourcePrefix + joints[0].stripNamespace()):
+            bakePairs.append((target, pmc.PyNode(sourcePrefix + joints[0].stripNamespace())))
+
+    if not bakePairs:
+        return result
+
+    currentTime = pmc.currentTime(q=True)
+    for frame in xrange(int(startFrame), int(endFrame) + 1):
+        pmc.currentTime(frame, update=True)
+        for target, joint in bakePairs:
+            target.rotate.set(joint.rotate.get())
+            pmc.setKeyframe(target, attribute='rotate', time=frame)
+    pmc.currentTime(currentTime)
+
+    result['baked'] = [target.name() for target, joint in bakePairs]
+    return result
+
+
+def mirrorName(name, sides=MIRROR_SIDES):
+    """
+    Swaps the first side prefix found in name for the other one: rig_left_arm_elbow -> rig_right_arm_elbow
+    """
+
+    if name is None:
+        return None
+
+    name = str(name)
+    for side, other in (sides, sides[::-1]):
+        if side in name:
+            return name.replace(side, other, 1)
+
+    return name
+
+
+def mirrorArguments(kwargs, sides=MIRROR_SIDES):
+    """
+    Returns the keyword arguments of a module for the opposite side: names, joints and parent are swapped,
+    noFlipVector is mirrored across X and reverseStretch is flipped
+    """
+
+    mirrored = dict(kwargs)
+    for key in ('name', 'parent', 'spline'):
+        if key in mirrored:
+            mirrored[key] = mirrorName(mirrored[key], sides)
+
+    if 'joints' in mirrored:
+        mirrored['joints'] = [mirrorName(jnt, sides) for jnt in mirrored['joints']]
+
+    if mirrored.get('noFlipVector') is not None:
+        x, y, z = mirrored['noFlipVector']
+        mirrored['noFlipVector'] = (-x, y, z)
+
+    if 'reverseStretch' in mirrored:
+        mirrored['reverseStretch'] = not mirrored.get('reverseStretch', False)
+
+    return mirrored
+
+
+def mirrorBuild(moduleClass, sides=MIRROR_SIDES, **kwargs):
+    """
+    Builds moduleClass with kwargs, then the module for the opposite side with mirrorArguments(kwargs).
+    The mirror side aligns to its joints from the first side's joint transforms mirrored across the YZ plane,
+    duplicated ik/fk joints included, its own joints are never read. So the skeleton must be symmetrical
+    (joints mirrored with behavior). Other targets are queried as usual
+    Returns both modules
+    """
+
+    with TransformPlan() as plan:
+        module = moduleClass(**kwargs)
+
+    if issubclass(moduleClass, RiggingFingers):
+        kwargs.setdefault('reverseStretch', False)
+
+    with plan.mirrored(lambda name: mirrorName(name, sides)):
+        mirrored = moduleClass(**mirrorArguments(kwargs, sides))
+
+    return module, mirrored
+
+
 class Rigging(object):
-    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None):
+    POLE_LINE_USE_CLUSTERS = True  # set False for clusterless pole vector guide lines
+
+    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None, lod=LOD_FULL):
+        """
+        lod - LOD_FULL, LOD_LIGHT or LOD_FK. Built inside a NodeTracker, every node created until finishBuild()
+        is tracked for nodeCounts()
+        """
+        self._createdNodes = list()
+        if _activeNodeTracker is not None:
+            _activeNodeTracker.start(self)
+
         self._name = name
+        self._lod = lod
         self._joints = joints
         self._switchboard = switchboard
         self._mainControl = mainControl
         self._rigControls = dict()
+        self._ikBranchNodes = list()
+        self._fkBranchNodes = list()
         self.lockAttrs = list()
         self.transform = pmc.group(empty=True, name='grp_{0}_rig'.format(self._name))
 
@@ -88,12 +308,93 @@ class Rigging(object):
             pmc.setAttr(visAttr, edit=True, channelBox=True)
             pmc.connectAttr(visAttr, self.transform + '.v')
 
+    def finishBuild(self):
+        """
+        Locks and hides the rig attributes and stops tracking created nodes
+        """
+        self.lockAndHide(True)
+
+        if _activeNodeTracker is not None:
+            _activeNodeTracker.stop(self)
+
+    def name(self):
+        return self._name
+
+    def joints(self):
+        return list(self._joints)
+
+    def controls(self):
+        """
+        Returns the module's controls, each once
+        """
+        controls = list()
+        for control in self._rigControls.values():
+            if control not in controls:
+                controls.append(control)
+
+        return controls
+
+    def createdNodes(self):
+        """
+        Returns the nodes this module created that still exist, empty unless it was built inside a NodeTracker
+        """
+        return [pmc.PyNode(handle.object()) for handle in self._createdNodes if handle.isValid()]
+
+    def nodeCounts(self):
+        """
+        Returns a dictionary of node type to number of nodes this module created that still exist,
+        with the overall number under 'total'
+        """
+        counts = {'total': 0}
+        for handle in self._createdNodes:
+            if not handle.isValid():
+                continue
+
+            nodeType = om.MFnDependencyNode(handle.object()).typeName()
+            counts[nodeType] = counts.get(nodeType, 0) + 1
+            counts['total'] += 1
+
+        return counts
+
     def lockAndHide(self, lock):
         for at in self.lockAttrs:
             pmc.setAttr(at, lock=lock)
             pmc.setAttr(at, keyable=not lock)
             pmc.setAttr(at, channelBox=not lock)
 
+    def makeFkOnlyRig(self, joints):
+        """
+        LOD_FK rig. Controls drive joints' rotation directly, no duplicate joint chains or ik/fk switch.
+        Controls are named after the joints with rig_ replaced by ctl_fk_. That matches the full rig's fk controls
+        except the spine root, which is ctl_spine0 in the full rig and ctl_fk_spine0 here, so migrateAnimation
+        doesn't copy its curves and only carries it over by baking the joint (bakeJoints=True)
+        Returns the top pre transform
+        """
+
+        preTransforms = list()
+        for i, jnt in enumerate(joints):
+            self._rigControls[jnt], preTransform = makeControlNode(name=jnt.replace('rig_', 'ctl_fk_', 1),
+                                                                   targetObject=jnt)
+
+            pmc.connectAttr(self._rigControls[jnt] + '.rotate', jnt + '.rotate')
+
+            if preTransforms:
+                pmc.parent(preTransform, self._rigControls[joints[i - 1]])
+
+            self.lockAttrs.append(self._rigControls[jnt] + '.translateX')
+            self.lockAttrs.append(self._rigControls[jnt] + '.translateY')
+            self.lockAttrs.append(self._rigControls[jnt] + '.translateZ')
+            self.lockAttrs.append(self._rigControls[jnt] + '.scaleX')
+            self.lockAttrs.append(self._rigControls[jnt] + '.scaleY')
+            self.lockAttrs.append(self._rigControls[jnt] + '.scaleZ')
+            self.lockAttrs.append(self._rigControls[jnt] + '.visibility')
+
+            preTransforms.append(preTransform)
+
+        pmc.parentConstraint(self._parent, preTransforms[0], maintainOffset=True)
+
+        return preTransforms[0]
+
     def makeJointSystems(self, prefix, isolation=True, makeConstraints=True):
         joints = pmc.duplicate(self._joints, parentOnly=True, name='{0}_TEMP'.format(prefix))
         joints[0] = pmc.rename(joints[0], self._joints[0].replace('rig_', prefix + '_', 1))
@@ -172,51 +473,97 @@ class Rigging(object):
                     pmc.connectAttr(blendAttr, node + '.blender')
                     pmc.connectAttr(node + '.outputR', jnt + '.tx')
 
-    def makeOrientSwitchNodes(self, joint, preTransform, name=None):
+    def makeOrientSwitchNodes(self, joint, preTransform, name=None, defaultValue=1):
         """
-        Creates a orient constraint on the specified preTransform.
-        Switches between following the world and following the
-        self.parent of the current Rig Module. Joint specifies the which object to apply
-        the pointConstraint to the preTransform
+        Isolates the orientation of the specified preTransform. Switches between following the
+        self.parent of the current Rig Module (0) and following the world (1) on the switchboard's
+        name_isolation attribute. Joint specifies the which object to apply the pointConstraint to the preTransform
+        Each side is a multMatrix, offset * target worldMatrix, feeding the targetParentMatrix of a single
+        orientConstraint (shortest interpolation, so partial values slerp) instead of tgt_ groups
+        Below LOD_FULL, no switch is made and the preTransform is orient constrained to the default side
+        Returns the created utility nodes
         """
 
         if name is None:
             name = self._name
 
+        preTransform = pmc.PyNode(preTransform)
         pmc.pointConstraint(joint, preTransform)
 
-        parentTarget = pmc.group(empty=True, name='tgt_{0}_local'.format(name))
-        worldTarget = pmc.group(empty=True, name='tgt_{0}_world'.format(name))
-        alignObjects([parentTarget, worldTarget], preTransform)
+        if self._lod != LOD_FULL:
+            # no switch below LOD_FULL, preTransform follows the default side
+            target = self._mainControl if defaultValue else self._parent
+            return [pmc.orientConstraint(target, preTransform, maintainOffset=True)]
 
-        pmc.parentConstraint(self._parent, parentTarget, maintainOffset=True)
-        pmc.parentConstraint(self._mainControl, worldTarget, maintainOffset=True)
+        preMatrix = preTransform.getMatrix(worldSpace=True)
+        localMatrix = pmc.createNode('multMatrix', name='mmx_{0}_local'.format(name))
+        worldMatrix = pmc.createNode('multMatrix', name='mmx_{0}_world'.format(name))
 
-        constraint = pmc.orientConstraint(parentTarget, preTransform)
-        pmc.orientConstraint(worldTarget, preTransform)
-        pmc.setAttr(constraint + '.interpType', 2)  # shortest interpolation (less flipping)
+        for matrixNode, target in (localMatrix, self._parent), (worldMatrix, self._mainControl):
+            target = pmc.PyNode(target)
+            matrixNode.matrixIn[0].set(preMatrix * target.worldMatrix[0].get().inverse())
+            target.worldMatrix[0].connect(matrixNode.matrixIn[1])
 
         orientAttr = getAttribute(self._switchboard, name + '_isolation',
-                                  min=0, max=1, defaultValue=1, keyable=True)
+                                  min=0, max=1, defaultValue=defaultValue, keyable=True)
 
         revAttrNode = pmc.shadingNode('reverse', asUtility=True, name='rev_{0}_isolation'.format(name))
-
-        orientWeightList = pmc.orientConstraint(constraint, q=True, weightAliasList=True)
-        pmc.connectAttr(orientAttr, orientWeightList[1])
         pmc.connectAttr(orientAttr, revAttrNode + '.inputX')
-        pmc.connectAttr(revAttrNode + '.outputX', orientWeightList[0])
 
-        return [parentTarget, worldTarget]
+        # the matrices stand in for target transforms, the constraint slerps between them
+        constraint = pmc.createNode('orientConstraint', name='{0}_orientConstraint1'.format(preTransform.nodeName()),
+                                    parent=preTransform)
+        constraint.interpType.set(2)
+        localMatrix.matrixSum.connect(constraint.target[0].targetParentMatrix)
+        worldMatrix.matrixSum.connect(constraint.target[1].targetParentMatrix)
+        revAttrNode.outputX.connect(constraint.target[0].targetWeight)
+        pmc.connectAttr(orientAttr, constraint.target[1].targetWeight)
+
+        preTransform.parentInverseMatrix[0].connect(constraint.constraintParentInverseMatrix)
+        preTransform.rotateOrder.connect(constraint.constraintRotateOrder)
+        constraint.constraintRotate.connect(preTransform.rotate)
+
+        return [localMatrix, worldMatrix, revAttrNode, constraint]
 
     def makeNoFlipHelper(self, ikHandle, aimVector):
         helper = pmc.group(empty=True, name=ikHandle.replace('ikh_', 'hlp_ik_') + '_noflipper')
         startJoint = pmc.ikHandle(ikHandle, q=True, sj=True)
 
-        pmc.pointConstraint(startJoint, helper, maintainOffset=False)
-        pmc.aimConstraint(ikHandle, helper, aimVector=aimVector, upVector=aimVector, worldUpType='objectrotation',
-                           worldUpVector=(0, 1, 0), worldUpObject=self._mainControl)
+        self._ikBranchNodes.append(pmc.pointConstraint(startJoint, helper, maintainOffset=False))
+        self._ikBranchNodes.append(
+            pmc.aimConstraint(ikHandle, helper, aimVector=aimVector, upVector=aimVector, worldUpType='objectrotation',
+                              worldUpVector=(0, 1, 0), worldUpObject=self._mainControl))
         return helper
 
+    def makeEvaluationGate(self):
+        """
+        Stops the inactive branch from evaluating when the switch is fully IK (0) or fully FK (1).
+        IK handles in self._ikBranchNodes get their ikBlend turned off, every other node in
+        self._ikBranchNodes and self._fkBranchNodes gets its nodeState set to HasNoEffect.
+        Anywhere between 0 and 1 both branches evaluate as normal
+        Returns the ik and fk condition nodes
+        """
+
+        gates = list()
+        for branch, branchNodes, switchValue in ('ik', self._ikBranchNodes, 1), ('fk', self._fkBranchNodes, 0):
+            gateNode = pmc.createNode('condition', name='cnd_{0}_{1}_gate'.format(self._name, branch))
+            pmc.connectAttr(self._switchAttr, gateNode + '.firstTerm')
+            pmc.setAttr(gateNode + '.secondTerm', switchValue)
+
+            # outColorR drives nodeState, outColorG drives ikBlend
+            pmc.setAttr(gateNode + '.colorIfTrue', NODE_STATE_HAS_NO_EFFECT, 0, 0)
+            pmc.setAttr(gateNode + '.colorIfFalse', NODE_STATE_NORMAL, 1, 0)
+
+            for node in branchNodes:
+                if pmc.nodeType(node) == 'ikHandle':
+                    pmc.connectAttr(gateNode + '.outColorG', node + '.ikBlend')
+                else:
+                    pmc.connectAttr(gateNode + '.outColorR', node + '.nodeState')
+
+            gates.append(gateNode)
+
+        return gates
+
 
 class RiggingLeg(Rigging):
     BALL_ROLL_ATTR_NAME = 'heelRoll'
@@ -226,10 +573,21 @@ class RiggingLeg(Rigging):
     HEEL_PIVOT_ATTR_NAME = 'heelPivotX'
     FOOT_BANK_ATTR_NAME = 'footBank'
 
-    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None, noFlipVector=None):
-        super(RiggingLeg, self).__init__(name, joints, parent, mainControl, switchboard)
+    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None, noFlipVector=None,
+                 gateEvaluation=False, lod=LOD_FULL):
+        """
+        gateEvaluation - if True, the inactive ik or fk branch stops evaluating at fully ik or fully fk
+        lod - LOD_FULL, LOD_LIGHT (no foot roll, pole guide line or fk isolation) or LOD_FK (fk controls only)
+        """
+        super(RiggingLeg, self).__init__(name, joints, parent, mainControl, switchboard, lod)
 
         self._noflipvector = noFlipVector
+
+        if self._lod == LOD_FK:
+            pmc.parent(self.makeFkOnlyRig(self._joints[:-1]), self.transform)
+            self.finishBuild()
+            return
+
         getAttribute(self._switchboard, self._name + '_ikfk', min=0, max=1, defaultValue=0, keyable=True)
 
         self._switchAttr = '{0}.{1}_ikfk'.format(self._switchboard, self._name)
@@ -245,7 +603,10 @@ class RiggingLeg(Rigging):
 
         pmc.parent(fkrig, fkjointgrp, ikrig, ikjointgrp, self.transform)
 
-        self.lockAndHide(True)
+        if gateEvaluation:
+            self.makeEvaluationGate()
+
+        self.finishBuild()
 
     def makeFkRig(self):
         """
@@ -267,35 +628,10 @@ class RiggingLeg(Rigging):
         self._rigControls['fk_ball'], ballPreTransform = makeControlNode(name='ctl_fk_{0}_ball'.format(self._name),
                                                                          targetObject=jnts['ball'])
 
-        pmc.pointConstraint(jnts['hip'], hipPreTransform)
-
-        parentTarget = pmc.group(empty=True, name='tgt_fk_{0}_local'.format(self._name))
-        worldTarget = pmc.group(empty=True, name='tgt_fk_{0}_world'.format(self._name))
-        alignObjects([parentTarget, worldTarget], hipPreTransform)
-
-        pmc.parentConstraint(self._parent, parentTarget, maintainOffset=True)
-        pmc.parentConstraint(self._mainControl, worldTarget, maintainOffset=True)
-
-        constraint = pmc.orientConstraint(parentTarget, hipPreTransform)
-        pmc.orientConstraint(worldTarget, hipPreTransform)
-        pmc.setAttr(constraint + '.interpType', 2)  # shortest interpolation (less flipping)
-
-        orientAttr = getAttribute(self._switchboard, self._name + '_fk_isolation',
-                                  min=0, max=1, defaultValue=1, keyable=True)
-
-        revAttrNode = pmc.shadingNode('reverse', asUtility=True, name='rev_{0}_fk_isolation'.format(self._name))
-
-        orientWeightList = pmc.orientConstraint(constraint, q=True, weightAliasList=True)
-        pmc.connectAttr(orientAttr, orientWeightList[1])
-        pmc.connectAttr(orientAttr, revAttrNode + '.inputX')
-        pmc.connectAttr(revAttrNode + '.outputX', orientWeightList[0])
-
-        pmc.parent(parentTarget, worldTarget, mainGroup)
+        self.makeOrientSwitchNodes(jnts['hip'], hipPreTransform, name=self._name + '_fk')
 
-        pmc.orientConstraint(self._rigControls['fk_ball'], jnts['ball'])
-        pmc.orientConstraint(self._rigControls['fk_ankle'], jnts['ankle'])
-        pmc.orientConstraint(self._rigControls['fk_knee'], jnts['knee'])
-        pmc.orientConstraint(self._rigControls['fk_hip'], jnts['hip'])
+        for key in 'ball', 'ankle', 'knee', 'hip':
+            self._fkBranchNodes.append(pmc.orientConstraint(self._rigControls['fk_' + key], jnts[key]))
 
         pmc.parent(ballPreTransform, self._rigControls['fk_ankle'], absolute=True)
         pmc.parent(anklePreTransform, self._rigControls['fk_knee'], absolute=True)
@@ -364,11 +700,60 @@ class RiggingLeg(Rigging):
                                   n='ikh_{0}_toe'.format(self._name))[0]
 
         self._rigControls['ik_knee'], poleLine = makePoleVectorControlFromHandle('ctl_ik_{0}_pole'.format(self._name),
-                                                                                 legHandle, parent=mainGroup)
+                                                                                 legHandle, parent=mainGroup,
+                                                                                 useClusters=self.POLE_LINE_USE_CLUSTERS,
+                                                                                 guideLine=self._lod == LOD_FULL)
 
-        pmc.poleVectorConstraint(self._rigControls['ik_knee'], legHandle)
+        self._ikBranchNodes.extend([legHandle, ballHandle, toeHandle,
+                                    pmc.poleVectorConstraint(self._rigControls['ik_knee'], legHandle)])
         pmc.parent(legHandle, ballHandle, toeHandle, self._rigControls['ik_leg'])
 
+        if self._lod == LOD_FULL:
+            self.makeFootRollRig(jnts, legHandle, ballHandle, toeHandle)
+
+        # parent to a group aligned to ankle joint, that is constrained only to y orientation
+        kneeToFootHelper = pmc.group(empty=True, name='hlp_{0}_knee_to_foot'.format(self._name))
+
+        alignObjects([kneeToFootHelper, ], self._rigControls['ik_leg'])
+        self._ikBranchNodes.append(pmc.parentConstraint(self._rigControls['ik_leg'], kneeToFootHelper,
+                                                        skipRotate=['x', 'z'], maintainOffset=True))
+
+        noFlipHelper = self.makeNoFlipHelper(legHandle, self._noflipvector)
+        kneePolePreT = pmc.listRelatives(self._rigControls['ik_knee'], p=True)
+        pmc.parent(kneePolePreT, noFlipHelper)
+
+        poleTwistHelper = pmc.group(kneePolePreT, name='hlp_ik_{0}_poletwist'.format(self._name))
+        pmc.xform(poleTwistHelper, objectSpace=True, pivots=(0, 0, 0))
+        pmc.connectAttr(kneeToFootHelper + '.rotateY', poleTwistHelper + '.rotateY')
+
+        pmc.parent(noFlipHelper, kneeToFootHelper, legPreTransform, mainGroup)
+
+        revIkVis = pmc.shadingNode('reverse', asUtility=True, name='rev_{0}_ik_visibility'.format(self._name))
+
+        pmc.connectAttr(self._switchAttr, revIkVis + '.inputX')
+        pmc.connectAttr(revIkVis + '.outputX', self._rigControls['ik_leg'] + '.visibility')
+        pmc.connectAttr(revIkVis + '.outputX', self._rigControls['ik_knee'] + '.visibility')
+
+        self.lockAttrs.append(self._rigControls['ik_leg'] + '.scaleX')
+        self.lockAttrs.append(self._rigControls['ik_leg'] + '.scaleY')
+        self.lockAttrs.append(self._rigControls['ik_leg'] + '.scaleZ')
+        self.lockAttrs.append(self._rigControls['ik_leg'] + '.visibility')
+
+        self.lockAttrs.append(self._rigControls['ik_knee'] + '.rotateX')
+        self.lockAttrs.append(self._rigControls['ik_knee'] + '.rotateY')
+        self.lockAttrs.append(self._rigControls['ik_knee'] + '.rotateZ')
+        self.lockAttrs.append(self._rigControls['ik_knee'] + '.scaleX')
+        self.lockAttrs.append(self._rigControls['ik_knee'] + '.scaleY')
+        self.lockAttrs.append(self._rigControls['ik_knee'] + '.scaleZ')
+        self.lockAttrs.append(self._rigControls['ik_knee'] + '.visibility')
+
+        return mainGroup
+
+    def makeFootRollRig(self, jnts, legHandle, ballHandle, toeHandle):
+        """
+        Reverse foot hierarchy and foot roll attributes on the ik leg control, LOD_FULL only
+        """
+
         # setup reverse foot nodes
         self._rigControls['ik_toe'], toePreTransform = makeControlNode(name='ctl_ik_{0}_toeRoll'.format(self._name),
                                                                        targetObject=jnts['ball'])
@@ -475,41 +860,6 @@ class RiggingLeg(Rigging):
         pmc.parent(ballHandle, toeRollNode)
         pmc.parent(legHandle, ballRollNode)
 
-        # parent to a group aligned to ankle joint, that is constrained only to y orientation
-        kneeToFootHelper = pmc.group(empty=True, name='hlp_{0}_knee_to_foot'.format(self._name))
-
-        alignObjects([kneeToFootHelper, ], self._rigControls['ik_leg'])
-        pmc.parentConstraint(self._rigControls['ik_leg'], kneeToFootHelper, skipRotate=['x', 'z'], maintainOffset=True)
-
-        noFlipHelper = self.makeNoFlipHelper(legHandle, self._noflipvector)
-        kneePolePreT = pmc.listRelatives(self._rigControls['ik_knee'], p=True)
-        pmc.parent(kneePolePreT, noFlipHelper)
-
-        poleTwistHelper = pmc.group(kneePolePreT, name='hlp_ik_{0}_poletwist'.format(self._name))
-        pmc.xform(poleTwistHelper, objectSpace=True, pivots=(0, 0, 0))
-        pmc.connectAttr(kneeToFootHelper + '.rotateY', poleTwistHelper + '.rotateY')
-
-        pmc.parent(noFlipHelper, kneeToFootHelper, legPreTransform, mainGroup)
-
-        revIkVis = pmc.shadingNode('reverse', asUtility=True, name='rev_{0}_ik_visibility'.format(self._name))
-
-        pmc.connectAttr(self._switchAttr, revIkVis + '.inputX')
-        pmc.connectAttr(revIkVis + '.outputX', self._rigControls['ik_leg'] + '.visibility')
-        pmc.connectAttr(revIkVis + '.outputX', self._rigControls['ik_knee'] + '.visibility')
-
-        self.lockAttrs.append(self._rigControls['ik_leg'] + '.scaleX')
-        self.lockAttrs.append(self._rigControls['ik_leg'] + '.scaleY')
-        self.lockAttrs.append(self._rigControls['ik_leg'] + '.scaleZ')
-        self.lockAttrs.append(self._rigControls['ik_leg'] + '.visibility')
-
-        self.lockAttrs.append(self._rigControls['ik_knee'] + '.rotateX')
-        self.lockAttrs.append(self._rigControls['ik_knee'] + '.rotateY')
-        self.lockAttrs.append(self._rigControls['ik_knee'] + '.rotateZ')
-        self.lockAttrs.append(self._rigControls['ik_knee'] + '.scaleX')
-        self.lockAttrs.append(self._rigControls['ik_knee'] + '.scaleY')
-        self.lockAttrs.append(self._rigControls['ik_knee'] + '.scaleZ')
-        self.lockAttrs.append(self._rigControls['ik_knee'] + '.visibility')
-
         self.lockAttrs.append(self._rigControls['ik_toe'] + '.translateX')
         self.lockAttrs.append(self._rigControls['ik_toe'] + '.translateY')
         self.lockAttrs.append(self._rigControls['ik_toe'] + '.translateZ')
@@ -518,17 +868,26 @@ class RiggingLeg(Rigging):
         self.lockAttrs.append(self._rigControls['ik_toe'] + '.scaleZ')
         self.lockAttrs.append(self._rigControls['ik_toe'] + '.visibility')
 
-        return mainGroup
-
 
 class RiggingArm(Rigging):
     FK_CONTROL_ATTR_BASE = 'fkcontrol'
     IK_CONTROL_ATTR_BASE = 'ikcontrol'
 
-    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None, noFlipVector=None):
-        super(RiggingArm, self).__init__(name, joints, parent, mainControl, switchboard)
+    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None, noFlipVector=None,
+                 gateEvaluation=False, lod=LOD_FULL):
+        """
+        gateEvaluation - if True, the inactive ik or fk branch stops evaluating at fully ik or fully fk
+        lod - LOD_FULL, LOD_LIGHT (no gimbal controls, pole guide line or fk isolation) or LOD_FK (fk controls only)
+        """
+        super(RiggingArm, self).__init__(name, joints, parent, mainControl, switchboard, lod)
 
         self._noflipvector = noFlipVector
+
+        if self._lod == LOD_FK:
+            pmc.parent(self.makeFkOnlyRig(self._joints), self.transform)
+            self.finishBuild()
+            return
+
         getAttribute(self._switchboard, self._name + '_ikfk', min=0, max=1, defaultValue=0, keyable=True)
 
         self._switchAttr = '{0}.{1}_ikfk'.format(switchboard, self._name)
@@ -546,7 +905,10 @@ class RiggingArm(Rigging):
 
         pmc.hide((fkjointgrp, ikjointgrp))
 
-        self.lockAndHide(True)
+        if gateEvaluation:
+            self.makeEvaluationGate()
+
+        self.finishBuild()
 
     def makeFkRig(self):
         mainGroup = pmc.group(empty=True, name='grp_fk_{0}_rig'.format(self._name))
@@ -562,32 +924,36 @@ class RiggingArm(Rigging):
         self._rigControls['fk_shoulder'], shoulderPreTransform = \
             makeControlNode(name='ctl_fk_{0}_shoulder'.format(self._name), targetObject=jnts['shoulder'])
 
-        self._rigControls['fk_gimbal_wrist'], armGimbalPreTransform = \
-            makeControlNode(name='ctl_fk_{0}_wrist_gimbal'.format(self._name), targetObject=jnts['wrist'])
+        useGimbal = self._lod == LOD_FULL
+        if useGimbal:
+            self._rigControls['fk_gimbal_wrist'], armGimbalPreTransform = \
+                makeControlNode(name='ctl_fk_{0}_wrist_gimbal'.format(self._name), targetObject=jnts['wrist'])
+        else:
+            self._rigControls['fk_gimbal_wrist'] = self._rigControls['fk_wrist']
 
-        parentTarget, worldTarget = self.makeOrientSwitchNodes(jnts['shoulder'], shoulderPreTransform,
-                                                               name=self._name + '_fk')
-        pmc.parent(parentTarget, worldTarget, mainGroup)
+        self.makeOrientSwitchNodes(jnts['shoulder'], shoulderPreTransform, name=self._name + '_fk')
 
-        pmc.orientConstraint(self._rigControls['fk_gimbal_wrist'], jnts['wrist'])
-        pmc.orientConstraint(self._rigControls['fk_elbow'], jnts['elbow'])
-        pmc.orientConstraint(self._rigControls['fk_shoulder'], jnts['shoulder'])
+        self._fkBranchNodes.append(pmc.orientConstraint(self._rigControls['fk_gimbal_wrist'], jnts['wrist']))
+        self._fkBranchNodes.append(pmc.orientConstraint(self._rigControls['fk_elbow'], jnts['elbow']))
+        self._fkBranchNodes.append(pmc.orientConstraint(self._rigControls['fk_shoulder'], jnts['shoulder']))
 
-        pmc.parent(self._rigControls['fk_gimbal_wrist'], self._rigControls['fk_wrist'])
+        if useGimbal:
+            pmc.parent(self._rigControls['fk_gimbal_wrist'], self._rigControls['fk_wrist'])
         pmc.parent(wristPreTransform, self._rigControls['fk_elbow'], absolute=True)
         pmc.parent(elbowPreTransform, self._rigControls['fk_shoulder'])
 
         pmc.parent(shoulderPreTransform, mainGroup)
 
-        pmc.addAttr(self._rigControls['fk_wrist'], at='short', ln='showGimbal', min=0, max=1, defaultValue=1,
-                     keyable=False, hidden=False)
-        pmc.setAttr(self._rigControls['fk_wrist'] + '.showGimbal', edit=True, channelBox=True)
-
         if self._switchAttr:
             pmc.connectAttr(self._switchAttr, self._rigControls['fk_shoulder'] + '.visibility')
             pmc.connectAttr(self._switchAttr, self._rigControls['fk_elbow'] + '.visibility')
             pmc.connectAttr(self._switchAttr, self._rigControls['fk_wrist'] + '.visibility')
 
+        if self._switchAttr and useGimbal:
+            pmc.addAttr(self._rigControls['fk_wrist'], at='short', ln='showGimbal', min=0, max=1, defaultValue=1,
+                         keyable=False, hidden=False)
+            pmc.setAttr(self._rigControls['fk_wrist'] + '.showGimbal', edit=True, channelBox=True)
+
             gimbalVisMultNode = pmc.shadingNode('multiplyDivide', asUtility=True,
                                                  name='mul_fk_{0}_showGimbal'.format(self._name))
 
@@ -622,15 +988,16 @@ class RiggingArm(Rigging):
         self.lockAttrs.append(self._rigControls['fk_shoulder'] + '.scaleZ')
         self.lockAttrs.append(self._rigControls['fk_shoulder'] + '.visibility')
 
-        self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.translateX')
-        self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.translateY')
-        self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.translateZ')
-        self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.scaleX')
-        self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.scaleY')
-        self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.scaleZ')
-        self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.visibility')
+        if useGimbal:
+            self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.translateX')
+            self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.translateY')
+            self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.translateZ')
+            self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.scaleX')
+            self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.scaleY')
+            self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.scaleZ')
+            self.lockAttrs.append(self._rigControls['fk_gimbal_wrist'] + '.visibility')
 
-        pmc.delete(armGimbalPreTransform)
+            pmc.delete(armGimbalPreTransform)
 
         return mainGroup
 
@@ -642,43 +1009,51 @@ class RiggingArm(Rigging):
         self._rigControls['ik_wrist'], armPreTransform = makeControlNode(name='ctl_ik_{0}'.format(self._name),
                                                                          targetObject=jnts['wrist'])
 
-        self._rigControls['ik_gimbal_wrist'], armGimbalPreTransform = \
-            makeControlNode(name='ctl_ik_{0}_wrist_gimbal'.format(self._name), targetObject=jnts['wrist'])
+        useGimbal = self._lod == LOD_FULL
+        if useGimbal:
+            self._rigControls['ik_gimbal_wrist'], armGimbalPreTransform = \
+                makeControlNode(name='ctl_ik_{0}_wrist_gimbal'.format(self._name), targetObject=jnts['wrist'])
+        else:
+            self._rigControls['ik_gimbal_wrist'] = self._rigControls['ik_wrist']
 
         handle = pmc.ikHandle(sj=jnts['shoulder'], ee=jnts['wrist'], sol='ikRPsolver',
                                n='ikh_{0}'.format(self._name))[0]
 
         self._rigControls['ik_elbow'], poleLine = makePoleVectorControlFromHandle('ctl_ik_{0}_pole'.format(self._name),
-                                                                                  handle, parent=mainGroup)
+                                                                                  handle, parent=mainGroup,
+                                                                                  useClusters=self.POLE_LINE_USE_CLUSTERS,
+                                                                                  guideLine=useGimbal)
 
         elbowPreT = pmc.listRelatives(self._rigControls['ik_elbow'], parent=True)[0]
 
         noFlipHelper = self.makeNoFlipHelper(handle, self._noflipvector)
         pmc.parent(elbowPreT, noFlipHelper)
 
-        pmc.poleVectorConstraint(self._rigControls['ik_elbow'], handle)
-        pmc.parent(self._rigControls['ik_gimbal_wrist'], self._rigControls['ik_wrist'])
+        self._ikBranchNodes.extend([handle, pmc.poleVectorConstraint(self._rigControls['ik_elbow'], handle)])
+        if useGimbal:
+            pmc.parent(self._rigControls['ik_gimbal_wrist'], self._rigControls['ik_wrist'])
         pmc.parent(handle, self._rigControls['ik_gimbal_wrist'])
-        pmc.orientConstraint(self._rigControls['ik_gimbal_wrist'], jnts['wrist'])
+        self._ikBranchNodes.append(pmc.orientConstraint(self._rigControls['ik_gimbal_wrist'], jnts['wrist']))
 
         pmc.parent(armPreTransform, noFlipHelper, mainGroup)
 
-        pmc.addAttr(self._rigControls['ik_wrist'], at='byte', ln='showGimbal', min=0, max=1,
-                     defaultValue=1, keyable=False, hidden=False)
-        pmc.setAttr(self._rigControls['ik_wrist'] + '.showGimbal', edit=True, channelBox=True)
-
         revIkVis = pmc.shadingNode('reverse', asUtility=True, name='rev_{0}_ik_visibility'.format(self._name))
 
         pmc.connectAttr(self._switchAttr, revIkVis + '.inputX')
         pmc.connectAttr(revIkVis + '.outputX', self._rigControls['ik_wrist'] + '.visibility')
         pmc.connectAttr(revIkVis + '.outputX', self._rigControls['ik_elbow'] + '.visibility')
 
-        gimbalVisMultNode = pmc.shadingNode('multiplyDivide', asUtility=True,
-                                             name='mul_ik_{0}_showGimbal'.format(self._name))
+        if useGimbal:
+            pmc.addAttr(self._rigControls['ik_wrist'], at='byte', ln='showGimbal', min=0, max=1,
+                         defaultValue=1, keyable=False, hidden=False)
+            pmc.setAttr(self._rigControls['ik_wrist'] + '.showGimbal', edit=True, channelBox=True)
+
+            gimbalVisMultNode = pmc.shadingNode('multiplyDivide', asUtility=True,
+                                                 name='mul_ik_{0}_showGimbal'.format(self._name))
 
-        pmc.connectAttr(revIkVis + '.outputX', gimbalVisMultNode + '.input1X')
-        pmc.connectAttr(self._rigControls['ik_wrist'] + '.showGimbal', gimbalVisMultNode + '.input2X')
-        pmc.connectAttr(gimbalVisMultNode + '.outputX', self._rigControls['ik_gimbal_wrist'] + '.visibility')
+            pmc.connectAttr(revIkVis + '.outputX', gimbalVisMultNode + '.input1X')
+            pmc.connectAttr(self._rigControls['ik_wrist'] + '.showGimbal', gimbalVisMultNode + '.input2X')
+            pmc.connectAttr(gimbalVisMultNode + '.outputX', self._rigControls['ik_gimbal_wrist'] + '.visibility')
 
         self.lockAttrs.append(self._rigControls['ik_wrist'] + '.scaleX')
         self.lockAttrs.append(self._rigControls['ik_wrist'] + '.scaleY')
@@ -693,23 +1068,39 @@ class RiggingArm(Rigging):
         self.lockAttrs.append(self._rigControls['ik_elbow'] + '.scaleZ')
         self.lockAttrs.append(self._rigControls['ik_elbow'] + '.visibility')
 
-        self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.translateX')
-        self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.translateY')
-        self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.translateZ')
-        self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.scaleX')
-        self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.scaleY')
-        self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.scaleZ')
-        self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.visibility')
+        if useGimbal:
+            self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.translateX')
+            self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.translateY')
+            self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.translateZ')
+            self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.scaleX')
+            self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.scaleY')
+            self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.scaleZ')
+            self.lockAttrs.append(self._rigControls['ik_gimbal_wrist'] + '.visibility')
 
-        pmc.delete(armGimbalPreTransform)
+            pmc.delete(armGimbalPreTransform)
 
         return mainGroup
 
 
 class RiggingSpine(Rigging):
-    def __init__(self, name, joints, parent=None, mainControl=None, spline=None, switchboard=None):
-        super(RiggingSpine, self).__init__(name, joints, parent, mainControl, switchboard)
+    def __init__(self, name, joints, parent=None, mainControl=None, spline=None, switchboard=None,
+                 numControls=3, matrixCurve=False, gateEvaluation=False, lod=LOD_FULL):
+        """
+        numControls - number of ik spine controls along the spline, at least 2
+        matrixCurve - if True, the spline's cvs are driven by the controls' world matrices through a
+                      lightweight matrix network instead of a skinCluster
+        gateEvaluation - if True, the inactive ik or fk branch stops evaluating at fully ik or fully fk
+        lod - LOD_FULL, LOD_LIGHT (always uses matrixCurve) or LOD_FK (fk controls only)
+        """
+        super(RiggingSpine, self).__init__(name, joints, parent, mainControl, switchboard, lod)
         self._spline = spline
+        self._numControls = max(2, numControls)
+        self._matrixCurve = matrixCurve or self._lod == LOD_LIGHT
+
+        if self._lod == LOD_FK:
+            pmc.parent(self.makeFkOnlyRig(self._joints), self.transform)
+            self.finishBuild()
+            return
 
         getAttribute(self._switchboard, self._name + '_ikfk', min=0, max=1, defaultValue=0, keyable=True)
 
@@ -746,7 +1137,10 @@ class RiggingSpine(Rigging):
         pmc.parent(ikrig, self._rigControls['root'])
         pmc.parent(rootCtlPreT, self.transform)
 
-        self.lockAndHide(True)
+        if gateEvaluation:
+            self.makeEvaluationGate()
+
+        self.finishBuild()
 
     def makeFkRig(self):
         mainGroup = pmc.group(empty=True, name='grp_fk_{0}_spinerig'.format(self._name))
@@ -759,7 +1153,7 @@ class RiggingSpine(Rigging):
 
                 if jnt == rootJoint:
                     pmc.parent(preTransform, mainGroup)
-                    pmc.parentConstraint(control, jnt)
+                    self._fkBranchNodes.append(pmc.parentConstraint(control, jnt))
                 else:
                     pmc.parent(preTransform, previousControl)
                     pmc.connectAttr(control + '.rotate', jnt + '.rotate')
@@ -767,7 +1161,7 @@ class RiggingSpine(Rigging):
                 control, preTransform = makeControlNode(name=jnt.replace('fkj_', 'ctl_', 1), targetObject=rootJoint)
 
                 pmc.parent(preTransform, mainGroup)
-                pmc.parentConstraint(control, jnt, maintainOffset=True)
+                self._fkBranchNodes.append(pmc.parentConstraint(control, jnt, maintainOffset=True))
 
             pmc.connectAttr(self._switchAttr, control + '.visibility')
 
@@ -800,52 +1194,27 @@ class RiggingSpine(Rigging):
         splineHandle = splineIk[0]
         pmc.setAttr(splineHandle + '.inheritsTransform', 0)
 
-        # Create, position, and set rotation order to controls
-        self._rigControls['ik_lwr_spine'], spineCtl0PreT = makeControlNode(
-            name='ctl_ik_{0}_lower_spine'.format(self._name),
-            targetObject=self._ikjoints[1], alignRotation=False)
-
-        # Create, position, and set rotation order to controls
-        self._rigControls['ik_mid_spine'], spineCtl1PreT = makeControlNode(
-            name='ctl_ik_{0}_middle_spine'.format(self._name))
-
-        midpoint = pmc.pointOnCurve('spl_spine', parameter=0.5, turnOnPercentage=True, position=True)
-        pmc.xform(spineCtl1PreT, worldSpace=True, translation=midpoint)
+        self._spline = pmc.PyNode(self._spline)
+        spineControls = self.makeIkSpineControls()
 
-        # Create, position, and set rotation order to controls
-        self._rigControls['ik_upr_spine'], spineCtl2PreT = makeControlNode(
-            name='ctl_ik_{0}_upper_spine'.format(self._name),
-            targetObject=self._ikjoints[-1], alignRotation=False)
-
-        pmc.setAttr(self._rigControls['ik_lwr_spine'] + '.rotateOrder', ROO_YXZ)
-        pmc.setAttr(self._rigControls['ik_mid_spine'] + '.rotateOrder', ROO_YXZ)
-        pmc.setAttr(self._rigControls['ik_upr_spine'] + '.rotateOrder', ROO_YXZ)
-
-        pmc.parent(spineCtl2PreT, self._rigControls['ik_mid_spine'])
-        pmc.parent(spineCtl0PreT, spineCtl1PreT, self._rigControls['root'])
-        pmc.parentConstraint(self._rigControls['ik_lwr_spine'], self._ikjoints[0], maintainOffset=True)
-        pmc.orientConstraint(self._rigControls['ik_upr_spine'], self._ikjoints[-1], maintainOffset=True)
+        self._ikBranchNodes.extend([splineHandle,
+                                    pmc.parentConstraint(spineControls[0], self._ikjoints[0], maintainOffset=True),
+                                    pmc.orientConstraint(spineControls[-1], self._ikjoints[-1], maintainOffset=True)])
 
         # connect controls to ik
-        # Using self.joints in place of cluster nodes. They're simpler to work with and do the same thing
-        clusterJoints = list()
-        pmc.select(clear=True)
-        clusterJoints.append(
-            pmc.joint(position=pmc.xform(self._ikjoints[1], q=True, worldSpace=True, translation=True), radius=4,
-                       name='clj_spine0'))
-        pmc.select(clear=True)
-        clusterJoints.append(
-            pmc.joint(position=midpoint, radius=4, name='clj_spine1'))
-        pmc.select(clear=True)
-        clusterJoints.append(
-            pmc.joint(position=pmc.xform(self._ikjoints[-1], q=True, worldSpace=True, translation=True), radius=4,
-                       name='clj_spine2'))
-
-        pmc.parent(clusterJoints[0], self._rigControls['ik_lwr_spine'])
-        pmc.parent(clusterJoints[1], self._rigControls['ik_mid_spine'])
-        pmc.parent(clusterJoints[2], self._rigControls['ik_upr_spine'])
-
-        pmc.skinCluster(clusterJoints, self._spline, maximumInfluences=2)
+        if self._matrixCurve:
+            self.makeCurveMatrixDrivers(spineControls)
+        else:
+            # Using self.joints in place of cluster nodes. They're simpler to work with and do the same thing
+            clusterJoints = list()
+            for i, control in enumerate(spineControls):
+                pmc.select(clear=True)
+                clusterJoints.append(
+                    pmc.joint(position=pmc.xform(control, q=True, worldSpace=True, translation=True), radius=4,
+                               name='clj_{0}{1:d}'.format(self._name, i)))
+                pmc.parent(clusterJoints[-1], control)
+
+            pmc.skinCluster(clusterJoints, self._spline, maximumInfluences=2)
 
         pmc.setAttr(splineHandle + '.dTwistControlEnable', 1)
 
@@ -869,27 +1238,110 @@ class RiggingSpine(Rigging):
 
         revIkVis = pmc.shadingNode('reverse', asUtility=True, name='rev_{0}_ik_visibility'.format(self._name))
         pmc.connectAttr(self._switchAttr, revIkVis + '.inputX')
-        pmc.connectAttr(revIkVis + '.outputX', self._rigControls['ik_lwr_spine'] + '.visibility')
-        pmc.connectAttr(revIkVis + '.outputX', self._rigControls['ik_mid_spine'] + '.visibility')
-        pmc.connectAttr(revIkVis + '.outputX', self._rigControls['ik_upr_spine'] + '.visibility')
 
-        self.lockAttrs.append(self._rigControls['ik_lwr_spine'] + '.scaleX')
-        self.lockAttrs.append(self._rigControls['ik_lwr_spine'] + '.scaleY')
-        self.lockAttrs.append(self._rigControls['ik_lwr_spine'] + '.scaleZ')
-        self.lockAttrs.append(self._rigControls['ik_lwr_spine'] + '.visibility')
+        for control in spineControls:
+            pmc.connectAttr(revIkVis + '.outputX', control + '.visibility')
 
-        self.lockAttrs.append(self._rigControls['ik_mid_spine'] + '.scaleX')
-        self.lockAttrs.append(self._rigControls['ik_mid_spine'] + '.scaleY')
-        self.lockAttrs.append(self._rigControls['ik_mid_spine'] + '.scaleZ')
-        self.lockAttrs.append(self._rigControls['ik_mid_spine'] + '.visibility')
-
-        self.lockAttrs.append(self._rigControls['ik_upr_spine'] + '.scaleX')
-        self.lockAttrs.append(self._rigControls['ik_upr_spine'] + '.scaleY')
-        self.lockAttrs.append(self._rigControls['ik_upr_spine'] + '.scaleZ')
-        self.lockAttrs.append(self._rigControls['ik_upr_spine'] + '.visibility')
+            self.lockAttrs.append(control + '.scaleX')
+            self.lockAttrs.append(control + '.scaleY')
+            self.lockAttrs.append(control + '.scaleZ')
+            self.lockAttrs.append(control + '.visibility')
 
         return mainGroup
 
+    def makeIkSpineControls(self):
+        """
+        Creates self._numControls ik controls along the spline.
+        Lower and upper controls sit on the second and last ik joints, the middle controls are spread evenly
+        along the spline. Middle controls are chained under each other, the upper control under the last one
+        Returns the controls from lower to upper
+        """
+
+        count = self._numControls
+        controls = list()
+        preTransforms = list()
+        for i in xrange(count):
+            if i == 0:
+                key, name, target = 'ik_lwr_spine', 'lower_spine', self._ikjoints[1]
+            elif i == count - 1:
+                key, name, target = 'ik_upr_spine', 'upper_spine', self._ikjoints[-1]
+            elif count == 3:
+                key, name, target = 'ik_mid_spine', 'middle_spine', None
+            else:
+                key, name, target = 'ik_mid_spine{0:d}'.format(i), 'middle_spine{0:d}'.format(i), None
+
+            # Create, position, and set rotation order to controls
+            self._rigControls[key], preTransform = makeControlNode(
+                name='ctl_ik_{0}_{1}'.format(self._name, name), targetObject=target, alignRotation=False)
+
+            if target is None:
+                position = pmc.pointOnCurve(self._spline, parameter=float(i) / (count - 1), turnOnPercentage=True,
+                                            position=True)
+                pmc.xform(preTransform, worldSpace=True, translation=position)
+
+            pmc.setAttr(self._rigControls[key] + '.rotateOrder', ROO_YXZ)
+
+            controls.append(self._rigControls[key])
+            preTransforms.append(preTransform)
+
+        pmc.parent(preTransforms[0], self._rigControls['root'])
+        for i, preTransform in enumerate(preTransforms[1:], 1):
+            if i == 1:
+                pmc.parent(preTransform, self._rigControls['root'])
+            else:
+                pmc.parent(preTransform, controls[i - 1])
+
+        return controls
+
+    def makeCurveMatrixDrivers(self, controls):
+        """
+        Drives the spline's cvs straight from the controls, in place of a skinCluster.
+        Each control gets a multMatrix of its bind inverse, its worldMatrix and the curve's inverseMatrix.
+        Each cv is weighted to its two nearest controls along the control chain: a pointMatrixMult moves
+        the cv's bind position by that matrix, a wtAddMatrix blends the two when a cv sits between controls
+        """
+
+        curveShape = self._spline.getShape()
+        pmc.setAttr(self._spline + '.inheritsTransform', 0)
+
+        controlPositions = np.array([pmc.xform(ctl, q=True, worldSpace=True, translation=True) for ctl in controls])
+        cvPositions = np.array([tuple(cv) for cv in curveShape.getCVs(space='world')])
+
+        deformMatrices = list()
+        for i, control in enumerate(controls):
+            matrixNode = pmc.createNode('multMatrix', name='mmx_{0}_spine{1:d}_deform'.format(self._name, i))
+            matrixNode.matrixIn[0].set(control.worldMatrix[0].get().inverse())
+            control.worldMatrix[0].connect(matrixNode.matrixIn[1])
+            self._spline.inverseMatrix.connect(matrixNode.matrixIn[2])
+            deformMatrices.append(matrixNode)
+
+        # project each cv onto the segments between controls, closest segment wins
+        starts = controlPositions[:-1]
+        segments = controlPositions[1:] - starts
+        lengths = np.maximum(np.sum(segments * segments, axis=1), 1e-12)
+        params = np.clip(np.einsum('csk,sk->cs', cvPositions[:, np.newaxis] - starts, segments) / lengths, 0.0, 1.0)
+        closest = starts + params[..., np.newaxis] * segments
+        nearest = np.argmin(np.linalg.norm(cvPositions[:, np.newaxis] - closest, axis=2), axis=1)
+
+        for i, (segment, cvPosition) in enumerate(zip(nearest, cvPositions.tolist())):
+            weight = params[i, segment]
+            pointNode = pmc.createNode('pointMatrixMult', name='pmm_{0}_spline_cv{1:d}'.format(self._name, i))
+            pointNode.inPoint.set(cvPosition)
+
+            influences = [(deformMatrices[segment], 1.0 - weight), (deformMatrices[segment + 1], weight)]
+            influences = [(node, w) for node, w in influences if w > 1e-4]
+
+            if len(influences) == 1:
+                influences[0][0].matrixSum.connect(pointNode.inMatrix)
+            else:
+                blendNode = pmc.createNode('wtAddMatrix', name='wam_{0}_spline_cv{1:d}'.format(self._name, i))
+                for j, (node, w) in enumerate(influences):
+                    node.matrixSum.connect(blendNode.wtMatrix[j].matrixIn)
+                    blendNode.wtMatrix[j].weightIn.set(w)
+                blendNode.matrixSum.connect(pointNode.inMatrix)
+
+            pointNode.output.connect(curveShape.controlPoints[i])
+
 
 class RiggingFingers(Rigging):
     FINGER_CURL_ATTR_NAME = 'curl'
@@ -897,31 +1349,76 @@ class RiggingFingers(Rigging):
     FINGER_VIS_ATTR_NAME = 'extraControls'
 
     def __init__(self, name, joints, parent=None, mainControl=None, minStretch=-1.5, maxStretch=1.5,
-                 reverseStretch=False, knuckleAxis='Z'):
-        super(RiggingFingers, self).__init__(name, joints, parent, mainControl)
+                 reverseStretch=False, knuckleAxis='Z', lod=LOD_FULL):
+        """
+        lod - below LOD_FULL, no curl, stretch or extraControls attributes are made
+        """
+        super(RiggingFingers, self).__init__(name, joints, parent, mainControl, lod=lod)
 
         self._minStretch = minStretch
         self._maxStretch = maxStretch
         self._reverseStretch = reverseStretch
         self._knuckleAxis = knuckleAxis
+        self._fingerDrivers = None
 
         handGrp = self.makeRig()
 
         pmc.parent(handGrp, self.transform)
 
-        self.lockAndHide(True)
+        self.finishBuild()
+
+    def makeFingerDrivers(self, index, curlAttr, stretchAttr):
+        """
+        Fingers share their curl and stretch utility nodes, three fingers per node, one per X/Y/Z channel.
+        Connects the finger's curl and stretch attributes to its channel, creating the nodes for the
+        first finger of each group of three
+        Returns the curl and stretch output attributes, used by every knuckle of the finger
+        """
+
+        packIndex, channel = divmod(index, 3)
+        channel = 'XYZ'[channel]
+
+        if channel == 'X':
+            nodeName = '{0}_fingers{1:d}'.format(self._name, packIndex)
+            curlNode = pmc.shadingNode('multiplyDivide', asUtility=True, n='mul_{0}_curl'.format(nodeName))
+            stretchRangeNode = pmc.shadingNode('setRange', asUtility=True, n='rng_{0}_stretch'.format(nodeName))
+
+            revStretchNode = None
+            if self._reverseStretch:
+                revStretchNode = pmc.shadingNode('reverse', asUtility=True, n='rev_{0}_stretch'.format(nodeName))
+
+            self._fingerDrivers = (curlNode, stretchRangeNode, revStretchNode)
+
+        curlNode, stretchRangeNode, revStretchNode = self._fingerDrivers
+
+        pmc.setAttr('{0}.input2{1}'.format(curlNode, channel), -11.0)
+        pmc.connectAttr(curlAttr, '{0}.input1{1}'.format(curlNode, channel))
+
+        if revStretchNode:
+            pmc.connectAttr(stretchAttr, '{0}.input{1}'.format(revStretchNode, channel))
+            pmc.connectAttr('{0}.output{1}'.format(revStretchNode, channel),
+                            '{0}.value{1}'.format(stretchRangeNode, channel))
+        else:
+            pmc.connectAttr(stretchAttr, '{0}.value{1}'.format(stretchRangeNode, channel))
+
+        pmc.setAttr('{0}.min{1}'.format(stretchRangeNode, channel), self._minStretch)
+        pmc.setAttr('{0}.max{1}'.format(stretchRangeNode, channel), self._maxStretch)
+        pmc.setAttr('{0}.oldMin{1}'.format(stretchRangeNode, channel), -10.0)
+        pmc.setAttr('{0}.oldMax{1}'.format(stretchRangeNode, channel), 10.0)
+
+        return ('{0}.output{1}'.format(curlNode, channel), '{0}.outValue{1}'.format(stretchRangeNode, channel))
 
     def makeRig(self):
         rootTransforms = list()
 
-        for root in self._joints:
+        for index, root in enumerate(self._joints):
             fingers = [root]
             childFingers = pmc.listRelatives(root, children=True, allDescendents=True, type='joint')
             childFingers.reverse()
             fingers.extend(childFingers)
 
-            curlAttr = None
-            stretchAttr = None
+            curlOutput = None
+            stretchOutput = None
             visibilityAttr = None
 
             previousControl = None
@@ -930,35 +1427,15 @@ class RiggingFingers(Rigging):
 
                 if previousControl:
                     pmc.parent(preTransform, previousControl)
-                    drivenGrp = pmc.group(control, name='hlp_' + control)
 
-                    curlNode = pmc.shadingNode('multiplyDivide', asUtility=True,
-                                                n='mul_{0}_{1}_curl'.format(self._name, fng))
-
-                    pmc.setAttr('{0}.input2{1}'.format(curlNode, self._knuckleAxis), -11.0)
-                    pmc.connectAttr(curlAttr, '{0}.input1{1}'.format(curlNode, self._knuckleAxis))
-                    pmc.connectAttr('{0}.output{1}'.format(curlNode, self._knuckleAxis), '{0}.rotate{1}'.format(drivenGrp, self._knuckleAxis))
-
-                    stretchRangeNode = pmc.shadingNode('setRange', asUtility=True,
-                                                        n='rng_{0}_{1}_stretch'.format(self._name, fng))
-
-                    if self._reverseStretch:
-                        revStretchNode = pmc.shadingNode('reverse', asUtility=True,
-                                                          n='rev_{0}_{1}_stretch'.format(self._name, fng))
-                        pmc.connectAttr(stretchAttr, revStretchNode + '.inputX')
-                        pmc.connectAttr(revStretchNode + '.outputX', stretchRangeNode + '.valueX')
-                    else:
-                        pmc.connectAttr(stretchAttr, stretchRangeNode + '.valueX')
-
-                    pmc.setAttr(stretchRangeNode + '.minX', self._minStretch)
-                    pmc.setAttr(stretchRangeNode + '.maxX', self._maxStretch)
-                    pmc.setAttr(stretchRangeNode + '.oldMinX', -10.0)
-                    pmc.setAttr(stretchRangeNode + '.oldMaxX', 10.0)
+                if previousControl and self._lod == LOD_FULL:
+                    drivenGrp = pmc.group(control, name='hlp_' + control)
 
-                    pmc.connectAttr(stretchRangeNode + '.outValueX', drivenGrp + '.translateX')
+                    pmc.connectAttr(curlOutput, '{0}.rotate{1}'.format(drivenGrp, self._knuckleAxis))
+                    pmc.connectAttr(stretchOutput, drivenGrp + '.translateX')
 
                     pmc.connectAttr(visibilityAttr, preTransform + '.visibility')
-                else:
+                elif self._lod == LOD_FULL:
                     curlAttr = getAttribute(control, self.FINGER_CURL_ATTR_NAME,
                                             min=-10.0, max=10.0, defaultValue=0, keyable=True)
                     stretchAttr = getAttribute(control, self.FINGER_STRETCH_ATTR_NAME,
@@ -968,6 +1445,8 @@ class RiggingFingers(Rigging):
 
                     pmc.setAttr(visibilityAttr, edit=True, channelBox=True)
 
+                    curlOutput, stretchOutput = self.makeFingerDrivers(index, curlAttr, stretchAttr)
+
                 pmc.parentConstraint(control, fng)
 
                 if fng != root:
@@ -998,14 +1477,14 @@ class RiggingFingers(Rigging):
 
 
 class RiggingHead(Rigging):
-    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None):
-        super(RiggingHead, self).__init__(name, joints, parent, mainControl, switchboard)
+    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None, lod=LOD_FULL):
+        super(RiggingHead, self).__init__(name, joints, parent, mainControl, switchboard, lod)
 
         handGrp = self.makeRig()
 
         pmc.parent(handGrp, self.transform)
 
-        self.lockAndHide(True)
+        self.finishBuild()
 
     def makeRig(self):
         mainGroup = pmc.group(empty=True, name='grp_{0}_headrig'.format(self._name))
@@ -1017,31 +1496,7 @@ class RiggingHead(Rigging):
         self._rigControls['head'], preHeadTransform = makeControlNode(name='ctl_{0}_head'.format(self._name),
                                                                       targetObject=jnts['head'])
 
-        parentTarget = pmc.group(empty=True, name='tgt_{0}_local'.format(self._name))
-        worldTarget = pmc.group(empty=True, name='tgt_{0}_world'.format(self._name))
-        alignObjects([parentTarget, worldTarget], preTransform)
-
-        pmc.parentConstraint(self._parent, parentTarget, maintainOffset=True)
-        pmc.parentConstraint(self._mainControl, worldTarget, maintainOffset=True)
-
-        pmc.pointConstraint(jnts['neck'], preTransform, maintainOffset=False)
-
-        constraint = pmc.orientConstraint(parentTarget, preTransform,
-                                           n=self._name + '_orientConstraint')
-        pmc.orientConstraint(worldTarget, preTransform, n=self._name + '_orientConstraint')
-        pmc.setAttr(constraint + '.interpType', 2)  # shortest interpolation (less flipping)
-
-        orientAttr = getAttribute(self._switchboard, self._name + '_isolation',
-                                  min=0, max=1, defaultValue=0, keyable=True)
-
-        revAttrNode = pmc.shadingNode('reverse', asUtility=True, name='rev_{0}_isolation'.format(self._name))
-
-        orientWeightList = pmc.orientConstraint(constraint, q=True, weightAliasList=True)
-        pmc.connectAttr(orientAttr, orientWeightList[1])
-        pmc.connectAttr(orientAttr, revAttrNode + '.inputX')
-        pmc.connectAttr(revAttrNode + '.outputX', orientWeightList[0])
-
-        pmc.parent([parentTarget, worldTarget], mainGroup)
+        self.makeOrientSwitchNodes(jnts['neck'], preTransform, defaultValue=0)
 
         pmc.parent(preHeadTransform, self._rigControls['neck'])
         pmc.orientConstraint(self._rigControls['neck'], jnts['neck'])
@@ -1069,14 +1524,14 @@ class RiggingHead(Rigging):
 
 
 class RiggingClavicle(Rigging):
-    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None):
-        super(RiggingClavicle, self).__init__(name, joints, parent, mainControl, switchboard)
+    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None, lod=LOD_FULL):
+        super(RiggingClavicle, self).__init__(name, joints, parent, mainControl, switchboard, lod)
 
         clavGrp = self.makeRig()
 
         pmc.parent(clavGrp, self.transform)
 
-        self.lockAndHide(True)
+        self.finishBuild()
 
     def makeRig(self):
         jnts = {'clav': self._joints[0]}
@@ -1099,14 +1554,14 @@ class RiggingClavicle(Rigging):
 
 
 class RiggingGenericFK(Rigging):
-    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None, isolation=False):
-        super(RiggingGenericFK, self).__init__(name, joints, parent, mainControl, switchboard)
+    def __init__(self, name, joints, parent=None, mainControl=None, switchboard=None, isolation=False, lod=LOD_FULL):
+        super(RiggingGenericFK, self).__init__(name, joints, parent, mainControl, switchboard, lod)
         self._isolation = isolation
         fkGrp = self.makeRig()
 
         pmc.parent(fkGrp, self.transform)
 
-        self.lockAndHide(True)
+        self.finishBuild()
 
     def makeRig(self):
         allPreTransforms = list()
@@ -1127,8 +1582,7 @@ class RiggingGenericFK(Rigging):
 
         mainGroup = allPreTransforms[0]
         if self._switchboard and self._isolation:
-            targetNodes = self.makeOrientSwitchNodes(self._joints[0], mainGroup)
-            pmc.parent(targetNodes, mainGroup)
+            self.makeOrientSwitchNodes(self._joints[0], mainGroup)
         else:
             pmc.parentConstraint(self._parent, mainGroup, maintainOffset=True)
 
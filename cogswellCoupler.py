@@ -13,6 +13,8 @@ This script assumes your rig skeleton is parented directly under your world/main
 
 import pymel.core as pmc
 
+import skinutils
+
 
 class CouplerApp():
     """
@@ -20,12 +22,13 @@ class CouplerApp():
     you can use either my default settings in __init__ or pass your own
     """
 
-    def __init__(self, bindPrefix='jnt', rigPrefix='rig'):
+    def __init__(self, bindPrefix='jnt', rigPrefix='rig', bindSnapshot=None):
         """
-
+        bindSnapshot - file written by skinutils.captureBindPose, restored on disconnect instead of the dagPose
         """
         self._bindPrefix = bindPrefix
         self._rigPrefix = rigPrefix
+        self._bindSnapshot = bindSnapshot
         self.mainWindow = None
 
     def Draw(self, windowName):
@@ -71,7 +74,10 @@ class CouplerApp():
                 orient.interpType.set(2)  # Interplotion 2 = shortest (to avoid flipping)
 
         # After disconnect, revert skeleton to bind pose
-        if doDisconnect:
+        if doDisconnect and self._bindSnapshot:
+            skinutils.restoreBindPose(self._bindSnapshot)
+            print 'COGSWELL COUPLER :: Rig Disconnected'
+        elif doDisconnect:
             skinRoot = joints[0]
             dagPoses = pmc.listConnections(skinRoot, type='dagPose', d=True, s=False)
             if len(dagPoses):
@@ -0,0 +1,303 @@
+"""
+Usage:
+To export the graph of cogbiped modules built inside a cogbiped.NodeTracker:
+    import evalgraph; evalgraph.exportModules([leftLeg, rightLeg, spine], 'C:/temp/goldie_graph.json')
+
+To analyze an exported graph, in or outside of Maya:
+    import evalgraph; evalgraph.printReport(evalgraph.analyze(evalgraph.loadGraph('C:/temp/goldie_graph.json')))
+
+From the command line, returns 1 if a limit is exceeded (for CI):
+    python evalgraph.py goldie_graph.json --max-depth 120 --max-cycles 0
+
+"""
+from __future__ import print_function
+
+__author__ = 'Sergio Sykes'
+__version__ = 'Fall 2015'
+
+import json
+import sys
+
+GRAPH_VERSION = 1
+
+# node types that never take part in evaluation
+IGNORED_TYPES = ('renderUtilityList', 'shadingEngine', 'hyperLayout', 'displayLayer', 'nodeGraphEditorInfo')
+
+
+def exportGraph(moduleNodes, path=None):
+    """
+    moduleNodes - dictionary of module name to the nodes it created
+    Records each node's type, module and dag parent, and every connection to or from the nodes.
+    Nodes outside the modules that connect to them are exported with a module of None
+    Writes json to path if given. Returns the graph dictionary
+    """
+    import pymel.core as pmc
+
+    nodes = dict()
+    edges = set()
+
+    def addNode(node, module=None):
+        name = node.longName() if isinstance(node, pmc.nodetypes.DagNode) else node.name()
+        if name not in nodes:
+            parent = node.getParent() if isinstance(node, pmc.nodetypes.DagNode) else None
+            nodes[name] = {'type': node.type(), 'module': module,
+                           'parent': parent.longName() if parent else None}
+        elif module is not None:
+            nodes[name]['module'] = module
+        return name
+
+    for module, moduleList in moduleNodes.items():
+        for node in moduleList:
+            addNode(pmc.PyNode(node), module)
+
+    for name in list(nodes):
+        node = pmc.PyNode(name)
+        for src, dst in pmc.listConnections(node, connections=True, plugs=True, source=True, destination=False):
+            if dst.node().type() not in IGNORED_TYPES:
+                edges.add((addNode(dst.node()), dst.longName(), name, src.longName()))
+        for src, dst in pmc.listConnections(node, connections=True, plugs=True, source=False, destination=True):
+            if dst.node().type() not in IGNORED_TYPES:
+                edges.add((name, src.longName(), addNode(dst.node()), dst.longName()))
+
+    graph = {'version': GRAPH_VERSION, 'nodes': nodes, 'edges': sorted(edges)}
+
+    if path:
+        with open(path, 'w') as f:
+            json.dump(graph, f, indent=1, sort_keys=True)
+
+    return graph
+
+
+def exportModules(modules, path=None):
+    """
+    Exports the nodes created by cogbiped Rigging modules
+    """
+    return exportGraph(dict((module.name(), module.createdNodes()) for module in modules), path)
+
+
+def loadGraph(path):
+    with open(path) as f:
+        graph = json.load(f)
+
+    if graph.get('version') != GRAPH_VERSION:
+        raise ValueError('evalgraph :: Unsupported graph version {0}'.format(graph.get('version')))
+
+    return graph
+
+
+def isDependency(graph, srcNode, srcAttr, dstNode, dstAttr):
+    """
+    Message connections only point at nodes, and constraints read their constrained object's
+    constraint* inputs without depending on its outputs, neither orders evaluation
+    """
+    if srcAttr == 'message' or srcAttr.endswith('.message'):
+        return False
+
+    return not (graph['nodes'][dstNode]['type'].endswith('Constraint') and dstAttr.startswith('constraint'))
+
+
+def dependencies(graph):
+    """
+    Returns a dictionary of node to the set of nodes that evaluate after it.
+    Connections and dag parenting (a child's world matrix depends on its parent) both count,
+    constraints don't depend on the transform they're parented under
+    """
+    downstream = dict((name, set()) for name in graph['nodes'])
+    for srcNode, srcAttr, dstNode, dstAttr in graph['edges']:
+        if isDependency(graph, srcNode, srcAttr, dstNode, dstAttr):
+            downstream[srcNode].add(dstNode)
+
+    for name, data in graph['nodes'].items():
+        if data['parent'] in downstream and not data['type'].endswith('Constraint'):
+            downstream[data['parent']].add(name)
+
+    return downstream
+
+
+def stronglyConnected(downstream):
+    """
+    Iterative Tarjan. Returns the list of strongly connected components, downstream components first
+    """
+    index = dict()
+    lowlink = dict()
+    onStack = set()
+    stack = list()
+    components = list()
+    counter = [0]
+
+    for start in sorted(downstream):
+        if start in index:
+            continue
+
+        work = [(start, iter(sorted(downstream[start])))]
+        index[start] = lowlink[start] = counter[0]
+        counter[0] += 1
+        stack.append(start)
+        onStack.add(start)
+
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter[0]
+                    counter[0] += 1
+                    stack.append(child)
+                    onStack.add(child)
+                    work.append((child, iter(sorted(downstream[child]))))
+                    break
+                elif child in onStack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    lowlink[work[-1][0]] = min(lowlink[work[-1][0]], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = list()
+                    while True:
+                        member = stack.pop()
+                        onStack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+    return components
+
+
+def longestChain(downstream, components, nodes=None):
+    """
+    Longest dependency chain through the graph, counted in nodes, each cycle counts as one step.
+    If nodes is given, only those nodes are walked
+    Returns the chain as a list of nodes, a cycle appears as its first member
+    """
+    componentOf = dict()
+    for i, component in enumerate(components):
+        for member in component:
+            componentOf[member] = i
+
+    # tarjan returns downstream components first, so walk them in that order
+    best = dict()
+    for i, component in enumerate(components):
+        members = [member for member in component if nodes is None or member in nodes]
+        if not members:
+            continue
+
+        # ties go to the step named first, so the chain doesn't depend on dictionary order
+        steps = set(componentOf[child] for member in members for child in downstream[member])
+        steps = [j for j in steps if j != i and j in best]
+        nextStep = min(steps, key=lambda j: (-best[j][0], best[j][1])) if steps else None
+
+        length = 1 + (best[nextStep][0] if nextStep is not None else 0)
+        best[i] = (length, sorted(members)[0], nextStep)
+
+    if not best:
+        return list()
+
+    step = min(best, key=lambda i: (-best[i][0], best[i][1]))
+    chain = list()
+    while step is not None:
+        chain.append(best[step][1])
+        step = best[step][2]
+
+    return chain
+
+
+def analyze(graph, hotspots=10):
+    """
+    Returns a report dictionary with:
+        criticalPath  - longest dependency chain through the graph
+        fanIn, fanOut - the nodes with the most distinct inputs and outputs
+        cycles        - strongly connected components with more than one node, or a node feeding itself
+        constraintStacks - nodes driven by more than one constraint, and the constraints driving them
+        modules       - per module, its node count, its longest chain and its nodes on the critical path
+    """
+    nodes = graph['nodes']
+    downstream = dependencies(graph)
+    upstream = dict((name, set()) for name in nodes)
+    for name, children in downstream.items():
+        for child in children:
+            upstream[child].add(name)
+
+    components = stronglyConnected(downstream)
+    cycles = [sorted(component) for component in components
+              if len(component) > 1 or component[0] in downstream[component[0]]]
+
+    criticalPath = longestChain(downstream, components)
+
+    stacks = dict()
+    for srcNode, srcAttr, dstNode, dstAttr in graph['edges']:
+        if nodes[srcNode]['type'].endswith('Constraint') and not nodes[dstNode]['type'].endswith('Constraint'):
+            stacks.setdefault(dstNode, set()).add(srcNode)
+    constraintStacks = dict((name, sorted(constraints)) for name, constraints in stacks.items()
+                            if len(constraints) > 1)
+
+    def top(degrees):
+        return sorted(((len(links), name) for name, links in degrees.items() if links), reverse=True)[:hotspots]
+
+    criticalSet = set(criticalPath)
+    modules = dict()
+    for module in sorted(set(data['module'] for data in nodes.values() if data['module'] is not None)):
+        members = set(name for name, data in nodes.items() if data['module'] == module)
+        modules[module] = {'nodes': len(members),
+                           'longestChain': longestChain(downstream, components, members),
+                           'onCriticalPath': sorted(members & criticalSet)}
+
+    return {'nodes': len(nodes), 'edges': len(graph['edges']), 'criticalPath': criticalPath,
+            'fanIn': top(upstream), 'fanOut': top(downstream), 'cycles': cycles,
+            'constraintStacks': constraintStacks, 'modules': modules}
+
+
+def printReport(report):
+    print('{0:d} nodes, {1:d} connections'.format(report['nodes'], report['edges']))
+    print('Critical path: {0:d} nodes'.format(len(report['criticalPath'])))
+    for name in report['criticalPath']:
+        print('    ' + name)
+
+    print('Fan in hotspots:')
+    for count, name in report['fanIn']:
+        print('    {0:4d} {1}'.format(count, name))
+
+    print('Fan out hotspots:')
+    for count, name in report['fanOut']:
+        print('    {0:4d} {1}'.format(count, name))
+
+    print('Cycles: {0:d}'.format(len(report['cycles'])))
+    for cycle in report['cycles']:
+        print('    ' + ', '.join(cycle))
+
+    print('Constraint stacks: {0:d}'.format(len(report['constraintStacks'])))
+    for name, constraints in sorted(report['constraintStacks'].items()):
+        print('    {0}: {1}'.format(name, ', '.join(constraints)))
+
+    for module, data in sorted(report['modules'].items()):
+        print('Module {0}: {1:d} nodes, longest chain {2:d}, {3:d} on the critical path'.format(
+            module, data['nodes'], len(data['longestChain']), len(data['onCriticalPath'])))
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Analyze an exported rig evaluation graph')
+    parser.add_argument('graph', help='json file written by evalgraph.exportGraph')
+    parser.add_argument('--max-depth', type=int, default=None, help='fail if the critical path is longer')
+    parser.add_argument('--max-cycles', type=int, default=None, help='fail if there are more cycles')
+    parser.add_argument('--hotspots', type=int, default=10, help='number of fan in/out hotspots to list')
+    options = parser.parse_args(args)
+
+    report = analyze(loadGraph(options.graph), options.hotspots)
+    printReport(report)
+
+    failed = False
+    if options.max_depth is not None and len(report['criticalPath']) > options.max_depth:
+        print('FAILED: critical path {0:d} > {1:d}'.format(len(report['criticalPath']), options.max_depth))
+        failed = True
+    if options.max_cycles is not None and len(report['cycles']) > options.max_cycles:
+        print('FAILED: {0:d} cycles > {1:d}'.format(len(report['cycles']), options.max_cycles))
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
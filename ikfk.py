@@ -5,7 +5,7 @@ from itertools import izip
 import pymel.core as pmc
 
 from hellamath import getPoleVectorPosition
-from advutils import alignObjects, getAttribute
+from advutils import alignObjects, getAttribute, cachedNode, cachedAttribute, NodeCache
 
 JOINT_BASE_PREFIX = 'rig'  # existing prefix of control joints that will be queried in search/replace functions within script
 IK_JOINT_PREFIX = 'ikj'  # Prefix convention for duplicated joints for IK systems
@@ -74,10 +74,7 @@ def makeIkFkJoints(joints, attribute=None, stretchy=False,
     # Create remapValue node to help us remap the value, if needed
     outputAttr = None
     if attribute:
-        if isinstance(attribute, basestring):
-            outputAttr = pmc.Attribute(attribute)
-        else:
-            outputAttr = attribute
+        outputAttr = cachedAttribute(attribute)
 
         attrMaxValue = outputAttr.getMax()
         if attrMaxValue > 1.0:
@@ -308,7 +305,11 @@ class App(object):
         self.mainWindow.show()
 
     def _callback(self, closeGUI):
-        joints = map(pmc.PyNode, self._jointTsc.getAllItems())
+        with NodeCache():
+            self._build(closeGUI)
+
+    def _build(self, closeGUI):
+        joints = map(cachedNode, self._jointTsc.getAllItems())
         attribute = None
         rawControlText = self._attrField.getText()
         if rawControlText:
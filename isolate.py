@@ -1,19 +1,19 @@
 import pymel.core as pmc
 
 
-from advutils import getAttribute
+from advutils import getAttribute, cachedNode
 
 
 def isolateOnControl(worldTarget, localTarget, transform, control, attributeName,
                      orientation=True, position=False, useLocators=False):
     if isinstance(worldTarget, basestring):
-        worldTarget = pmc.PyNode(worldTarget)
+        worldTarget = cachedNode(worldTarget)
 
     if isinstance(localTarget, basestring):
-        localTarget = pmc.PyNode(localTarget)
+        localTarget = cachedNode(localTarget)
 
     if isinstance(transform, basestring):
-        transform = pmc.PyNode(transform)
+        transform = cachedNode(transform)
 
     basename = transform.shortName()
 
@@ -48,4 +48,67 @@ def isolateOnControl(worldTarget, localTarget, transform, control, attributeName
         isolateAttr.connect(rev.inputX)
         rev.outputX.connect(weightAttrs[1])
 
-    return [worldGrp, localGrp]
\ No newline at end of file
+    return [worldGrp, localGrp]
+
+
+def getIsolationReverse(isolateAttr, name=None):
+    """
+    Returns the reverse node already driven by isolateAttr, or makes one
+    Lets every isolation on the same control attribute share a single reverse node
+    """
+
+    for plug in isolateAttr.listConnections(source=False, destination=True, type='reverse', plugs=True):
+        if plug.longName() == 'inputX':
+            return plug.node(), False
+
+    if name is None:
+        name = 'rev_{0}_{1}'.format(isolateAttr.node().shortName(), isolateAttr.longName())
+
+    rev = pmc.createNode('reverse', name=name)
+    isolateAttr.connect(rev.inputX)
+    return rev, True
+
+
+def isolateManyOnControl(worldTarget, localTarget, transforms, control, attributeName,
+                         orientation=True, position=False):
+    """
+    Batch version of isolateOnControl for every transform driven by the same control attribute.
+    Each transform gets one parentConstraint straight to worldTarget and localTarget. parentConstraint keeps
+    an offset per target, so the tgt_ transforms (and the constraints driving them) aren't needed.
+    All of the constraints share one reverse node per control attribute, also across separate calls.
+    Returns a summary dict with the constraints, the reverse node and how many nodes were saved
+    compared to calling isolateOnControl on each transform
+    """
+
+    worldTarget = cachedNode(worldTarget)
+    localTarget = cachedNode(localTarget)
+    transforms = map(cachedNode, transforms)
+
+    skipTranslate = 'none' if position else ['x', 'y', 'z']
+    skipRotate = 'none' if orientation else ['x', 'y', 'z']
+
+    isolateAttr = getAttribute(control, attributeName, min=0, max=1, keyable=True)
+    rev, createdReverse = getIsolationReverse(isolateAttr)
+
+    constraints = list()
+    for transform in transforms:
+        con = pmc.parentConstraint(worldTarget, localTarget, transform, maintainOffset=True,
+                                   skipTranslate=skipTranslate, skipRotate=skipRotate,
+                                   name='con_{0}_isolation'.format(transform.shortName()))
+        con.interpType.set(2)
+
+        weightAttrs = con.getWeightAliasList()
+        isolateAttr.connect(weightAttrs[0])
+        rev.outputX.connect(weightAttrs[1])
+        constraints.append(con)
+
+    # isolateOnControl makes 2 tgt_ transforms, 2 parentConstraints, 1 reverse
+    # and an orient and/or point constraint for every transform
+    previousNodes = len(transforms) * (5 + int(orientation) + int(position))
+    createdNodes = len(constraints) + int(createdReverse)
+
+    return {'constraints': constraints,
+            'reverse': rev,
+            'transforms': len(transforms),
+            'nodesCreated': createdNodes,
+            'nodesSaved': previousNodes - createdNodes}
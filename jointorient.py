@@ -0,0 +1,188 @@
+"""
+Usage:
+Orients the joints of a skeleton with X down the chain and Y as the up axis, Z is left as the bend axis.
+Limbs take their up from the plane of the chain (towards the knee or elbow), spines from a world up vector
+and fingers from the plane of the hand. Children keep their world positions and rotations.
+
+    import jointorient
+    jointorient.orientSkeleton(limbs=[['rig_left_leg_hip', 'rig_left_leg_knee', 'rig_left_leg_ankle']],
+                               spines=[['rig_spine0', 'rig_spine1', 'rig_spine2', 'rig_spine3', 'rig_spine4']],
+                               hands=[('rig_left_arm_wrist', ['rig_left_fng_thumb0', 'rig_left_fng_index0',
+                                                              'rig_left_fng_middle0', 'rig_left_fng_pinky0'])])
+
+Run it on the skeleton before the rig is built, the joints' channels have to be settable
+"""
+__author__ = 'Sergio Sykes'
+__version__ = 'Fall 2015'
+
+import numpy as np
+import pymel.core as pmc
+
+import npmath
+from advutils import batchSetAttr
+
+# world up used for spines, spines run along Y so the up axis points forward
+SPINE_WORLD_UP = (0.0, 0.0, 1.0)
+
+
+def chainPositions(joints):
+    return np.array([pmc.xform(jnt, q=True, worldSpace=True, translation=True) for jnt in joints], dtype=np.float64)
+
+
+def fingerChain(root):
+    """
+    Returns root and the first joint child of each joint below it
+    """
+    chain = [pmc.PyNode(root)]
+    while True:
+        children = pmc.listRelatives(chain[-1], children=True, type='joint')
+        if not children:
+            return chain
+        chain.append(children[0])
+
+
+def limbRotations(positions, upVector=None):
+    """
+    Rotations (N, 3, 3) aiming X down a limb with Y pointing from the line between the first and last joint
+    towards the middle joint, so the limb bends around Z. upVector is used instead when the limb is straight
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    start, end = positions[0], positions[-1]
+    middle = positions[len(positions) // 2]
+
+    direction = npmath.normalize(end - start)
+    pole = (middle - start) - direction * np.dot(middle - start, direction)
+
+    if np.linalg.norm(pole) < 1e-6:
+        if upVector is None:
+            raise ValueError('jointorient :: Limb is straight, an upVector is needed')
+        pole = upVector
+
+    return npmath.aimMatrices(positions, pole)
+
+
+def handNormal(wristPosition, fingerRootPositions):
+    """
+    Normal of the plane through the wrist and the first and last finger roots
+    """
+    first = np.asarray(fingerRootPositions[0]) - wristPosition
+    last = np.asarray(fingerRootPositions[-1]) - wristPosition
+    normal = np.cross(first, last)
+    if np.linalg.norm(normal) < 1e-6:
+        raise ValueError('jointorient :: Finger roots are in line with the wrist, no hand plane')
+    return npmath.normalize(normal)
+
+
+def chainLocals(positions, rotations, rotates, rotateOrders, parentPositions, parentRotations, parentInverseScales):
+    """
+    Translate and jointOrient values (N, 3) placing joints at world positions and rotations under parents
+    with the given world positions, rotations and inverse scale matrices, keeping their rotate channels
+    """
+    translations = np.einsum('ni,nij->nj', positions - parentPositions,
+                             np.matmul(np.swapaxes(parentRotations, -1, -2), parentInverseScales))
+
+    rotateMatrices = np.empty((len(positions), 3, 3))
+    for order in set(rotateOrders):
+        rows = [i for i, o in enumerate(rotateOrders) if o == order]
+        rotateMatrices[rows] = npmath.matricesFromEuler(np.asarray(rotates)[rows], order)
+
+    # world = rotate * jointOrient * parent, so jointOrient = rotate^-1 * world * parent^-1
+    orients = np.matmul(np.matmul(np.swapaxes(rotateMatrices, -1, -2), rotations),
+                        np.swapaxes(parentRotations, -1, -2))
+    return translations, npmath.eulerFromMatrices(orients)
+
+
+def applyOrients(rotations):
+    """
+    rotations - dictionary of joint name to its new world rotation (3, 3)
+    Zeroes the rotate channels of those joints and sets every translate and jointOrient that changes,
+    theirs and their children's, in one batched setAttr. Children keep their world transforms
+    Returns the largest distance a joint ended up from where it was
+    """
+    oriented = [pmc.PyNode(name) for name in rotations]
+    affected = list(oriented)
+    for jnt in oriented:
+        for child in pmc.listRelatives(jnt, children=True, type='joint') or []:
+            if child not in affected:
+                affected.append(child)
+
+    worlds = np.array([pmc.xform(jnt, q=True, worldSpace=True, matrix=True) for jnt in affected],
+                      dtype=np.float64).reshape(-1, 4, 4)
+    positions = worlds[:, 3, :3]
+    newRotations = np.array([rotations[jnt.name()] if jnt in oriented else npmath.normalize(worlds[i, :3, :3])
+                             for i, jnt in enumerate(affected)])
+
+    rotates = np.array([(0.0, 0.0, 0.0) if jnt in oriented else jnt.rotate.get() for jnt in affected])
+    rotateOrders = [jnt.rotateOrder.get() for jnt in affected]
+
+    index = dict((jnt, i) for i, jnt in enumerate(affected))
+    parentPositions = np.zeros((len(affected), 3))
+    parentRotations = np.tile(np.identity(3), (len(affected), 1, 1))
+    parentInverseScales = np.tile(np.identity(3), (len(affected), 1, 1))
+    for i, jnt in enumerate(affected):
+        parent = jnt.getParent()
+        if parent is None:
+            continue
+
+        parentWorld = np.array(pmc.xform(parent, q=True, worldSpace=True, matrix=True)).reshape(4, 4) \
+            if parent not in index else worlds[index[parent]]
+        scale = np.linalg.norm(parentWorld[:3, :3], axis=1)
+        parentPositions[i] = parentWorld[3, :3]
+        parentRotations[i] = newRotations[index[parent]] if parent in index else npmath.normalize(parentWorld[:3, :3])
+        parentInverseScales[i] = np.diag(1.0 / scale)
+
+    translations, orients = chainLocals(positions, newRotations, rotates, rotateOrders,
+                                        parentPositions, parentRotations, parentInverseScales)
+
+    plugValues = list()
+    for i, jnt in enumerate(affected):
+        if jnt in oriented:
+            plugValues.append((jnt.name() + '.rotate', (0.0, 0.0, 0.0)))
+        plugValues.append((jnt.name() + '.translate', translations[i]))
+        plugValues.append((jnt.name() + '.jointOrient', orients[i]))
+
+    batchSetAttr(plugValues)
+
+    after = np.array([pmc.xform(jnt, q=True, worldSpace=True, translation=True) for jnt in affected])
+    return float(np.linalg.norm(after - positions, axis=1).max())
+
+
+def orientSkeleton(limbs=(), spines=(), hands=(), worldUp=SPINE_WORLD_UP, limbUpVector=None):
+    """
+    limbs  - joint chains that bend in a plane, legs and arms
+    spines - joint chains oriented from worldUp
+    hands  - (wrist, finger roots) pairs, every joint of every listed finger is oriented from the plane through
+             the wrist and the first and last roots. Give every finger root of the hand, fingers left out aren't
+             oriented and are reported with a warning. Roots are given thumb or index first
+             so the plane normal points the same way on both sides
+    All orientations are solved first and applied in one batched edit
+    Returns the maximum residual, how far any joint moved
+    """
+    rotations = dict()
+
+    for joints in limbs:
+        names = [pmc.PyNode(jnt).name() for jnt in joints]
+        rotations.update(zip(names, limbRotations(chainPositions(names), limbUpVector)))
+
+    for joints in spines:
+        names = [pmc.PyNode(jnt).name() for jnt in joints]
+        rotations.update(zip(names, npmath.aimMatrices(chainPositions(names), worldUp)))
+
+    for wrist, roots in hands:
+        chains = [fingerChain(root) for root in roots]
+        missing = set(pmc.listRelatives(wrist, children=True, type='joint') or []) - set(chain[0] for chain in chains)
+        if missing:
+            pmc.warning('jointorient :: {0} has finger roots that were not given, they are not oriented: {1}'.format(
+                wrist, ', '.join(sorted(jnt.name() for jnt in missing))))
+
+        normal = handNormal(chainPositions([wrist])[0], [chainPositions(chain[:1])[0] for chain in chains])
+        for chain in chains:
+            names = [jnt.name() for jnt in chain]
+            rotations.update(zip(names, npmath.aimMatrices(chainPositions(names), normal)))
+
+    if not rotations:
+        return 0.0
+
+    residual = applyOrients(rotations)
+    print '{0:d} joints oriented, max residual {1:.6f}'.format(len(rotations), residual)
+    return residual
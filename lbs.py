@@ -0,0 +1,253 @@
+"""
+Usage:
+To export a skinned mesh's bind data and a range of poses from Maya:
+    import lbs
+    lbs.exportBindData('body_geo', 'C:/temp/body_bind.npz')
+    lbs.exportPoses('body_geo', 'C:/temp/walk_poses.npz', startFrame=1, endFrame=120)
+    lbs.exportPointCache('body_geo', 'C:/temp/walk_cache.npy', startFrame=1, endFrame=120)
+and the weights with skinutils.exportWeights(['body_geo'], 'C:/temp')
+
+To deform the poses outside of Maya and compare them to the cache:
+    python lbs.py body_bind.npz body_geo.npz walk_poses.npz --reference walk_cache.npy
+
+"""
+from __future__ import print_function
+
+__author__ = 'Sergio Sykes'
+__version__ = 'Fall 2015'
+
+import json
+import sys
+import time
+
+import numpy as np
+
+# frames deformed at once, bounds the (frames, vertices, 12) blended matrix array
+FRAME_CHUNK = 16
+
+
+def _skinCluster(mesh):
+    import pymel.core as pmc
+
+    skins = pmc.listHistory(mesh, type='skinCluster')
+    if not skins:
+        raise ValueError('lbs :: {0} has no skinCluster'.format(mesh))
+    return skins[0]
+
+
+def exportBindData(mesh, path):
+    """
+    Writes the mesh's undeformed points, its skin influences and their world matrices from the skinCluster's
+    bindPose dagPose (the one skinutils.rebuildDagPose makes) to an .npz file
+    """
+    import pymel.core as pmc
+
+    skin = _skinCluster(mesh)
+    influences = skin.getInfluence()
+    dagPose = skin.bindPose.inputs()
+    if not dagPose:
+        raise ValueError('lbs :: {0} has no bind pose'.format(skin))
+
+    matrices = list()
+    for influence in influences:
+        members = [plug for plug in influence.message.outputs(plugs=True)
+                   if plug.node() == dagPose[0] and plug.array().attrName(longName=True) == 'members']
+        if not members:
+            raise ValueError('lbs :: {0} is not a member of {1}'.format(influence, dagPose[0]))
+        matrices.append(list(dagPose[0].worldMatrix[members[0].index()].get()))
+
+    orig = [shape for shape in pmc.PyNode(mesh).getShapes() if shape.intermediateObject.get()]
+    points = orig[0].getPoints(space='object') if orig else pmc.PyNode(mesh).getShape().getPoints(space='object')
+
+    np.savez(path, points=np.array([list(p) for p in points], dtype=np.float64),
+             influences=np.array([influence.shortName() for influence in influences]),
+             bindMatrices=np.array(matrices, dtype=np.float64))
+    return path
+
+
+def _frames(startFrame, endFrame):
+    import pymel.core as pmc
+
+    if startFrame is None:
+        startFrame = pmc.playbackOptions(q=True, minTime=True)
+    if endFrame is None:
+        endFrame = pmc.playbackOptions(q=True, maxTime=True)
+    return range(int(startFrame), int(endFrame) + 1)
+
+
+def exportPoses(mesh, path, startFrame=None, endFrame=None):
+    """
+    Writes the world matrices of the mesh's skin influences for every frame, (frames, influences, 4, 4)
+    """
+    import pymel.core as pmc
+
+    influences = _skinCluster(mesh).getInfluence()
+    currentTime = pmc.currentTime(q=True)
+
+    matrices = list()
+    try:
+        for frame in _frames(startFrame, endFrame):
+            pmc.currentTime(frame, update=True)
+            matrices.append([pmc.xform(influence, q=True, worldSpace=True, matrix=True) for influence in influences])
+    finally:
+        pmc.currentTime(currentTime)
+
+    np.savez(path, influences=np.array([influence.shortName() for influence in influences]),
+             matrices=np.array(matrices, dtype=np.float64).reshape(-1, len(influences), 4, 4))
+    return path
+
+
+def exportPointCache(mesh, path, startFrame=None, endFrame=None):
+    """
+    Writes the mesh's deformed object space points for every frame to a .npy file, (frames, points, 3)
+    """
+    import pymel.core as pmc
+
+    shape = pmc.PyNode(mesh).getShape()
+    currentTime = pmc.currentTime(q=True)
+
+    points = list()
+    try:
+        for frame in _frames(startFrame, endFrame):
+            pmc.currentTime(frame, update=True)
+            points.append([list(p) for p in shape.getPoints(space='object')])
+    finally:
+        pmc.currentTime(currentTime)
+
+    np.save(path, np.array(points, dtype=np.float64))
+    return path
+
+
+def loadWeights(path):
+    """
+    Reads a weights file written by skinutils.saveWeights. Returns the dense weights and the influence names
+    skinutils needs maya, so the reading is repeated here
+    """
+    if path.endswith('.npy'):
+        with open(path[:-4] + '.json') as f:
+            return np.load(path, mmap_mode='r'), json.load(f)['influences']
+
+    data = np.load(path)
+    influences = [str(name) for name in data['influences']]
+    if 'weights' in data.files:
+        return data['weights'], influences
+
+    weights = np.zeros(tuple(data['shape']), dtype=np.float32)
+    weights[data['vertices'], data['columns']] = data['values']
+    return weights, influences
+
+
+def _columns(names, order, what):
+    index = dict((name, i) for i, name in enumerate(names))
+    missing = [name for name in order if name not in index]
+    if missing:
+        raise ValueError('lbs :: {0} missing influences: {1}'.format(what, ', '.join(missing)))
+    return [index[name] for name in order]
+
+
+def skinMatrices(bindMatrices, poseMatrices):
+    """
+    Returns inverse bind * pose for each influence, (frames, influences, 4, 4)
+    """
+    return np.matmul(np.linalg.inv(bindMatrices)[np.newaxis], poseMatrices)
+
+
+def deform(points, weights, matrices, chunk=FRAME_CHUNK):
+    """
+    Linear blend skinning of points (vertices, 3) with weights (vertices, influences)
+    by skin matrices (frames, influences, 4, 4). Returns the deformed points, (frames, vertices, 3)
+    Each vertex's matrices are blended with one matrix product per chunk of frames
+    """
+    points = np.asarray(points, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    matrices = np.asarray(matrices, dtype=np.float64)
+    homogeneous = np.hstack((points, np.ones((len(points), 1))))
+
+    result = np.empty((len(matrices), len(points), 3))
+    for start in range(0, len(matrices), chunk):
+        block = matrices[start:start + chunk, :, :, :3]
+        blended = np.dot(weights, block.transpose(1, 0, 2, 3).reshape(block.shape[1], -1))
+        blended = blended.reshape(len(points), len(block), 4, 3)
+        result[start:start + chunk] = np.einsum('vi,vfij->fvj', homogeneous, blended)
+
+    return result
+
+
+def vertexErrors(deformed, reference):
+    """
+    Distance between deformed and reference points, (frames, vertices)
+    """
+    return np.linalg.norm(np.asarray(deformed) - np.asarray(reference), axis=-1)
+
+
+def errorReport(errors, worst=10):
+    """
+    Returns max, mean and rms error, the max error of every frame, and the vertices with the largest error
+    """
+    perVertex = errors.max(axis=0)
+    order = np.argsort(perVertex)[::-1][:worst]
+    return {'max': float(errors.max()), 'mean': float(errors.mean()), 'rms': float(np.sqrt((errors ** 2).mean())),
+            'frameMax': errors.max(axis=1).tolist(),
+            'worstVertices': [(int(i), float(perVertex[i])) for i in order]}
+
+
+def preview(bindPath, weightsPath, posesPath, referencePath=None):
+    """
+    Deforms the bind points by every pose. Returns the deformed points and the error report against the
+    reference cache, None without one
+    """
+    bind = np.load(bindPath)
+    influences = [str(name) for name in bind['influences']]
+    weights, weightInfluences = loadWeights(weightsPath)
+    poses = np.load(posesPath)
+
+    weights = np.asarray(weights)[:, _columns(weightInfluences, influences, 'weights')]
+    poseMatrices = poses['matrices'][:, _columns([str(name) for name in poses['influences']], influences, 'poses')]
+
+    deformed = deform(bind['points'], weights, skinMatrices(bind['bindMatrices'], poseMatrices))
+
+    report = None
+    if referencePath:
+        report = errorReport(vertexErrors(deformed, np.load(referencePath, mmap_mode='r')))
+
+    return deformed, report
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Deform a skinned mesh by exported poses outside of Maya')
+    parser.add_argument('bind', help='.npz written by lbs.exportBindData')
+    parser.add_argument('weights', help='weights written by skinutils.exportWeights')
+    parser.add_argument('poses', help='.npz written by lbs.exportPoses')
+    parser.add_argument('--reference', help='.npy written by lbs.exportPointCache')
+    parser.add_argument('--output', help='.npy file for the deformed points')
+    parser.add_argument('--max-error', type=float, default=None, help='fail if any vertex is further off')
+    options = parser.parse_args(args)
+
+    start = time.time()
+    deformed, report = preview(options.bind, options.weights, options.poses, options.reference)
+    elapsed = max(time.time() - start, 1e-9)
+    print('{0:d} frames x {1:d} vertices in {2:.2f}s, {3:.1f} frames per second'.format(
+        deformed.shape[0], deformed.shape[1], elapsed, deformed.shape[0] / elapsed))
+
+    if options.output:
+        np.save(options.output, deformed)
+
+    if report is None:
+        return 0
+
+    print('Error max {0:.6f}, mean {1:.6f}, rms {2:.6f}'.format(report['max'], report['mean'], report['rms']))
+    print('Worst vertices:')
+    for index, error in report['worstVertices']:
+        print('    {0:6d} {1:.6f}'.format(index, error))
+
+    if options.max_error is not None and report['max'] > options.max_error:
+        print('FAILED: max error {0:.6f} > {1:.6f}'.format(report['max'], options.max_error))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
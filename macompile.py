@@ -0,0 +1,1061 @@
+"""
+Usage:
+To export the skeleton and any nodes the build expects (main control, switchboard) from Maya:
+    import macompile; macompile.exportSkeleton(['rig_root', 'ctl_main', 'ctl_settings'], 'C:/temp/goldie_skeleton.json')
+
+To compile a rig without Maya, write a build script with a build(cogbiped) function:
+    def build(cogbiped):
+        cogbiped.RiggingHead(name='head', parent='rig_spine4', joints=['rig_spine5', 'rig_head'],
+                             mainControl='ctl_main', switchboard='ctl_settings')
+
+and run:
+    python macompile.py goldie_skeleton.json goldie_build.py goldie_rig.ma
+
+The cogbiped modules run against an in-memory scene through a pymel look-alike that only covers the fk style
+modules. build() gets a cut down cogbiped with RiggingHead, RiggingClavicle, RiggingGenericFK, RiggingFingers,
+and RiggingLeg, RiggingArm and RiggingSpine, which have to be built with lod=LOD_FK. Other classes and other lods
+(ik handles, spline curves, pole vector lines) are rejected before they touch the scene
+
+"""
+from __future__ import print_function
+
+__author__ = 'Sergio Sykes'
+__version__ = 'Fall 2015'
+
+import imp
+import inspect
+import json
+import re
+import sys
+import types
+
+import numpy as np
+
+import npmath
+
+SKELETON_VERSION = 1
+
+SHORT_NAMES = {'v': 'visibility', 't': 'translate', 'r': 'rotate', 's': 'scale', 'ro': 'rotateOrder',
+               'jo': 'jointOrient', 'tx': 'translateX', 'ty': 'translateY', 'tz': 'translateZ',
+               'rx': 'rotateX', 'ry': 'rotateY', 'rz': 'rotateZ', 'sx': 'scaleX', 'sy': 'scaleY', 'sz': 'scaleZ'}
+
+
+DEFAULT_VALUES = {'visibility': 1.0, 'scaleX': 1.0, 'scaleY': 1.0, 'scaleZ': 1.0, 'inheritsTransform': 1.0,
+                  'input2X': 1.0, 'input2Y': 1.0, 'input2Z': 1.0, 'operation': 1.0, 'blender': 0.5,
+                  'radius': 1.0}
+
+TRANSFORM_TYPES = ('transform', 'joint', 'pointConstraint', 'orientConstraint', 'parentConstraint')
+MATRIX_ATTRS = ('matrix', 'inverseMatrix', 'worldMatrix', 'worldInverseMatrix', 'parentMatrix',
+                'parentInverseMatrix')
+
+
+# cogbiped modules build() can use, and the ones among them that need lod=LOD_FK
+FK_MODULES = ('RiggingHead', 'RiggingClavicle', 'RiggingGenericFK', 'RiggingFingers', 'RiggingLeg', 'RiggingArm',
+              'RiggingSpine')
+FK_ONLY_MODULES = ('RiggingLeg', 'RiggingArm', 'RiggingSpine')
+FK_NAMES = ('LOD_FULL', 'LOD_LIGHT', 'LOD_FK', 'MIRROR_SIDES', 'mirrorName', 'mirrorArguments', 'mirrorBuild',
+            'NodeTracker')
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Scene model
+# ---------------------------------------------------------------------------------------------------------------
+
+class Matrix(object):
+    """
+    Row vector 4x4 matrix, multiplies and inverts like pymel's datatypes.Matrix
+    """
+
+    def __init__(self, values=None):
+        self.array = np.eye(4) if values is None else np.array(values, dtype=float).reshape(4, 4)
+
+    def __mul__(self, other):
+        return Matrix(np.dot(self.array, other.array))
+
+    def inverse(self):
+        return Matrix(np.linalg.inv(self.array))
+
+    def __iter__(self):
+        return iter(self.array.tolist())
+
+
+class Scene(object):
+    def __init__(self):
+        self.nodes = list()
+        self.connections = list()
+        self.callbacks = dict()
+        self._callbackId = 0
+
+    def uniqueName(self, name):
+        taken = set(node.shortName() for node in self.nodes)
+        if name not in taken:
+            return name
+
+        base = re.sub(r'\d+$', '', name)
+        i = 1
+        while '{0}{1:d}'.format(base, i) in taken:
+            i += 1
+        return '{0}{1:d}'.format(base, i)
+
+    def create(self, nodeType, name=None, parent=None):
+        cls = Joint if nodeType == 'joint' else Transform if nodeType in TRANSFORM_TYPES else \
+            Shape if nodeType == 'locator' else DependNode
+        node = cls(self, nodeType, self.uniqueName(name or nodeType + '1'))
+        self.nodes.append(node)
+        if parent is not None:
+            node._parent = self.find(parent)
+
+        for callback in list(self.callbacks.values()):
+            callback(node, None)
+        return node
+
+    def find(self, name):
+        if isinstance(name, DependNode):
+            return name
+
+        name = str(name).split('.', 1)[0]
+        shortName = name.split('|')[-1]
+        for node in self.nodes:
+            if node.shortName() == shortName:
+                return node
+        raise ValueError('macompile :: No object matches name: {0}'.format(name))
+
+    def exists(self, name):
+        try:
+            self.find(name)
+            return True
+        except ValueError:
+            return False
+
+    def delete(self, node):
+        for child in node.getChildren():
+            self.delete(child)
+        self.connections = [c for c in self.connections if c[0] is not node and c[2] is not node]
+        if node in self.nodes:
+            self.nodes.remove(node)
+        node._deleted = True
+
+    def connect(self, src, dst, force=False):
+        src, dst = self.plug(src), self.plug(dst)
+        existing = [c for c in self.connections if c[2] is dst.node() and c[3] == dst.path]
+        if existing and not force:
+            raise RuntimeError('macompile :: {0} is already connected'.format(dst))
+        for c in existing:
+            self.connections.remove(c)
+        self.connections.append((src.node(), src.path, dst.node(), dst.path))
+
+    def disconnect(self, src, dst):
+        src, dst = self.plug(src), self.plug(dst)
+        self.connections = [c for c in self.connections if not (c[0] is src.node() and c[1] == src.path and
+                                                                  c[2] is dst.node() and c[3] == dst.path)]
+
+    def plug(self, plug):
+        if isinstance(plug, Attribute):
+            return plug
+        node, attr = str(plug).split('.', 1)
+        return self.find(node).attr(attr)
+
+
+def _suffixes(path):
+    return 'RGB' if 'olor' in path.split('.')[-1] else 'XYZ'
+
+
+def _longName(path):
+    parts = path.split('.')
+    parts[0] = SHORT_NAMES.get(parts[0], parts[0])
+    return '.'.join(parts)
+
+
+class Attribute(object):
+    def __init__(self, node, path):
+        self._node = node
+        self.path = _longName(path)
+
+    def node(self):
+        return self._node
+
+    def name(self):
+        return '{0}.{1}'.format(self._node.name(), self.path)
+
+    def attrName(self, longName=False):
+        return self.path
+
+    def __str__(self):
+        return self.name()
+
+    def __repr__(self):
+        return 'Attribute({0!r})'.format(self.name())
+
+    def __add__(self, other):
+        return str(self) + other
+
+    def __radd__(self, other):
+        return other + str(self)
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.name())
+
+    def __getitem__(self, index):
+        return Attribute(self._node, '{0}[{1:d}]'.format(self.path, index))
+
+    def __getattr__(self, child):
+        if child.startswith('_'):
+            raise AttributeError(child)
+        return Attribute(self._node, '{0}.{1}'.format(self.path, child))
+
+    def get(self):
+        return self._node.getAttrValue(self.path)
+
+    def set(self, *values):
+        self._node.setAttrValue(self.path, values[0] if len(values) == 1 else values)
+
+    def connect(self, other, force=False):
+        self._node.scene.connect(self, other, force)
+
+    def disconnect(self, other):
+        self._node.scene.disconnect(self, other)
+
+    def inputs(self, plugs=False):
+        scene = self._node.scene
+        return [scene.find(c[0]).attr(c[1]) if plugs else c[0] for c in scene.connections
+                if c[2] is self._node and c[3] == self.path]
+
+    def isConnected(self):
+        return bool(self.inputs())
+
+    def getArrayIndices(self):
+        pattern = re.compile(re.escape(self.path) + r'\[(\d+)\]')
+        indices = set()
+        for key in self._node.values:
+            match = pattern.match(key)
+            if match:
+                indices.add(int(match.group(1)))
+        for c in self._node.scene.connections:
+            match = c[2] is self._node and pattern.match(c[3])
+            if match:
+                indices.add(int(match.group(1)))
+        return sorted(indices)
+
+
+class DependNode(object):
+    def __init__(self, scene, nodeType, name):
+        self.scene = scene
+        self._type = nodeType
+        self._name = name
+        self._parent = None
+        self._deleted = False
+        self.values = dict()
+        self.flags = dict()
+        self.userAttrs = list()
+
+    def name(self):
+        return self._name
+
+    def shortName(self):
+        return self._name
+
+    def nodeName(self):
+        return self._name
+
+    def longName(self):
+        return self._name
+
+    def type(self):
+        return self._type
+
+    def nodeType(self):
+        return self._type
+
+    def exists(self):
+        return not self._deleted
+
+    def rename(self, name):
+        self._name = self.scene.uniqueName(name)
+        return self
+
+    def attr(self, name):
+        return Attribute(self, name)
+
+    def hasAttr(self, name):
+        name = _longName(name)
+        return name in self.values or any(a['longName'] == name for a in self.userAttrs) or \
+            name in DEFAULT_VALUES or name in ('translate', 'rotate', 'scale', 'rotateOrder')
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Attribute(self, name)
+
+    def __str__(self):
+        return self.name()
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.name())
+
+    def __add__(self, other):
+        return str(self) + other
+
+    def __radd__(self, other):
+        return other + str(self)
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+    def replace(self, old, new, count=-1):
+        return str(self).replace(old, new, count)
+
+    def __eq__(self, other):
+        if isinstance(other, DependNode):
+            return self is other
+        return isinstance(other, (str, type(u''))) and other.split('|')[-1] == self.shortName()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return id(self)
+
+    def getParent(self):
+        return self._parent
+
+    def getChildren(self):
+        return [node for node in self.scene.nodes if node._parent is self]
+
+    def getAttrValue(self, path):
+        if path in self.values:
+            return self.values[path]
+
+        keys = [path + s for s in _suffixes(path)]
+        if any(key in self.values for key in keys) or path in ('translate', 'rotate', 'scale', 'jointOrient',
+                                                              'rotatePivot', 'scalePivot', 'localPosition'):
+            return tuple(self.getAttrValue(key) for key in keys)
+
+        return DEFAULT_VALUES.get(path, 0.0)
+
+    def setAttrValue(self, path, value):
+        if isinstance(value, Matrix):
+            self.values[path] = value.array.tolist()
+            return
+
+        if isinstance(value, (tuple, list)) and len(value) == 3:
+            for suffix, v in zip(_suffixes(path), value):
+                self.values[path + suffix] = float(v)
+            return
+
+        self.values[path] = value
+
+
+class DagNode(DependNode):
+    def longName(self):
+        names = [self._name]
+        parent = self._parent
+        while parent is not None:
+            names.insert(0, parent._name)
+            parent = parent._parent
+        return '|' + '|'.join(names)
+
+    def getShapes(self):
+        return [child for child in self.getChildren() if isinstance(child, Shape)]
+
+    def getShape(self):
+        shapes = self.getShapes()
+        return shapes[0] if shapes else None
+
+
+class Shape(DagNode):
+    pass
+
+
+class Transform(DagNode):
+    def localArray(self):
+        rotation = npmath.matricesFromEuler(self.getAttrValue('rotate'), int(self.getAttrValue('rotateOrder')))
+        rotation = rotation * np.array(self.getAttrValue('scale'))[:, np.newaxis]
+        if isinstance(self, Joint):
+            rotation = np.dot(rotation, npmath.matricesFromEuler(self.getAttrValue('jointOrient')))
+        return npmath.composeMatrices(rotation, self.getAttrValue('translate'))
+
+    def parentWorldArray(self):
+        if self._parent is None or not self.getAttrValue('inheritsTransform'):
+            return np.eye(4)
+        return self._parent.worldArray()
+
+    def worldArray(self):
+        return np.dot(self.localArray(), self.parentWorldArray())
+
+    def getMatrix(self, worldSpace=False):
+        return Matrix(self.worldArray() if worldSpace else self.localArray())
+
+    def setWorldMatrix(self, matrix, translate=True, rotate=True):
+        """
+        Sets translate and rotate (or jointOrient free rotate on joints) so the node sits at matrix
+        """
+        local = np.dot(matrix, np.linalg.inv(self.parentWorldArray()))
+        if translate:
+            self.setAttrValue('translate', tuple(local[3, :3]))
+        if rotate:
+            rotation = npmath.normalize(local[:3, :3])
+            if isinstance(self, Joint):
+                orient = npmath.matricesFromEuler(self.getAttrValue('jointOrient'))
+                rotation = np.dot(rotation, orient.T)
+            self.setAttrValue('rotate', tuple(npmath.eulerFromMatrices(rotation,
+                                                                       int(self.getAttrValue('rotateOrder')))))
+
+    def getAttrValue(self, path):
+        base = re.sub(r'\[0\]$', '', path)
+        if base in MATRIX_ATTRS:
+            world = self.worldArray()
+            parent = self.parentWorldArray()
+            matrices = {'matrix': self.localArray(), 'worldMatrix': world, 'parentMatrix': parent}
+            matrix = matrices.get(base.replace('Inverse', '').replace('inverseMatrix', 'matrix'))
+            if 'nverse' in base:
+                matrix = np.linalg.inv(matrix)
+            return Matrix(matrix)
+
+        return DependNode.getAttrValue(self, path)
+
+
+class Joint(Transform):
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# pymel and OpenMaya look-alikes, only what the fk style builders call
+# ---------------------------------------------------------------------------------------------------------------
+
+class _Lookup(type):
+    """
+    PyNode('name') and Attribute('node.attr') return the scene's objects, isinstance checks against the scene classes
+    """
+
+    def __call__(cls, name):
+        if '.' in str(name) and cls.cls is DependNode:
+            return cls.find(str(name).split('.', 1)[0]).attr(str(name).split('.', 1)[1])
+        return cls.find(name)
+
+    def __instancecheck__(cls, instance):
+        return isinstance(instance, cls.cls)
+
+
+class ShimModule(types.ModuleType):
+    def __getattr__(self, name):
+        raise AttributeError('macompile :: {0}.{1} is not emulated offline'.format(self.__name__, name))
+
+
+def _name(kwargs, default=None):
+    return kwargs.get('name', kwargs.get('n', default))
+
+
+def makePymel(scene):
+    pmc = ShimModule('pymel.core')
+    nodetypes = ShimModule('pymel.core.nodetypes')
+    nodetypes.DependNode = DependNode
+    nodetypes.DagNode = DagNode
+    nodetypes.Transform = Transform
+    nodetypes.Joint = Joint
+    nodetypes.Shape = Shape
+    pmc.nodetypes = nodetypes
+    pmc.PyNode = _Lookup('PyNode', (object,), {'find': staticmethod(scene.find), 'cls': DependNode})
+    pmc.Attribute = _Lookup('Attribute', (object,), {'find': staticmethod(scene.plug), 'cls': Attribute})
+
+    def warning(message):
+        print('Warning: ' + message)
+
+    def objExists(name):
+        return scene.exists(name)
+
+    def delete(*nodes):
+        for node in _flatten(nodes):
+            if scene.exists(node):
+                scene.delete(scene.find(node))
+
+    def createNode(nodeType, **kwargs):
+        return scene.create(nodeType, _name(kwargs), kwargs.get('parent', kwargs.get('p')))
+
+    def shadingNode(nodeType, **kwargs):
+        node = scene.create(nodeType, _name(kwargs))
+        node.utility = True
+        return node
+
+    def group(*nodes, **kwargs):
+        nodes = _flatten(nodes)
+        parent = scene.find(nodes[0]).getParent() if nodes else None
+        grp = scene.create('transform', _name(kwargs, 'group1' if nodes else 'null1'), parent)
+        for node in nodes:
+            _reparent(scene.find(node), grp)
+        return grp
+
+    def spaceLocator(**kwargs):
+        locator = scene.create('transform', _name(kwargs, 'locator1'))
+        scene.create('locator', locator.name() + 'Shape', locator)
+        return locator
+
+    def rename(node, name):
+        return scene.find(node).rename(name)
+
+    def parent(*nodes, **kwargs):
+        nodes = [scene.find(node) for node in _flatten(nodes)]
+        if kwargs.get('world', kwargs.get('w')):
+            target = None
+        else:
+            nodes, target = nodes[:-1], nodes[-1]
+
+        for node in nodes:
+            _reparent(node, target)
+        return nodes
+
+    def listRelatives(node, **kwargs):
+        node = scene.find(node)
+        if kwargs.get('parent', kwargs.get('p')):
+            result = [node.getParent()] if node.getParent() else []
+        elif kwargs.get('allDescendents', kwargs.get('ad')):
+            result = list()
+            stack = list(reversed(node.getChildren()))
+            while stack:
+                child = stack.pop()
+                result.append(child)
+                stack.extend(reversed(child.getChildren()))
+            result.reverse()
+        elif kwargs.get('shapes', kwargs.get('s')):
+            result = node.getShapes()
+        else:
+            result = node.getChildren()
+
+        nodeType = kwargs.get('type')
+        return [n for n in result if nodeType is None or n.type() == nodeType]
+
+    def xform(node, **kwargs):
+        node = scene.find(node)
+        if kwargs.get('q', kwargs.get('query')):
+            world = node.worldArray() if kwargs.get('worldSpace', kwargs.get('ws')) else node.localArray()
+            if kwargs.get('matrix', kwargs.get('m')):
+                return world.flatten().tolist()
+            if kwargs.get('rotation', kwargs.get('ro')):
+                return list(npmath.eulerFromMatrices(npmath.normalize(world[:3, :3]),
+                                                     int(node.getAttrValue('rotateOrder'))))
+            return list(world[3, :3])
+
+        translation = kwargs.get('translation', kwargs.get('t'))
+        rotation = kwargs.get('rotation', kwargs.get('ro'))
+        if not kwargs.get('worldSpace', kwargs.get('ws')):
+            if translation is not None:
+                node.setAttrValue('translate', translation)
+            if rotation is not None:
+                node.setAttrValue('rotate', rotation)
+            return
+
+        world = node.worldArray()
+        if translation is not None:
+            world[3, :3] = translation
+            node.setWorldMatrix(world, rotate=False)
+        if rotation is not None:
+            world = node.worldArray()
+            world[:3, :3] = npmath.matricesFromEuler(rotation, int(node.getAttrValue('rotateOrder')))
+            node.setWorldMatrix(world, translate=False)
+
+    def makeIdentity(*nodes, **kwargs):
+        for node in [scene.find(n) for n in _flatten(nodes)]:
+            if isinstance(node, Joint):
+                orient = npmath.matricesFromEuler(node.getAttrValue('rotate'), int(node.getAttrValue('rotateOrder')))
+                orient = np.dot(orient, npmath.matricesFromEuler(node.getAttrValue('jointOrient')))
+                node.setAttrValue('jointOrient', tuple(npmath.eulerFromMatrices(orient)))
+                node.setAttrValue('rotate', (0.0, 0.0, 0.0))
+            elif not np.allclose(node.localArray(), np.eye(4)):
+                _freeze(node)
+
+    def getAttr(plug, **kwargs):
+        return scene.plug(plug).get()
+
+    def setAttr(plug, *values, **kwargs):
+        plug = scene.plug(plug)
+        flags = plug.node().flags.setdefault(plug.path, dict())
+        for flag, short in ('lock', 'l'), ('keyable', 'k'), ('channelBox', 'cb'):
+            if flag in kwargs or short in kwargs:
+                flags[flag] = bool(kwargs.get(flag, kwargs.get(short)))
+
+        if values:
+            plug.set(*values)
+
+    def connectAttr(src, dst, **kwargs):
+        scene.connect(src, dst, kwargs.get('force', kwargs.get('f', False)))
+
+    def disconnectAttr(src, dst):
+        scene.disconnect(src, dst)
+
+    def addAttr(node, **kwargs):
+        node = scene.find(node)
+        longName = kwargs.get('longName', kwargs.get('ln'))
+        node.userAttrs.append({'longName': longName,
+                               'attributeType': kwargs.get('attributeType', kwargs.get('at', 'double')),
+                               'min': kwargs.get('minValue', kwargs.get('min')),
+                               'max': kwargs.get('maxValue', kwargs.get('max')),
+                               'default': kwargs.get('defaultValue', kwargs.get('dv', 0.0)),
+                               'keyable': kwargs.get('keyable', kwargs.get('k', False)),
+                               'hidden': kwargs.get('hidden', kwargs.get('h', False))})
+        node.values[longName] = node.userAttrs[-1]['default']
+
+    def attributeQuery(attr, **kwargs):
+        node = scene.find(kwargs.get('node', kwargs.get('n')))
+        if kwargs.get('exists', kwargs.get('ex')):
+            return node.hasAttr(attr)
+
+        userAttr = [a for a in node.userAttrs if a['longName'] == _longName(attr)]
+        if not userAttr:
+            raise ValueError('macompile :: {0}.{1} is not a dynamic attribute'.format(node, attr))
+        userAttr = userAttr[0]
+
+        for flag, short, key in (('keyable', 'k', 'keyable'), ('hidden', 'h', 'hidden'),
+                                 ('attributeType', 'at', 'attributeType')):
+            if kwargs.get(flag, kwargs.get(short)):
+                return userAttr[key]
+        for flag, short, key in (('minimum', 'min', 'min'), ('maximum', 'max', 'max'),
+                                 ('listDefault', 'ld', 'default')):
+            if kwargs.get(flag, kwargs.get(short)):
+                return [userAttr[key]] if userAttr[key] is not None else []
+
+        raise ValueError('macompile :: attributeQuery needs exists, keyable, hidden, attributeType, minimum, '
+                         'maximum or listDefault')
+
+    def constraint(constraintType):
+        def make(*nodes, **kwargs):
+            nodes = [scene.find(node) for node in _flatten(nodes)]
+            targets, constrained = nodes[:-1], nodes[-1]
+            return _constrain(scene, constraintType, targets, constrained, kwargs)
+        return make
+
+    for function in (warning, objExists, delete, createNode, shadingNode, group, spaceLocator, rename, parent,
+                     listRelatives, xform, makeIdentity, getAttr, setAttr, connectAttr, disconnectAttr,
+                     addAttr, attributeQuery):
+        setattr(pmc, function.__name__, function)
+
+    pmc.pointConstraint = constraint('pointConstraint')
+    pmc.orientConstraint = constraint('orientConstraint')
+    pmc.parentConstraint = constraint('parentConstraint')
+
+    def _reparent(node, target):
+        world = node.worldArray()
+        node._parent = target
+        if isinstance(node, Transform):
+            node.setWorldMatrix(world)
+
+    def _freeze(node):
+        """
+        makeIdentity -apply on a transform: its channels go back to identity, children keep their world matrices,
+        locator shapes have the old local matrix baked into their points and the pivots stay where they were
+        """
+        local = node.localArray()
+        children = [(child, child.worldArray()) for child in node.getChildren() if isinstance(child, Transform)]
+
+        pivot = np.dot(np.append(node.getAttrValue('rotatePivot'), 1.0), local)[:3]
+        node.setAttrValue('translate', (0.0, 0.0, 0.0))
+        node.setAttrValue('rotate', (0.0, 0.0, 0.0))
+        node.setAttrValue('scale', (1.0, 1.0, 1.0))
+        node.setAttrValue('rotatePivot', tuple(pivot))
+        node.setAttrValue('scalePivot', tuple(pivot))
+
+        for child, world in children:
+            child.setWorldMatrix(world)
+        for shape in node.getShapes():
+            position = np.dot(np.append(shape.getAttrValue('localPosition'), 1.0), local)[:3]
+            shape.setAttrValue('localPosition', tuple(position))
+
+    return pmc
+
+
+def _flatten(items):
+    result = list()
+    for item in items:
+        if isinstance(item, (list, tuple)):
+            result.extend(_flatten(item))
+        else:
+            result.append(item)
+    return result
+
+
+def _skippedAxes(axes):
+    """
+    'x' or ['x', 'z'] flag values as upper case axis letters, 'none' skips nothing
+    """
+    if isinstance(axes, (str, type(u''))):
+        axes = [axes]
+    return [axis.upper() for axis in axes if axis.lower() in ('x', 'y', 'z')]
+
+
+def _constrain(scene, constraintType, targets, constrained, kwargs):
+    """
+    Creates the constraint node with its target connections, solves it once and connects its outputs
+    Offsets are stored the same way the evaluator in rigeval reads them
+    """
+    maintainOffset = kwargs.get('maintainOffset', kwargs.get('mo', False))
+    name = _name(kwargs, '{0}_{1}1'.format(constrained.shortName(), constraintType))
+    node = scene.create(constraintType, name, constrained)
+
+    skipTranslate = _skippedAxes(kwargs.get('skipTranslate', kwargs.get('st', [])))
+    skipRotate = _skippedAxes(kwargs.get('skipRotate', kwargs.get('sr', [])))
+    previousTranslate = constrained.getAttrValue('translate')
+    previousRotate = constrained.getAttrValue('rotate')
+
+    world = constrained.worldArray()
+    targetMatrices = [target.worldArray() for target in targets]
+    weights = np.ones(len(targets)) / len(targets)
+
+    for i, target in enumerate(targets):
+        plug = 'target[{0:d}]'.format(i)
+        weightName = '{0}W{1:d}'.format(target.shortName(), i)
+        node.userAttrs.append({'longName': weightName, 'shortName': 'w{0:d}'.format(i), 'attributeType': 'double',
+                               'min': 0.0, 'max': None, 'default': 1.0, 'keyable': True, 'hidden': False})
+        node.values[weightName] = 1.0
+        scene.connect(node.attr(weightName), node.attr(plug + '.targetWeight'))
+        scene.connect(target.attr('parentMatrix[0]'), node.attr(plug + '.targetParentMatrix'))
+
+        if constraintType != 'orientConstraint':
+            for attr, targetAttr in ('translate', 'targetTranslate'), ('rotatePivot', 'targetRotatePivot'), \
+                                    ('rotatePivotTranslate', 'targetRotateTranslate'):
+                scene.connect(target.attr(attr), node.attr(plug + '.' + targetAttr))
+        if constraintType != 'pointConstraint':
+            scene.connect(target.attr('rotate'), node.attr(plug + '.targetRotate'))
+            scene.connect(target.attr('rotateOrder'), node.attr(plug + '.targetRotateOrder'))
+            if isinstance(target, Joint):
+                scene.connect(target.attr('jointOrient'), node.attr(plug + '.targetJointOrient'))
+        if constraintType == 'parentConstraint':
+            scene.connect(target.attr('scale'), node.attr(plug + '.targetScale'))
+            if maintainOffset:
+                offset = np.dot(world, np.linalg.inv(targetMatrices[i]))
+                node.setAttrValue(plug + '.targetOffsetTranslate', tuple(offset[3, :3]))
+                node.setAttrValue(plug + '.targetOffsetRotate',
+                                  tuple(npmath.eulerFromMatrices(npmath.normalize(offset[:3, :3]))))
+                targetMatrices[i] = np.dot(offset, targetMatrices[i])
+
+    scene.connect(constrained.attr('parentInverseMatrix[0]'), node.attr('constraintParentInverseMatrix'))
+    if constraintType != 'orientConstraint':
+        scene.connect(constrained.attr('rotatePivot'), node.attr('constraintRotatePivot'))
+        scene.connect(constrained.attr('rotatePivotTranslate'), node.attr('constraintRotateTranslate'))
+    if constraintType != 'pointConstraint':
+        scene.connect(constrained.attr('rotateOrder'), node.attr('constraintRotateOrder'))
+        if isinstance(constrained, Joint):
+            scene.connect(constrained.attr('jointOrient'), node.attr('constraintJointOrient'))
+
+    solved = world.copy()
+    if constraintType != 'orientConstraint':
+        position = np.sum([m[3, :3] * w for m, w in zip(targetMatrices, weights)], axis=0)
+        if constraintType == 'pointConstraint' and maintainOffset:
+            offset = world[3, :3] - position
+            node.setAttrValue('offset', tuple(np.dot(offset, np.linalg.inv(constrained.parentWorldArray())[:3, :3])))
+            position = world[3, :3]
+        solved[3, :3] = position
+    if constraintType != 'pointConstraint':
+        rotations = np.array([npmath.normalize(m[:3, :3]) for m in targetMatrices])
+        rotation = npmath.blendRotations(rotations, weights)
+        if constraintType == 'orientConstraint' and maintainOffset:
+            offset = np.dot(npmath.normalize(world[:3, :3]), rotation.T)
+            node.setAttrValue('offset', tuple(npmath.eulerFromMatrices(offset)))
+            rotation = np.dot(offset, rotation)
+        solved[:3, :3] = rotation * np.linalg.norm(world[:3, :3], axis=1)[:, np.newaxis]
+
+    constrained.setWorldMatrix(solved, translate=constraintType != 'orientConstraint',
+                               rotate=constraintType != 'pointConstraint')
+
+    # skipped channels aren't connected and keep the value they had
+    for i, axis in enumerate('XYZ'):
+        if axis in skipTranslate:
+            constrained.setAttrValue('translate' + axis, previousTranslate[i])
+        if axis in skipRotate:
+            constrained.setAttrValue('rotate' + axis, previousRotate[i])
+
+    outputs = list()
+    if constraintType != 'orientConstraint':
+        outputs.extend(('constraintTranslate' + a, 'translate' + a) for a in 'XYZ' if a not in skipTranslate)
+    if constraintType != 'pointConstraint':
+        outputs.extend(('constraintRotate' + a, 'rotate' + a) for a in 'XYZ' if a not in skipRotate)
+    for src, dst in outputs:
+        scene.connect(node.attr(src), constrained.attr(dst), force=True)
+
+    return node
+
+
+def makeOpenMaya(scene):
+    om = ShimModule('maya.OpenMaya')
+
+    class MDGMessage(object):
+        @staticmethod
+        def addNodeAddedCallback(function, *args):
+            scene._callbackId += 1
+            scene.callbacks[scene._callbackId] = function
+            return scene._callbackId
+
+    class MMessage(object):
+        @staticmethod
+        def removeCallback(callbackId):
+            scene.callbacks.pop(callbackId, None)
+
+    class MObjectHandle(object):
+        def __init__(self, node):
+            self._node = node
+
+        def isValid(self):
+            return self._node.exists()
+
+        def object(self):
+            return self._node
+
+        def hashCode(self):
+            return id(self._node)
+
+    class MFnDependencyNode(object):
+        def __init__(self, node):
+            self._node = node
+
+        def typeName(self):
+            return self._node.type()
+
+        def name(self):
+            return self._node.name()
+
+    om.MDGMessage = MDGMessage
+    om.MMessage = MMessage
+    om.MObjectHandle = MObjectHandle
+    om.MFnDependencyNode = MFnDependencyNode
+    return om
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Skeleton in, Maya ASCII out
+# ---------------------------------------------------------------------------------------------------------------
+
+def exportSkeleton(nodes, path):
+    """
+    Writes the transforms and joints under nodes, with their parents, channels and joint orients, to json
+    """
+    import pymel.core as pmc
+
+    exported = list()
+    for node in nodes:
+        node = pmc.PyNode(node)
+        for item in [node] + list(reversed(pmc.listRelatives(node, allDescendents=True, type='transform') or [])):
+            if item in exported or item.type() not in ('transform', 'joint'):
+                continue
+            exported.append(item)
+
+    entries = list()
+    for node in exported:
+        parent = node.getParent()
+        entry = {'name': node.name(), 'type': node.type(), 'parent': parent.name() if parent in exported else None,
+                 'translate': list(node.translate.get()), 'rotate': list(node.rotate.get()),
+                 'scale': list(node.scale.get()), 'rotateOrder': node.rotateOrder.get()}
+        if node.type() == 'joint':
+            entry['jointOrient'] = list(node.jointOrient.get())
+            entry['radius'] = node.radius.get()
+        entries.append(entry)
+
+    with open(path, 'w') as f:
+        json.dump({'version': SKELETON_VERSION, 'nodes': entries}, f, indent=1)
+
+    return entries
+
+
+def loadSkeleton(scene, path):
+    with open(path) as f:
+        data = json.load(f)
+
+    if data.get('version') != SKELETON_VERSION:
+        raise ValueError('macompile :: Unsupported skeleton version {0}'.format(data.get('version')))
+
+    for entry in data['nodes']:
+        node = scene.create(str(entry['type']), str(entry['name']), entry['parent'] and scene.find(entry['parent']))
+        node.setAttrValue('translate', entry['translate'])
+        node.setAttrValue('rotate', entry['rotate'])
+        node.setAttrValue('scale', entry['scale'])
+        node.setAttrValue('rotateOrder', entry['rotateOrder'])
+        if 'jointOrient' in entry:
+            node.setAttrValue('jointOrient', entry['jointOrient'])
+            node.setAttrValue('radius', entry['radius'])
+
+    return scene
+
+
+def _maValue(value):
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, (list, tuple)) and len(value) == 4 and isinstance(value[0], (list, tuple)):
+        return '-type "matrix" ' + ' '.join(_maValue(v) for row in value for v in row)
+    if isinstance(value, (list, tuple)):
+        return ' '.join(_maValue(v) for v in value)
+    return '{0:.10g}'.format(float(value))
+
+
+def writeMayaAscii(scene, path):
+    """
+    Writes every node, set attribute, attribute flag and connection in the scene to a .ma file
+    """
+    lines = ['//Maya ASCII 2015 scene', '//Name: {0}'.format(path.replace('\\', '/').split('/')[-1]),
+             'requires maya "2015";', 'currentUnit -l centimeter -a degree -t film;']
+
+    ordered = list()
+
+    def visit(node):
+        ordered.append(node)
+        for child in node.getChildren():
+            visit(child)
+
+    for node in scene.nodes:
+        if node.getParent() is None:
+            visit(node)
+
+    for node in ordered:
+        parent = node.getParent()
+        lines.append('createNode {0} -n "{1}"{2};'.format(node.type(), node.shortName(),
+                                                          ' -p "{0}"'.format(parent.longName()) if parent else ''))
+
+        for attr in node.userAttrs:
+            flags = ['-ci true']
+            if attr['keyable']:
+                flags.append('-k true')
+            if attr.get('shortName'):
+                flags.append('-sn "{0}"'.format(attr['shortName']))
+            flags.append('-ln "{0}"'.format(attr['longName']))
+            if attr['min'] is not None:
+                flags.append('-min {0}'.format(_maValue(attr['min'])))
+            if attr['max'] is not None:
+                flags.append('-max {0}'.format(_maValue(attr['max'])))
+            flags.append('-dv {0}'.format(_maValue(attr['default'])))
+            flags.append('-at "{0}"'.format(attr['attributeType']))
+            lines.append('\taddAttr {0};'.format(' '.join(flags)))
+
+        for attr, value in sorted(node.values.items()):
+            if any(c[2] is node and c[3] == attr for c in scene.connections):
+                continue
+            lines.append('\tsetAttr ".{0}" {1};'.format(attr, _maValue(value)))
+
+        for attr, flags in sorted(node.flags.items()):
+            text = ' '.join('-{0} {1}'.format(short, 'on' if flags[flag] else 'off')
+                            for flag, short in (('lock', 'l'), ('keyable', 'k'), ('channelBox', 'cb'))
+                            if flag in flags)
+            if text:
+                lines.append('\tsetAttr {0} ".{1}";'.format(text, attr))
+
+    for srcNode, srcAttr, dstNode, dstAttr in scene.connections:
+        lines.append('connectAttr "{0}.{1}" "{2}.{3}";'.format(srcNode.longName(), srcAttr, dstNode.longName(),
+                                                              dstAttr))
+
+    for node in ordered:
+        if getattr(node, 'utility', False):
+            lines.append('connectAttr "{0}.message" ":defaultRenderUtilityList1.utilities" -na;'.format(node.name()))
+
+    lines.append('// End of {0}'.format(path.replace('\\', '/').split('/')[-1]))
+
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    return len(ordered)
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Compiling
+# ---------------------------------------------------------------------------------------------------------------
+
+SHIMMED_MODULES = ('pymel', 'pymel.core', 'maya', 'maya.OpenMaya', 'advutils', 'cogbiped')
+
+
+def _fkOnly(moduleClass, lodFk):
+    """
+    Subclass of moduleClass that refuses to build at any lod but LOD_FK
+    """
+    def __init__(self, *args, **kwargs):
+        lod = inspect.getcallargs(moduleClass.__init__, self, *args, **kwargs).get('lod')
+        if lod != lodFk:
+            raise ValueError('macompile :: {0} can only be compiled with lod=LOD_FK'.format(moduleClass.__name__))
+        moduleClass.__init__(self, *args, **kwargs)
+
+    return type(moduleClass.__name__, (moduleClass,), {'__init__': __init__})
+
+
+def fkModules(cogbiped):
+    """
+    Returns a module with the parts of cogbiped the offline scene can build, the FK_MODULES and FK_NAMES.
+    Leg, arm and spine classes raise ValueError unless built with lod=LOD_FK
+    """
+    fk = ShimModule('cogbiped')
+    for name in FK_NAMES + FK_MODULES:
+        setattr(fk, name, getattr(cogbiped, name))
+
+    for name in FK_ONLY_MODULES:
+        setattr(fk, name, _fkOnly(getattr(cogbiped, name), cogbiped.LOD_FK))
+
+    return fk
+
+
+def compileRig(skeletonPath, build, outputPath):
+    """
+    Loads the skeleton into a new in-memory scene, imports cogbiped against it and calls build() with
+    fkModules(cogbiped). build can be a function or the path to a python file defining build(cogbiped)
+    Writes the result to outputPath. Returns the number of nodes written
+    """
+    if not callable(build):
+        build = imp.load_source('macompile_build', build).build
+
+    scene = loadSkeleton(Scene(), skeletonPath)
+
+    pmc = makePymel(scene)
+    pymel = ShimModule('pymel')
+    pymel.core = pmc
+    maya = ShimModule('maya')
+    maya.OpenMaya = makeOpenMaya(scene)
+
+    saved = dict((name, sys.modules.pop(name)) for name in SHIMMED_MODULES if name in sys.modules)
+    sys.modules.update({'pymel': pymel, 'pymel.core': pmc, 'pymel.core.nodetypes': pmc.nodetypes,
+                        'maya': maya, 'maya.OpenMaya': maya.OpenMaya})
+    try:
+        import cogbiped
+        build(fkModules(cogbiped))
+    finally:
+        for name in SHIMMED_MODULES + ('pymel.core.nodetypes',):
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+    return writeMayaAscii(scene, outputPath)
+
+
+def _compileJob(job):
+    return compileRig(*job)
+
+
+def compileMany(jobs, processes=None):
+    """
+    Compiles (skeletonPath, buildScriptPath, outputPath) jobs in parallel, one per process
+    Returns the number of nodes written for each job
+    """
+    import multiprocessing
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_compileJob, jobs)
+    finally:
+        pool.close()
+
+
+def main(args=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Compile a cogbiped rig to a Maya ASCII file without Maya')
+    parser.add_argument('skeleton', help='json file written by macompile.exportSkeleton')
+    parser.add_argument('build', help='python file defining build(cogbiped)')
+    parser.add_argument('output', help='.ma file to write')
+    options = parser.parse_args(args)
+
+    start = time.time()
+    count = compileRig(options.skeleton, options.build, options.output)
+    print('{0:d} nodes written to {1} in {2:.2f}s'.format(count, options.output, time.time() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,50 @@
 from itertools import izip
 import pymel.core as pmc
 
-from advutils import getAttribute, alignObjects
+from advutils import getAttribute, alignObjects, cachedNode, batchSetAttr
+
+SPACE_OFFSET_ATTR = 'spaceOffset'
+
+
+def buildSpaceEnum(controller, attrName, enumNames):
+    """
+    Creates the enum attribute on controller, or adds any of enumNames it's missing, in a single pass
+    Returns the attribute and a dict of space name to enum index
+    """
+
+    if pmc.attributeQuery(attrName, node=controller, exists=True):
+        enumAttr = getAttribute(controller, attrName)
+        existing = enumAttr.getEnums()
+        spaceNames = sorted(existing.keys(), key=existing.value)
+        missing = [name for name in enumNames if name not in existing]
+
+        if missing:
+            spaceNames.extend(missing)
+            enumAttr.setEnums(spaceNames)
+    else:
+        spaceNames = list(enumNames)
+        enumAttr = getAttribute(controller, attrName, at='enum', enumName=':'.join(spaceNames), keyable=True)
+
+    return enumAttr, dict((name, i) for i, name in enumerate(spaceNames))
+
+
+def makeSpaceWeightCondition(enumAttr, index, weightAttrs, name):
+    """
+    Creates condition node outputting 1 when enumAttr is set to index, 0 otherwise, into all weightAttrs
+    """
+
+    weightConditionNode = pmc.createNode('condition', n=name)
+
+    enumAttr.connect(weightConditionNode.firstTerm)
+
+    weightConditionNode.secondTerm.set(index)
+    weightConditionNode.colorIfTrueR.set(1)
+    weightConditionNode.colorIfFalseR.set(0)
+
+    for weightAttr in weightAttrs:
+        weightConditionNode.outColorR.connect(weightAttr)
+
+    return weightConditionNode
 
 
 def makeMultiConstraint(targets, source, controller, attrName='currentSpace',
@@ -11,9 +54,9 @@ def makeMultiConstraint(targets, source, controller, attrName='currentSpace',
 
     """
 
-    targets = map(pmc.PyNode, targets)
-    source = pmc.PyNode(source)
-    controller = pmc.PyNode(controller)
+    targets = map(cachedNode, targets)
+    source = cachedNode(source)
+    controller = cachedNode(controller)
     loc = None
 
     if enumNames is None:
@@ -33,17 +76,11 @@ def makeMultiConstraint(targets, source, controller, attrName='currentSpace',
     if not rotation:
         skipRotate = ['x', 'y', 'z']
 
+    enumAttr, spaceIndices = buildSpaceEnum(controller, attrName, enumNames)
+
     constraints = list()
     for tgt, spaceName in izip(targets, enumNames):
-        enumAttr = getAttribute(controller, attrName,
-                                at='enum', enumName=spaceName, keyable=True, longName=attrName)
-
-        spaceEnums = enumAttr.getEnums().keys()
-        if spaceName not in spaceEnums:
-            spaceEnums.append(spaceName)
-            enumAttr.setEnums(spaceEnums)
-
-        index = enumAttr.getEnums().value(spaceName)
+        index = spaceIndices[spaceName]
 
         if tgt is loc:
             tgtTransform = loc
@@ -67,16 +104,192 @@ def makeMultiConstraint(targets, source, controller, attrName='currentSpace',
         pointWeightAttr = pointWeightList[-1]
 
         nodeName = 'con_{0}_to_{1}_weight_{2:d}'.format(source.shortName(), tgt.shortName(), index)
+        makeSpaceWeightCondition(enumAttr, index, [pointWeightAttr, orientWeightAttr], nodeName)
+
+    return loc
+
+
+def makeSpaceSwitch(targets, source, controller, attrName='currentSpace',
+                    enumNames=None, addLocatorSpace=True, translation=True, rotation=True, maintainOffset=False):
+    """
+    Same interface and result as makeMultiConstraint, but source gets a single parentConstraint to all targets.
+    parentConstraint keeps an offset per target, so the tgt_ transforms aren't needed either.
+    Builds one condition node per space on the enum, so adding spaces adds one weight and one node each
+    """
+
+    targets = map(cachedNode, targets)
+    source = cachedNode(source)
+    controller = cachedNode(controller)
+    loc = None
+
+    if enumNames is None:
+        enumNames = map(str, targets)
+    else:
+        enumNames = list(enumNames)
+
+    if addLocatorSpace:
+        loc = pmc.spaceLocator(n='loc_follow_' + source.shortName())
+        alignObjects(loc, source)
+        targets.append(loc)
+        enumNames.append('locator')
+
+    skipTranslate = 'none'
+    if not translation:
+        skipTranslate = ['x', 'y', 'z']
+
+    skipRotate = 'none'
+    if not rotation:
+        skipRotate = ['x', 'y', 'z']
+
+    enumAttr, spaceIndices = buildSpaceEnum(controller, attrName, enumNames)
+
+    constraint = pmc.parentConstraint(targets + [source], skipTranslate=skipTranslate, skipRotate=skipRotate,
+                                      maintainOffset=maintainOffset,
+                                      name='con_{0}_spaces_parentConstraint'.format(source.shortName()))
+    constraint.interpType.set(2)
+
+    for tgt, spaceName, weightAttr in izip(targets, enumNames, constraint.getWeightAliasList()):
+        index = spaceIndices[spaceName]
+        nodeName = 'con_{0}_to_{1}_weight_{2:d}'.format(source.shortName(), tgt.shortName(), index)
+        makeSpaceWeightCondition(enumAttr, index, [weightAttr], nodeName)
 
-        weightConditionNode = pmc.createNode('condition', n=nodeName)
+    return loc
 
-        enumAttr.connect(weightConditionNode.firstTerm)
 
-        weightConditionNode.secondTerm.set(index)
-        weightConditionNode.colorIfTrueR.set(1)
-        weightConditionNode.colorIfFalseR.set(0)
+def makeMatrixSpaceSwitch(targets, source, controller, attrName='currentSpace',
+                          enumNames=None, addLocatorSpace=True, translation=True, rotation=True, maintainOffset=False):
+    """
+    Same interface as makeMultiConstraint, without constraints or tgt_ transforms.
+    Each space's offset is stored on source.spaceOffset[index]. Two choice nodes on the enum pick the current
+    offset and target worldMatrix, a multMatrix puts them into source's parent space and a decomposeMatrix
+    drives translate and rotate. The network is the same four nodes no matter how many spaces there are.
+    Use matchSpace to switch without popping and resetSpaceOffsets to rebake the offsets
+    decomposeMatrix in Maya 2015 only outputs xyz rotations and knows nothing of joint orients, so with rotation
+    the source has to be a transform with an xyz rotate order
+    """
+
+    targets = map(cachedNode, targets)
+    source = cachedNode(source)
+    controller = cachedNode(controller)
+    loc = None
+
+    if rotation:
+        if isinstance(source, pmc.nodetypes.Joint):
+            raise ValueError('multi :: {0} is a joint, matrix space switches can only rotate transforms'.format(
+                source))
+        if source.rotateOrder.get() != 0:
+            raise ValueError('multi :: {0} has to use the xyz rotate order for a matrix space switch'.format(source))
+
+    pmc.loadPlugin('matrixNodes', quiet=True)
+
+    if enumNames is None:
+        enumNames = map(str, targets)
+    else:
+        enumNames = list(enumNames)
+
+    if addLocatorSpace:
+        loc = pmc.spaceLocator(n='loc_follow_' + source.shortName())
+        alignObjects(loc, source)
+        targets.append(loc)
+        enumNames.append('locator')
+
+    enumAttr, spaceIndices = buildSpaceEnum(controller, attrName, enumNames)
+    offsetAttr = getAttribute(source, SPACE_OFFSET_ATTR, at='matrix', multi=True)
+
+    basename = source.shortName()
+    targetChoice = pmc.createNode('choice', n='chc_{0}_space_target'.format(basename))
+    offsetChoice = pmc.createNode('choice', n='chc_{0}_space_offset'.format(basename))
+    spaceMatrix = pmc.createNode('multMatrix', n='mmx_{0}_space'.format(basename))
+    spaceDecompose = pmc.createNode('decomposeMatrix', n='dcm_{0}_space'.format(basename))
+
+    sourceMatrix = source.getMatrix(worldSpace=True)
+    offsets = list()
+    for tgt, spaceName in izip(targets, enumNames):
+        index = spaceIndices[spaceName]
+
+        # without maintainOffset source snaps to the target, same as the constraint versions
+        offset = pmc.datatypes.Matrix()
+        if maintainOffset:
+            offset = sourceMatrix * tgt.worldMatrix[0].get().inverse()
+
+        offsets.append(('{0}[{1:d}]'.format(offsetAttr, index), offset))
+        tgt.worldMatrix[0].connect(targetChoice.input[index])
+        offsetAttr[index].connect(offsetChoice.input[index])
+
+    batchSetAttr(offsets)
+
+    enumAttr.connect(targetChoice.selector)
+    enumAttr.connect(offsetChoice.selector)
+
+    offsetChoice.output.connect(spaceMatrix.matrixIn[0])
+    targetChoice.output.connect(spaceMatrix.matrixIn[1])
+    source.parentInverseMatrix[0].connect(spaceMatrix.matrixIn[2])
+
+    spaceMatrix.matrixSum.connect(spaceDecompose.inputMatrix)
+
+    if translation:
+        spaceDecompose.outputTranslate.connect(source.translate)
+
+    if rotation:
+        spaceDecompose.outputRotate.connect(source.rotate)
+
+    return loc
+
+
+def _spaceTargets(source):
+    """
+    Returns the target choice node and a dict of enum index to the target driving that space
+    """
+
+    decompose = source.translate.listConnections(source=True, destination=False, type='decomposeMatrix') or \
+        source.rotate.listConnections(source=True, destination=False, type='decomposeMatrix')
+    spaceMatrix = decompose[0].inputMatrix.listConnections(source=True, destination=False)[0]
+    targetChoice = spaceMatrix.matrixIn[1].listConnections(source=True, destination=False)[0]
+
+    targets = dict()
+    for index in targetChoice.input.getArrayIndices():
+        connections = targetChoice.input[index].listConnections(source=True, destination=False)
+        if connections:
+            targets[index] = connections[0]
+
+    return targetChoice, targets
+
+
+def resetSpaceOffsets(source, indices=None):
+    """
+    Rebakes the offsets of a makeMatrixSpaceSwitch source so every space holds source where it is right now.
+    All offsets are computed together and written with one batched setAttr
+    indices limits the rebake to those enum indices
+    """
+
+    source = cachedNode(source)
+    targetChoice, targets = _spaceTargets(source)
+    if indices is not None:
+        targets = dict((i, targets[i]) for i in indices if i in targets)
+
+    sourceMatrix = source.getMatrix(worldSpace=True)
+    offsets = [('{0}.{1}[{2:d}]'.format(source, SPACE_OFFSET_ATTR, index),
+                sourceMatrix * tgt.worldMatrix[0].get().inverse())
+               for index, tgt in targets.iteritems()]
+
+    return batchSetAttr(offsets)
+
+
+def matchSpace(source, spaceName, controller=None, attrName='currentSpace'):
+    """
+    Switches a makeMatrixSpaceSwitch source to spaceName without it moving.
+    The new space's offset is rebaked from the current pose before the enum is changed.
+    controller defaults to the node driving the space choice
+    """
+
+    source = cachedNode(source)
+    targetChoice, targets = _spaceTargets(source)
 
-        weightConditionNode.outColorR.connect(pointWeightAttr)
-        weightConditionNode.outColorR.connect(orientWeightAttr)
+    if controller is None:
+        enumAttr = targetChoice.selector.listConnections(source=True, destination=False, plugs=True)[0]
+    else:
+        enumAttr = getAttribute(controller, attrName)
 
-    return loc
\ No newline at end of file
+    index = enumAttr.getEnums().value(spaceName)
+    resetSpaceOffsets(source, [index])
+    enumAttr.set(index)
@@ -0,0 +1,279 @@
+"""
+Vectorized math shared by the batch tools.
+Follows maya's conventions: row vectors (point * matrix), matrix rows are the x, y, z axes and the translation,
+angles in degrees.
+Only depends on numpy, so offline tools can use it outside of maya
+"""
+__author__ = 'Sergio Sykes'
+__version__ = 'Fall 2015'
+
+import numpy as np
+
+ROTATE_ORDERS = ('xyz', 'yzx', 'zxy', 'xzy', 'yxz', 'zyx')  # same order as the rotateOrder enum
+AXES = {'x': 0, 'y': 1, 'z': 2}
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=float)
+    lengths = np.linalg.norm(vectors, axis=-1)[..., np.newaxis]
+    return vectors / np.where(lengths > 0.0, lengths, 1.0)
+
+
+def axisRotations(angles, axis):
+    """
+    Returns rotation matrices (..., 3, 3) around a single axis for angles in degrees
+    """
+
+    radians = np.radians(np.asarray(angles, dtype=float))
+    cos, sin = np.cos(radians), np.sin(radians)
+    result = np.zeros(radians.shape + (3, 3))
+
+    i, j = [a for a in range(3) if a != axis]
+    result[..., axis, axis] = 1.0
+    result[..., i, i] = cos
+    result[..., i, j] = sin
+    result[..., j, i] = -sin
+    result[..., j, j] = cos
+
+    # y rotations run the other way around in row vector form
+    if axis == 1:
+        result[..., i, j], result[..., j, i] = -sin, sin
+
+    return result
+
+
+def matricesFromEuler(angles, rotateOrder='xyz'):
+    """
+    Returns rotation matrices (..., 3, 3) from euler angles (..., 3) in degrees
+    rotateOrder can be the order string or the rotateOrder enum index
+    """
+
+    if not isinstance(rotateOrder, str):
+        rotateOrder = ROTATE_ORDERS[rotateOrder]
+
+    angles = np.asarray(angles, dtype=float)
+    result = None
+    for axisName in rotateOrder:
+        axis = AXES[axisName]
+        rotation = axisRotations(angles[..., axis], axis)
+        result = rotation if result is None else np.matmul(result, rotation)
+
+    return result
+
+
+def eulerFromMatrices(matrices, rotateOrder='xyz'):
+    """
+    Returns euler angles (..., 3) in degrees from rotation matrices (..., 3, 3)
+    Works for any rotate order by permuting the axes into the xyz solve
+    """
+
+    if not isinstance(rotateOrder, str):
+        rotateOrder = ROTATE_ORDERS[rotateOrder]
+
+    matrices = np.asarray(matrices, dtype=float)[..., :3, :3]
+    order = [AXES[a] for a in rotateOrder]
+
+    # permuting the axes turns any order into an xyz solve
+    # odd permutations mirror the space, which runs every rotation backwards
+    parity = 1.0 if rotateOrder in ('xyz', 'yzx', 'zxy') else -1.0
+    m = matrices[..., order, :][..., :, order]
+
+    second = np.arcsin(np.clip(-m[..., 0, 2], -1.0, 1.0))
+    first = np.arctan2(m[..., 1, 2], m[..., 2, 2])
+    third = np.arctan2(m[..., 0, 1], m[..., 0, 0])
+
+    # gimbal locked, put all of the rotation on the first axis
+    locked = np.abs(m[..., 0, 2]) > 1.0 - 1e-9
+    first = np.where(locked, np.arctan2(-m[..., 2, 1], m[..., 1, 1]), first)
+    third = np.where(locked, 0.0, third)
+
+    result = np.zeros(matrices.shape[:-2] + (3,))
+    result[..., order[0]] = first
+    result[..., order[1]] = second
+    result[..., order[2]] = third
+
+    return np.degrees(result * parity)
+
+
+def composeMatrices(rotations, translations):
+    """
+    Returns 4x4 matrices (..., 4, 4) from rotation (..., 3, 3) and translation (..., 3) arrays
+    """
+
+    rotations = np.asarray(rotations, dtype=float)
+    result = np.zeros(rotations.shape[:-2] + (4, 4))
+    result[..., :3, :3] = rotations
+    result[..., 3, :3] = translations
+    result[..., 3, 3] = 1.0
+    return result
+
+
+def quaternionsFromMatrices(matrices):
+    """
+    Returns unit quaternions (..., 4) as (x, y, z, w) from rotation matrices (..., 3, 3)
+    """
+
+    m = np.asarray(matrices, dtype=float)[..., :3, :3]
+    trace = m[..., 0, 0] + m[..., 1, 1] + m[..., 2, 2]
+
+    # each row of candidates solves from the largest of w, x, y, z to stay stable
+    candidates = np.stack([
+        np.stack([m[..., 1, 2] - m[..., 2, 1], m[..., 2, 0] - m[..., 0, 2], m[..., 0, 1] - m[..., 1, 0],
+                  1.0 + trace], axis=-1),
+        np.stack([1.0 + m[..., 0, 0] - m[..., 1, 1] - m[..., 2, 2], m[..., 0, 1] + m[..., 1, 0],
+                  m[..., 2, 0] + m[..., 0, 2], m[..., 1, 2] - m[..., 2, 1]], axis=-1),
+        np.stack([m[..., 0, 1] + m[..., 1, 0], 1.0 - m[..., 0, 0] + m[..., 1, 1] - m[..., 2, 2],
+                  m[..., 1, 2] + m[..., 2, 1], m[..., 2, 0] - m[..., 0, 2]], axis=-1),
+        np.stack([m[..., 2, 0] + m[..., 0, 2], m[..., 1, 2] + m[..., 2, 1],
+                  1.0 - m[..., 0, 0] - m[..., 1, 1] + m[..., 2, 2], m[..., 0, 1] - m[..., 1, 0]], axis=-1)],
+        axis=-2)
+
+    diagonal = np.stack([trace, m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]], axis=-1)
+    best = np.argmax(diagonal, axis=-1)[..., np.newaxis, np.newaxis]
+    result = np.take_along_axis(candidates, best, axis=-2)[..., 0, :]
+    return normalize(result)
+
+
+def matricesFromQuaternions(quaternions):
+    """
+    Returns rotation matrices (..., 3, 3) from quaternions (..., 4) as (x, y, z, w)
+    """
+
+    x, y, z, w = np.moveaxis(normalize(quaternions), -1, 0)
+    return np.stack([
+        np.stack([1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y + z * w), 2.0 * (x * z - y * w)], axis=-1),
+        np.stack([2.0 * (x * y - z * w), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z + x * w)], axis=-1),
+        np.stack([2.0 * (x * z + y * w), 2.0 * (y * z - x * w), 1.0 - 2.0 * (x * x + y * y)], axis=-1)],
+        axis=-2)
+
+
+def blendRotations(rotations, weights):
+    """
+    Weighted average of rotation matrices (K, ..., 3, 3) with weights (K, ...), through quaternions
+    aligned to the first one's hemisphere. Returns rotation matrices (..., 3, 3)
+    """
+
+    quaternions = quaternionsFromMatrices(rotations)
+    signs = np.sign(np.sum(quaternions * quaternions[:1], axis=-1))
+    signs = np.where(signs == 0.0, 1.0, signs)
+    blended = np.sum(quaternions * (signs * np.asarray(weights, dtype=float))[..., np.newaxis], axis=0)
+    return matricesFromQuaternions(blended)
+
+
+def aimMatrices(positions, upVectors, aimAxis=0, upAxis=1):
+    """
+    Returns rotation matrices (N, 3, 3) aiming each position at the next one
+    The last position keeps the aim of the one before it.
+    upVectors can be a single vector or one per position, they're orthogonalized against the aim
+    """
+
+    positions = np.asarray(positions, dtype=float)
+    aims = np.diff(positions, axis=0)
+    aims = normalize(np.concatenate((aims, aims[-1:]), axis=0))
+
+    ups = np.broadcast_to(np.asarray(upVectors, dtype=float), aims.shape)
+    ups = normalize(ups - aims * np.sum(ups * aims, axis=-1)[:, np.newaxis])
+
+    sideAxis = 3 - aimAxis - upAxis
+    sides = np.cross(aims, ups)
+    # keep the result right handed no matter which axes aim and up are
+    if (upAxis - aimAxis) % 3 != 1:
+        sides = -sides
+
+    result = np.zeros(aims.shape[:-1] + (3, 3))
+    result[:, aimAxis] = aims
+    result[:, upAxis] = ups
+    result[:, sideAxis] = sides
+    return result
+
+
+def jointLocals(positions, rotations, parentMatrix=None):
+    """
+    Converts a chain's world positions (N, 3) and rotations (N, 3, 3) into the translate and
+    jointOrient values of joints parented one under the other, with rotate channels left at zero.
+    parentMatrix is the 4x4 world matrix the first joint is parented under, None for the world.
+    Scale on the parent is kept out of the orientation
+    """
+
+    positions = np.asarray(positions, dtype=float)
+    rotations = np.asarray(rotations, dtype=float)
+    if parentMatrix is None:
+        parentMatrix = np.identity(4)
+
+    parentMatrix = np.asarray(parentMatrix, dtype=float)
+    parentSpaces = np.concatenate((parentMatrix[np.newaxis, :3, :3], rotations[:-1]))
+    parentRotations = np.concatenate((normalize(parentMatrix[np.newaxis, :3, :3]), rotations[:-1]))
+    parentPositions = np.concatenate((parentMatrix[np.newaxis, 3, :3], positions[:-1]))
+
+    translations = np.einsum('ni,nij->nj', positions - parentPositions, np.linalg.inv(parentSpaces))
+    orients = eulerFromMatrices(np.matmul(rotations, np.swapaxes(parentRotations, -1, -2)))
+
+    return translations, orients
+
+
+def mayaKnotsToFull(knots):
+    """
+    Maya stores degree + spans - 1 knots, pad with the outer knots that other tools expect
+    """
+
+    knots = np.asarray(knots, dtype=float)
+    return np.concatenate((knots[:1], knots, knots[-1:]))
+
+
+def bsplinePoints(cvs, knots, degree, params, derivative=False):
+    """
+    Evaluates a nurbs curve with unit weights at params using de Boor's algorithm on all params at once
+    knots is the full knot vector (len(cvs) + degree + 1 values)
+    If derivative is True, returns the first derivative instead of the positions
+    """
+
+    cvs = np.asarray(cvs, dtype=float)
+    knots = np.asarray(knots, dtype=float)
+    params = np.clip(np.asarray(params, dtype=float), knots[degree], knots[-degree - 1])
+
+    if derivative:
+        # derivative of a b-spline is a b-spline of one degree less over the cv differences
+        spans = (knots[degree + 1:degree + len(cvs)] - knots[1:len(cvs)])[:, np.newaxis]
+        diffCvs = degree * np.diff(cvs, axis=0) / np.where(spans > 0.0, spans, 1.0)
+        return bsplinePoints(diffCvs, knots[1:-1], degree - 1, params)
+
+    if degree == 0:
+        index = np.clip(np.searchsorted(knots, params, side='right') - 1, 0, len(cvs) - 1)
+        return cvs[index]
+
+    span = np.searchsorted(knots, params, side='right') - 1
+    span = np.clip(span, degree, len(cvs) - 1)
+
+    # points taking part in each evaluation, (params, degree + 1, 3)
+    offsets = np.arange(-degree, 1)
+    points = cvs[span[:, np.newaxis] + offsets]
+
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            i = span + j - degree
+            left = knots[i]
+            right = knots[i + degree - r + 1]
+            denom = np.where(right - left > 0.0, right - left, 1.0)
+            alpha = ((params - left) / denom)[:, np.newaxis]
+            points[:, j] = (1.0 - alpha) * points[:, j - 1] + alpha * points[:, j]
+
+    return points[:, degree]
+
+
+def arcLengthParams(cvs, knots, degree, count, samples=None):
+    """
+    Returns count curve params spaced at equal arc length from start to end of the curve
+    Arc length is measured over a dense polyline, samples controls its resolution
+    """
+
+    knots = np.asarray(knots, dtype=float)
+    if samples is None:
+        samples = max(64, 16 * len(cvs), 8 * count)
+
+    dense = np.linspace(knots[degree], knots[-degree - 1], samples)
+    points = bsplinePoints(cvs, knots, degree, dense)
+
+    lengths = np.concatenate(([0.0], np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))))
+    targets = np.linspace(0.0, lengths[-1], count)
+
+    return np.interp(targets, lengths, dense)
@@ -0,0 +1,308 @@
+"""
+Usage:
+To store the current pose of every control in the scene:
+    import poselib
+    library = poselib.PoseLibrary('C:/temp/goldie_poses')
+    library.add('crouch', *poselib.capturePose())
+
+To apply, blend or mirror it:
+    library.apply('crouch')
+    library.apply('crouch', weight=0.5)
+    poselib.applyPose(*poselib.mirrorPose(*library.pose('crouch')))
+
+Poses are rows of one memory mapped array, one column per control channel. Channels a pose doesn't have are NaN
+and left alone when it's applied
+"""
+__author__ = 'Sergio Sykes'
+__version__ = 'Fall 2015'
+
+import json
+import math
+import os
+
+import maya.OpenMaya as om
+import numpy as np
+import pymel.core as pmc
+
+from advutils import batchSetAttr
+from cogbiped import MIRROR_SIDES, mirrorName
+
+LIBRARY_VERSION = 1
+
+# sign of each channel when copied to the opposite side's control. Sided controls built from behavior mirrored
+# joints carry their rotations over and flip their translations. World aligned controls, center or sided like the
+# ik legs, flip translateX, rotateY and rotateZ when mirrored across YZ. Anything else carries over
+SIDED_MIRROR_SIGNS = {'translateX': -1.0, 'translateY': -1.0, 'translateZ': -1.0}
+CENTER_MIRROR_SIGNS = {'translateX': -1.0, 'rotateY': -1.0, 'rotateZ': -1.0}
+
+# how far a rest frame can be from the world axes and still count as aligned to them
+FRAME_TOLERANCE = 1e-3
+
+
+def findControls(namespace=''):
+    """
+    Returns every ctl_ transform of a built rig
+    """
+    prefix = namespace.rstrip(':') + ':' if namespace else ''
+    return pmc.ls(prefix + 'ctl_*', type='transform')
+
+
+def poseChannels(controls):
+    """
+    Returns the keyable channels of controls that can be set, as 'control.attribute' names
+    """
+    channels = list()
+    for control in controls:
+        control = pmc.PyNode(control)
+        for attr in pmc.listAttr(control, keyable=True, unlocked=True, scalar=True) or []:
+            plug = control.attr(attr)
+            if plug.isSettable() and plug.type() in ('double', 'doubleLinear', 'doubleAngle', 'float', 'bool',
+                                                     'long', 'short', 'enum'):
+                channels.append('{0}.{1}'.format(control.name(), plug.attrName(longName=True)))
+
+    return channels
+
+
+def _plugs(channels):
+    selection = om.MSelectionList()
+    for channel in channels:
+        selection.add(channel)
+
+    plugs = list()
+    for i in xrange(selection.length()):
+        plug = om.MPlug()
+        selection.getPlug(i, plug)
+        plugs.append(plug)
+
+    return plugs
+
+
+def _isAngle(plug):
+    attribute = plug.attribute()
+    return attribute.hasFn(om.MFn.kUnitAttribute) and \
+        om.MFnUnitAttribute(attribute).unitType() == om.MFnUnitAttribute.kAngle
+
+
+def readChannels(channels):
+    """
+    Reads channels straight from their plugs, without a getAttr per channel. Angles are returned in degrees
+    """
+    values = list()
+    for plug in _plugs(channels):
+        value = plug.asDouble()
+        values.append(math.degrees(value) if _isAngle(plug) else value)
+
+    return np.array(values, dtype=np.float64)
+
+
+def capturePose(controls=None):
+    """
+    Returns the channels of controls (every control in the scene if None) and their current values
+    """
+    channels = poseChannels(findControls() if controls is None else controls)
+    return channels, readChannels(channels)
+
+
+def alignPose(channels, values, targetChannels):
+    """
+    Returns values reordered to targetChannels, NaN where the pose has no value
+    """
+    lookup = dict((channel, i) for i, channel in enumerate(channels))
+    indices = np.array([lookup.get(channel, -1) for channel in targetChannels], dtype=np.int64)
+
+    result = np.asarray(values, dtype=np.float64)[np.maximum(indices, 0)]
+    result[indices < 0] = np.nan
+    return result
+
+
+def applyPose(channels, values, weight=1.0):
+    """
+    Sets the channels to values in one batched setAttr, NaN values are skipped.
+    With a weight below 1 the channels are blended from their current values
+    Returns the number of channels set
+    """
+    values = np.asarray(values, dtype=np.float64)
+    controls = set(channel.split('.', 1)[0] for channel in channels)
+    existing = set(control for control in controls if pmc.objExists(control))
+
+    keep = [i for i, channel in enumerate(channels)
+            if not np.isnan(values[i]) and channel.split('.', 1)[0] in existing]
+    channels = [channels[i] for i in keep]
+    values = values[keep]
+
+    if weight != 1.0:
+        values = readChannels(channels) * (1.0 - weight) + values * weight
+
+    return batchSetAttr(zip(channels, values.tolist()))
+
+
+def blendPoses(poses, weights):
+    """
+    Weighted average of poses (count, channels), NaN values don't take part
+    """
+    poses = np.asarray(poses, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)[:, np.newaxis] * ~np.isnan(poses)
+
+    total = weights.sum(axis=0)
+    blended = np.nansum(np.where(np.isnan(poses), 0.0, poses) * weights, axis=0) / np.where(total > 0.0, total, 1.0)
+    blended[total == 0.0] = np.nan
+    return blended
+
+
+def restFrames(controls):
+    """
+    Returns a dictionary of control name to its rest frame, the world rotation (3, 3) of its parent,
+    for the controls that exist
+    """
+    frames = dict()
+    for control in controls:
+        if not pmc.objExists(control):
+            continue
+
+        parent = pmc.PyNode(control).getParent()
+        matrix = np.array(pmc.xform(parent, q=True, worldSpace=True, matrix=True) if parent else np.eye(4).ravel(),
+                          dtype=np.float64).reshape(4, 4)
+        frames[control] = matrix[:3, :3] / np.linalg.norm(matrix[:3, :3], axis=1)[:, np.newaxis]
+
+    return frames
+
+
+def reflectionSigns(frame):
+    """
+    Channel signs that mirror a control with rest frame (3, 3) across YZ onto itself, or an identically
+    oriented control on the other side. None when the frame's axes aren't along or across the mirror plane
+    """
+    # each local axis either lies in the YZ plane (kept) or along X (flipped)
+    normal = np.asarray(frame, dtype=np.float64)[:, 0]
+    if np.any(np.minimum(np.abs(normal), np.abs(np.abs(normal) - 1.0)) > FRAME_TOLERANCE):
+        return None
+
+    flips = 1.0 - 2.0 * np.round(normal ** 2)
+    signs = dict()
+    for i, axis in enumerate('XYZ'):
+        signs['translate' + axis] = flips[i]
+        signs['rotate' + axis] = -flips[i]
+    return signs
+
+
+def mirrorPose(channels, values, sides=MIRROR_SIDES, frames=None):
+    """
+    Returns the pose for the opposite side: sided channels move to the other side's control,
+    center channels stay on theirs, both with the mirror signs applied.
+    frames - dictionary of control to rest frame, from the scene with restFrames() if None.
+    Center controls, and sided controls oriented the same way on both sides (world aligned ik controls),
+    get their signs from their frame. Sided controls oriented differently are behavior mirrored
+    """
+    controls = [channel.split('.', 1)[0] for channel in channels]
+    if frames is None:
+        unique = set(controls)
+        frames = restFrames(unique | set(mirrorName(control, sides) for control in unique))
+
+    controlSigns = dict()
+    for control in set(controls):
+        mirroredControl = mirrorName(control, sides)
+        frame, mirroredFrame = frames.get(control), frames.get(mirroredControl)
+
+        signs = None
+        if frame is not None and (mirroredControl == control or
+                                  (mirroredFrame is not None and np.allclose(frame, mirroredFrame,
+                                                                             atol=FRAME_TOLERANCE))):
+            signs = reflectionSigns(frame)
+        if signs is None:
+            signs = SIDED_MIRROR_SIGNS if mirroredControl != control else CENTER_MIRROR_SIGNS
+        controlSigns[control] = signs
+
+    mirroredChannels = list()
+    signs = np.ones(len(channels))
+    for i, channel in enumerate(channels):
+        control, attr = channel.split('.', 1)
+        mirroredChannels.append('{0}.{1}'.format(mirrorName(control, sides), attr))
+        signs[i] = controlSigns[control].get(attr, 1.0)
+
+    return mirroredChannels, np.asarray(values, dtype=np.float64) * signs
+
+
+class PoseLibrary(object):
+    """
+    A directory holding poses.npy, a (capacity, channels) float32 array memory mapped for browsing,
+    and index.json with the channel names and the pose names in row order
+    """
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._indexPath = os.path.join(directory, 'index.json')
+        self._arrayPath = os.path.join(directory, 'poses.npy')
+
+        if os.path.exists(self._indexPath):
+            with open(self._indexPath) as f:
+                index = json.load(f)
+            if index.get('version') != LIBRARY_VERSION:
+                raise ValueError('poselib :: Unsupported library version {0}'.format(index.get('version')))
+            self.channels = index['channels']
+            self.names = index['poses']
+            self._array = np.load(self._arrayPath, mmap_mode='r+')
+        else:
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            self.channels = list()
+            self.names = list()
+            self._array = None
+
+    @property
+    def poses(self):
+        """
+        The stored poses, (poses, channels). Rows follow self.names, columns self.channels
+        """
+        if self._array is None:
+            return np.zeros((0, len(self.channels)), dtype=np.float32)
+        return self._array[:len(self.names), :len(self.channels)]
+
+    def _resize(self, rows, columns):
+        capacity = self._array.shape[0] if self._array is not None else 0
+        width = self._array.shape[1] if self._array is not None else 0
+        if rows <= capacity and columns <= width:
+            return
+
+        grown = np.full((max(rows, capacity * 2, 16), max(columns, width)), np.nan, dtype=np.float32)
+        if self._array is not None:
+            grown[:capacity, :width] = self._array
+            del self._array
+
+        np.save(self._arrayPath, grown)
+        self._array = np.load(self._arrayPath, mmap_mode='r+')
+
+    def _save(self):
+        self._array.flush()
+        with open(self._indexPath, 'w') as f:
+            json.dump({'version': LIBRARY_VERSION, 'channels': self.channels, 'poses': self.names}, f, indent=1)
+
+    def add(self, name, channels, values):
+        """
+        Stores a pose, replacing the one with the same name. New channels are added to the library
+        """
+        known = set(self.channels)
+        self.channels.extend(channel for channel in channels if channel not in known)
+
+        row = self.names.index(name) if name in self.names else len(self.names)
+        self._resize(row + 1, len(self.channels))
+        self._array[row, :len(self.channels)] = alignPose(channels, values, self.channels)
+
+        if row == len(self.names):
+            self.names.append(name)
+        self._save()
+
+    def pose(self, name):
+        """
+        Returns the library channels and the pose's values, NaN where it has none
+        """
+        return self.channels, np.array(self.poses[self.names.index(name)], dtype=np.float64)
+
+    def apply(self, name, weight=1.0):
+        return applyPose(*self.pose(name), weight=weight)
+
+    def blend(self, names, weights):
+        """
+        Applies the weighted average of the named poses
+        """
+        rows = [self.names.index(name) for name in names]
+        return applyPose(self.channels, blendPoses(self.poses[rows], weights))
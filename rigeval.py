@@ -0,0 +1,583 @@
+"""
+Usage:
+To export the pose graph of cogbiped modules built inside a cogbiped.NodeTracker:
+    import rigeval; rigeval.exportModules([leftLeg, rightLeg, spine], 'C:/temp/goldie_pose.json')
+
+To evaluate poses outside of Maya, values are arrays with one entry per frame:
+    import rigeval
+    evaluator = rigeval.PoseEvaluator(rigeval.loadGraph('C:/temp/goldie_pose.json'))
+    values = evaluator.evaluate({'ctl_fk_left_leg_knee.rotateZ': angles})
+    kneeMatrices = values['rig_left_leg_knee.worldMatrix']
+
+From the command line, prints frames per second over random control values:
+    python rigeval.py goldie_pose.json --frames 10000
+
+"""
+from __future__ import print_function
+
+__author__ = 'Sergio Sykes'
+__version__ = 'Fall 2015'
+
+import json
+import sys
+import time
+
+import numpy as np
+
+import npmath
+
+GRAPH_VERSION = 1
+
+# scalar channels of compound attributes, by node type
+CHANNELS = {
+    'multiplyDivide': {'input1': 'XYZ', 'input2': 'XYZ', 'output': 'XYZ'},
+    'reverse': {'input': 'XYZ', 'output': 'XYZ'},
+    'blendColors': {'color1': 'RGB', 'color2': 'RGB', 'output': 'RGB'},
+    'clamp': {'input': 'RGB', 'min': 'RGB', 'max': 'RGB', 'output': 'RGB'},
+    'setRange': {'value': 'XYZ', 'min': 'XYZ', 'max': 'XYZ', 'oldMin': 'XYZ', 'oldMax': 'XYZ', 'outValue': 'XYZ'},
+    'condition': {'colorIfTrue': 'RGB', 'colorIfFalse': 'RGB', 'outColor': 'RGB'},
+    'distanceBetween': {'point1': 'XYZ', 'point2': 'XYZ'},
+    'decomposeMatrix': {'outputTranslate': 'XYZ', 'outputRotate': 'XYZ', 'outputScale': 'XYZ'},
+    'pointConstraint': {'offset': 'XYZ', 'constraintTranslate': 'XYZ'},
+    'orientConstraint': {'offset': 'XYZ', 'constraintRotate': 'XYZ'},
+    'parentConstraint': {'constraintTranslate': 'XYZ', 'constraintRotate': 'XYZ'},
+    'transform': {'translate': 'XYZ', 'rotate': 'XYZ', 'scale': 'XYZ', 'rotatePivot': 'XYZ'},
+    'joint': {'translate': 'XYZ', 'rotate': 'XYZ', 'scale': 'XYZ', 'jointOrient': 'XYZ'},
+}
+
+# single value inputs, by node type
+SCALARS = {
+    'multiplyDivide': ('operation',),
+    'blendColors': ('blender',),
+    'condition': ('operation', 'firstTerm', 'secondTerm'),
+    'remapValue': ('inputValue', 'inputMin', 'inputMax', 'outputMin', 'outputMax'),
+    'transform': ('rotateOrder', 'inheritsTransform'),
+    'joint': ('rotateOrder', 'inheritsTransform'),
+}
+
+# matrix inputs, by node type. Multi attributes are exported per index
+MATRICES = {
+    'distanceBetween': ('inMatrix1', 'inMatrix2'),
+    'decomposeMatrix': ('inputMatrix',),
+}
+
+CONSTRAINT_TYPES = ('pointConstraint', 'orientConstraint', 'parentConstraint')
+TRANSFORM_OUTPUTS = ('matrix', 'inverseMatrix', 'worldMatrix', 'worldInverseMatrix', 'parentMatrix',
+                     'parentInverseMatrix')
+
+
+def _plugName(plug):
+    """
+    node.attribute with the [0] of single instance world space attributes removed
+    """
+    name = plug.name(fullDagPath=False)
+    for attr in TRANSFORM_OUTPUTS:
+        name = name.replace('.{0}[0]'.format(attr), '.' + attr)
+    return name
+
+
+def _jsonValue(value):
+    """
+    Plain floats and lists for json, matrices become lists of rows
+    """
+    try:
+        return float(value)
+    except TypeError:
+        return [_jsonValue(item) for item in value]
+
+
+def _evaluatorType(node):
+    # exact types only, other transform types like ikHandles and aim constraints compute more than a transform
+    nodeType = node.type()
+    if nodeType in CHANNELS or nodeType in SCALARS or nodeType in ('multMatrix', 'wtAddMatrix', 'remapValue'):
+        return nodeType
+    return None
+
+
+def exportGraph(nodes, inputs=(), path=None):
+    """
+    Records values and incoming connections of the plugs the evaluator understands for nodes.
+    Compound connections are split into their channels, unsupported nodes are left out and anything
+    they drive keeps its current value. They are listed by type under 'unsupported', with a warning
+    for transform types other than transforms and joints. inputs are the plugs evaluate() is expected to drive
+    Writes json to path if given. Returns the graph dictionary
+    """
+    import pymel.core as pmc
+
+    nodes = [pmc.PyNode(node) for node in nodes]
+    exported = dict((node.name(), _evaluatorType(node)) for node in nodes if _evaluatorType(node))
+    graph = {'version': GRAPH_VERSION, 'nodes': dict(), 'connections': dict(), 'constants': dict(),
+             'inputs': list(inputs), 'unsupported': dict()}
+
+    for node in nodes:
+        if node.name() not in exported:
+            graph['unsupported'][node.name()] = node.type()
+
+    frozen = sorted(name for name in graph['unsupported'] if 'transform' in pmc.nodeType(name, inherited=True))
+    if frozen:
+        pmc.warning('rigeval :: Unsupported transform types hold still at their current values: ' +
+                    ', '.join(frozen))
+
+    def connect(dst, plug):
+        sources = plug.inputs(plugs=True)
+        if sources and sources[0].node().name() in exported:
+            # outputs the evaluator doesn't compute, like custom attributes, keep their current value
+            graph['connections'][dst] = _plugName(sources[0])
+            graph['constants'][_plugName(sources[0])] = _jsonValue(sources[0].get())
+            return True
+        return False
+
+    for node in nodes:
+        nodeType = exported.get(node.name())
+        if nodeType is None:
+            continue
+
+        data = {'type': nodeType, 'values': dict()}
+
+        for attr, suffixes in CHANNELS.get(nodeType, {}).items():
+            parentSources = node.attr(attr).inputs(plugs=True)
+            for i, suffix in enumerate(suffixes):
+                child = '{0}.{1}{2}'.format(node.name(), attr, suffix)
+                data['values'][attr + suffix] = _jsonValue(node.attr(attr + suffix).get())
+
+                if parentSources and parentSources[0].node().name() in exported:
+                    # compound to compound, pair up the channels in order
+                    source = parentSources[0]
+                    sourceSuffixes = CHANNELS.get(exported[source.node().name()], {}).get(source.attrName(longName=True))
+                    if sourceSuffixes:
+                        graph['connections'][child] = '{0}.{1}{2}'.format(source.node().name(),
+                                                                          source.attrName(longName=True),
+                                                                          sourceSuffixes[i])
+                else:
+                    connect(child, node.attr(attr + suffix))
+
+        for attr in SCALARS.get(nodeType, ()):
+            data['values'][attr] = _jsonValue(node.attr(attr).get())
+            connect('{0}.{1}'.format(node.name(), attr), node.attr(attr))
+
+        for attr in MATRICES.get(nodeType, ()):
+            data['values'][attr] = _jsonValue(node.attr(attr).get())
+            connect('{0}.{1}'.format(node.name(), attr), node.attr(attr))
+
+        if nodeType in ('multMatrix', 'wtAddMatrix'):
+            multi = node.matrixIn if nodeType == 'multMatrix' else node.wtMatrix
+            data['indices'] = multi.getArrayIndices()
+            for i in data['indices']:
+                matrixPlug = multi[i] if nodeType == 'multMatrix' else multi[i].matrixIn
+                key = 'matrixIn[{0:d}]'.format(i)
+                data['values'][key] = _jsonValue(matrixPlug.get())
+                connect('{0}.{1}'.format(node.name(), key), matrixPlug)
+
+                if nodeType == 'wtAddMatrix':
+                    key = 'weightIn[{0:d}]'.format(i)
+                    data['values'][key] = _jsonValue(multi[i].weightIn.get())
+                    connect('{0}.{1}'.format(node.name(), key), multi[i].weightIn)
+
+        if nodeType == 'remapValue':
+            data['ramp'] = sorted((node.value[i].value_Position.get(), node.value[i].value_FloatValue.get())
+                                  for i in node.value.getArrayIndices())
+
+        if nodeType in ('transform', 'joint'):
+            parent = node.getParent()
+            data['parent'] = parent.name() if parent and parent.name() in exported else None
+            if parent and data['parent'] is None:
+                data['values']['parentMatrix'] = _jsonValue(parent.worldMatrix[0].get())
+
+        if nodeType in CONSTRAINT_TYPES:
+            constrained = [dst for dst in pmc.listConnections(node, source=False, destination=True)
+                           if dst != node and dst.name() in exported]
+            data['constrained'] = constrained[0].name() if constrained else None
+            data['targets'] = list()
+            for i in node.target.getArrayIndices():
+                target = node.target[i]
+                targetNode = target.targetParentMatrix.inputs()
+                targetSource = target.targetParentMatrix.inputs(plugs=True)
+                weightKey = 'targetWeight[{0:d}]'.format(i)
+
+                # weights go through the alias attribute on the constraint itself
+                weightSource = target.targetWeight.inputs(plugs=True)
+                weightPlug = weightSource[0] if weightSource and weightSource[0].node() == node else target.targetWeight
+                data['values'][weightKey] = _jsonValue(weightPlug.get())
+                connect('{0}.{1}'.format(node.name(), weightKey), weightPlug)
+
+                entry = {'node': targetNode[0].name() if targetNode else None, 'weight': weightKey}
+                if targetNode and exported.get(entry['node']) == 'multMatrix':
+                    # a matrix network standing in for a target transform, its matrix is the target's world
+                    entry['plug'] = _plugName(targetSource[0])
+                elif targetNode and entry['node'] not in exported:
+                    # targets outside the graph hold still at their current world matrix
+                    entry['matrix'] = _jsonValue(targetNode[0].worldMatrix[0].get())
+                    entry['node'] = None
+                if nodeType == 'parentConstraint':
+                    entry['offsetTranslate'] = _jsonValue(target.targetOffsetTranslate.get())
+                    entry['offsetRotate'] = _jsonValue(target.targetOffsetRotate.get())
+                data['targets'].append(entry)
+
+        graph['nodes'][node.name()] = data
+
+    if path:
+        with open(path, 'w') as f:
+            json.dump(graph, f, indent=1, sort_keys=True)
+
+    return graph
+
+
+def exportModules(modules, path=None):
+    """
+    Exports the nodes created by cogbiped Rigging modules and their joints,
+    with every keyable channel of their controls as inputs
+    """
+    import pymel.core as pmc
+
+    nodes = list()
+    inputs = list()
+    for module in modules:
+        nodes.extend(module.createdNodes())
+        nodes.extend(pmc.PyNode(jnt) for jnt in module.joints())
+        for control in module.controls():
+            control = pmc.PyNode(control)
+            inputs.extend('{0}.{1}'.format(control.name(), attr) for attr in
+                          pmc.listAttr(control, keyable=True, scalar=True) or [])
+
+    unique = list()
+    for node in nodes:
+        if node not in unique:
+            unique.append(node)
+
+    return exportGraph(unique, inputs, path)
+
+
+def loadGraph(path):
+    with open(path) as f:
+        graph = json.load(f)
+
+    if graph.get('version') != GRAPH_VERSION:
+        raise ValueError('rigeval :: Unsupported graph version {0}'.format(graph.get('version')))
+
+    return graph
+
+
+class PoseEvaluator(object):
+    """
+    Evaluates an exported graph for many frames at once. Every plug holds an array with one value per frame,
+    matrices are (frames, 4, 4). Constraint offsets are applied in the space of their target (parent) or the
+    constrained object's parent (point, orient); ik solvers aren't evaluated, ik driven joints keep their
+    exported rotation
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+        self._nodes = graph['nodes']
+        self._connections = graph['connections']
+        self._constants = graph.get('constants', {})
+        self._order = self._evaluationOrder()
+        self._values = dict()
+        self._frames = 1
+
+    def _evaluationOrder(self):
+        upstream = dict((name, set()) for name in self._nodes)
+        for dst, src in self._connections.items():
+            dstNode, srcNode = dst.split('.', 1)[0], src.split('.', 1)[0]
+            if dstNode != srcNode:
+                upstream[dstNode].add(srcNode)
+
+        for name, data in self._nodes.items():
+            if data.get('parent'):
+                upstream[name].add(data['parent'])
+            for target in data.get('targets', ()):
+                if target['node'] in upstream:
+                    upstream[name].add(target['node'])
+
+            # constraints read the constrained node's parent, never the node itself
+            constrained = self._nodes.get(data.get('constrained'))
+            if constrained is not None:
+                upstream[name].discard(data['constrained'])
+                if constrained.get('parent'):
+                    upstream[name].add(constrained['parent'])
+
+        order = list()
+        ready = sorted(name for name, deps in upstream.items() if not deps)
+        downstream = dict((name, set()) for name in self._nodes)
+        for name, deps in upstream.items():
+            for dep in deps:
+                downstream[dep].add(name)
+
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for child in sorted(downstream[name]):
+                upstream[child].discard(name)
+                if not upstream[child]:
+                    ready.append(child)
+
+        if len(order) != len(self._nodes):
+            raise ValueError('rigeval :: Graph has a cycle through {0}'.format(
+                ', '.join(sorted(set(self._nodes) - set(order)))))
+
+        return order
+
+    def get(self, plug):
+        """
+        Returns the value of plug for every frame: inputs first, then its connection, then the exported value
+        """
+        if plug in self._values:
+            return self._values[plug]
+
+        if plug in self._connections:
+            return self.get(self._connections[plug])
+
+        node, attr = plug.split('.', 1)
+        values = self._nodes[node]['values']
+        value = np.asarray(values[attr] if attr in values else self._constants[plug], dtype=float)
+        return np.broadcast_to(value, (self._frames,) + value.shape)
+
+    def vector(self, node, attr, suffixes='XYZ'):
+        return np.stack([self.get('{0}.{1}{2}'.format(node, attr, s)) for s in suffixes], axis=-1)
+
+    def setVector(self, node, attr, values, suffixes='XYZ'):
+        for i, s in enumerate(suffixes):
+            self._values['{0}.{1}{2}'.format(node, attr, s)] = values[..., i]
+
+    def evaluate(self, inputs, frames=None):
+        """
+        inputs - dictionary of plug to values, a scalar or one value per frame
+        Returns a dictionary of plug to values for every computed plug
+        """
+        if frames is None:
+            frames = max([np.size(value) for value in inputs.values()] + [1])
+
+        self._frames = frames
+        self._values = dict()
+        for plug, value in inputs.items():
+            self._values[plug] = np.broadcast_to(np.asarray(value, dtype=float), (frames,))
+
+        for name in self._order:
+            data = self._nodes[name]
+            getattr(self, '_eval_' + data['type'])(name, data)
+
+        return self._values
+
+    def _eval_multiplyDivide(self, name, data):
+        a, b = self.vector(name, 'input1'), self.vector(name, 'input2')
+        operation = self.get(name + '.operation')[..., np.newaxis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = np.where(operation == 1, a * b,
+                              np.where(operation == 2, np.where(b != 0.0, a / np.where(b != 0.0, b, 1.0), a),
+                                       np.where(operation == 3, np.power(a, b), a)))
+        self.setVector(name, 'output', result)
+
+    def _eval_reverse(self, name, data):
+        self.setVector(name, 'output', 1.0 - self.vector(name, 'input'))
+
+    def _eval_blendColors(self, name, data):
+        blender = self.get(name + '.blender')[..., np.newaxis]
+        result = self.vector(name, 'color1', 'RGB') * blender + self.vector(name, 'color2', 'RGB') * (1.0 - blender)
+        self.setVector(name, 'output', result, 'RGB')
+
+    def _eval_clamp(self, name, data):
+        result = np.minimum(np.maximum(self.vector(name, 'input', 'RGB'), self.vector(name, 'min', 'RGB')),
+                            self.vector(name, 'max', 'RGB'))
+        self.setVector(name, 'output', result, 'RGB')
+
+    def _eval_setRange(self, name, data):
+        oldMin, oldMax = self.vector(name, 'oldMin'), self.vector(name, 'oldMax')
+        span = np.where(oldMax != oldMin, oldMax - oldMin, 1.0)
+        ratio = (np.clip(self.vector(name, 'value'), np.minimum(oldMin, oldMax), np.maximum(oldMin, oldMax)) -
+                 oldMin) / span
+        minimum = self.vector(name, 'min')
+        self.setVector(name, 'outValue', minimum + ratio * (self.vector(name, 'max') - minimum))
+
+    def _eval_remapValue(self, name, data):
+        inputMin, inputMax = self.get(name + '.inputMin'), self.get(name + '.inputMax')
+        span = np.where(inputMax != inputMin, inputMax - inputMin, 1.0)
+        ratio = (self.get(name + '.inputValue') - inputMin) / span
+
+        ramp = data.get('ramp') or [(0.0, 0.0), (1.0, 1.0)]
+        curve = np.interp(ratio, [p for p, v in ramp], [v for p, v in ramp])
+
+        outputMin = self.get(name + '.outputMin')
+        self._values[name + '.outValue'] = outputMin + curve * (self.get(name + '.outputMax') - outputMin)
+
+    def _eval_condition(self, name, data):
+        first, second = self.get(name + '.firstTerm'), self.get(name + '.secondTerm')
+        operation = self.get(name + '.operation')
+        tests = [first == second, first != second, first > second, first >= second, first < second,
+                 first <= second]
+        result = np.zeros(first.shape, dtype=bool)
+        for i, test in enumerate(tests):
+            result |= (operation == i) & test
+
+        self.setVector(name, 'outColor', np.where(result[..., np.newaxis], self.vector(name, 'colorIfTrue', 'RGB'),
+                                                  self.vector(name, 'colorIfFalse', 'RGB')), 'RGB')
+
+    def _eval_distanceBetween(self, name, data):
+        points = list()
+        for i in (1, 2):
+            point = self.vector(name, 'point{0:d}'.format(i))
+            matrix = self.get('{0}.inMatrix{1:d}'.format(name, i))
+            points.append(np.einsum('fi,fij->fj', point, matrix[..., :3, :3]) + matrix[..., 3, :3])
+        self._values[name + '.distance'] = np.linalg.norm(points[1] - points[0], axis=-1)
+
+    def _eval_multMatrix(self, name, data):
+        result = None
+        for i in data['indices']:
+            matrix = self.get('{0}.matrixIn[{1:d}]'.format(name, i))
+            result = matrix if result is None else np.matmul(result, matrix)
+        self._values[name + '.matrixSum'] = result if result is not None else np.broadcast_to(np.eye(4), (
+            self._frames, 4, 4))
+
+    def _eval_wtAddMatrix(self, name, data):
+        result = np.zeros((self._frames, 4, 4))
+        for i in data['indices']:
+            weight = self.get('{0}.weightIn[{1:d}]'.format(name, i))
+            result = result + self.get('{0}.matrixIn[{1:d}]'.format(name, i)) * weight[:, np.newaxis, np.newaxis]
+        self._values[name + '.matrixSum'] = result
+
+    def _eval_decomposeMatrix(self, name, data):
+        matrix = self.get(name + '.inputMatrix')
+        scale = np.linalg.norm(matrix[..., :3, :3], axis=-1)
+        rotation = matrix[..., :3, :3] / np.where(scale > 0.0, scale, 1.0)[..., np.newaxis]
+
+        # decomposeMatrix in Maya 2015 always outputs xyz rotations
+        self.setVector(name, 'outputTranslate', matrix[..., 3, :3])
+        self.setVector(name, 'outputRotate', npmath.eulerFromMatrices(rotation))
+        self.setVector(name, 'outputScale', scale)
+
+    def _localMatrix(self, name, data):
+        rotation = npmath.matricesFromEuler(self.vector(name, 'rotate'), int(self.get(name + '.rotateOrder')[0]))
+        scale = self.vector(name, 'scale')
+
+        # row vectors: scale, then rotation (about the rotate pivot) and joint orient, then translation
+        matrix = rotation * scale[..., :, np.newaxis]
+        translation = self.vector(name, 'translate')
+        if data['type'] == 'joint':
+            matrix = np.matmul(matrix, npmath.matricesFromEuler(self.vector(name, 'jointOrient')))
+        else:
+            pivot = self.vector(name, 'rotatePivot')
+            translation = translation + pivot - np.einsum('fi,fij->fj', pivot, matrix)
+
+        return npmath.composeMatrices(matrix, translation)
+
+    def parentMatrix(self, name):
+        data = self._nodes[name]
+        if data.get('parent') and self.get(name + '.inheritsTransform')[0]:
+            return self._values[data['parent'] + '.worldMatrix']
+        if 'parentMatrix' in data['values'] and self.get(name + '.inheritsTransform')[0]:
+            return self.get(name + '.parentMatrix')
+        return np.broadcast_to(np.eye(4), (self._frames, 4, 4))
+
+    def _eval_transform(self, name, data):
+        local = self._localMatrix(name, data)
+        parent = self.parentMatrix(name)
+        world = np.matmul(local, parent)
+
+        self._values[name + '.matrix'] = local
+        self._values[name + '.inverseMatrix'] = np.linalg.inv(local)
+        self._values[name + '.parentMatrix'] = parent
+        self._values[name + '.parentInverseMatrix'] = np.linalg.inv(parent)
+        self._values[name + '.worldMatrix'] = world
+        self._values[name + '.worldInverseMatrix'] = np.linalg.inv(world)
+
+    _eval_joint = _eval_transform
+
+    def _constraintTargets(self, name, data):
+        matrices = list()
+        weights = list()
+        for target in data['targets']:
+            if 'plug' in target:
+                matrix = self.get(target['plug'])
+            elif target['node'] is not None:
+                matrix = self._values[target['node'] + '.worldMatrix']
+            elif 'matrix' in target:
+                matrix = np.broadcast_to(np.asarray(target['matrix'], dtype=float), (self._frames, 4, 4))
+            else:
+                continue
+
+            if 'offsetRotate' in target:
+                offset = npmath.composeMatrices(npmath.matricesFromEuler(target['offsetRotate']),
+                                                target['offsetTranslate'])
+                matrix = np.matmul(offset, matrix)
+
+            matrices.append(matrix)
+            weights.append(self.get('{0}.{1}'.format(name, target['weight'])))
+
+        weights = np.array(weights)
+        total = np.sum(weights, axis=0)
+        return np.array(matrices), weights / np.where(total != 0.0, total, 1.0)
+
+    def _constrainedParentInverse(self, data):
+        constrained = data.get('constrained')
+        if constrained not in self._nodes:
+            return np.broadcast_to(np.eye(4), (self._frames, 4, 4))
+        return np.linalg.inv(self.parentMatrix(constrained))
+
+    def _localRotation(self, data, worldRotation, parentInverse):
+        constrained = data.get('constrained')
+        rotation = np.matmul(worldRotation, parentInverse[..., :3, :3])
+
+        if constrained in self._nodes and self._nodes[constrained]['type'] == 'joint':
+            orient = npmath.matricesFromEuler(self.vector(constrained, 'jointOrient'))
+            rotation = np.matmul(rotation, np.swapaxes(orient, -1, -2))
+
+        order = int(self.get(constrained + '.rotateOrder')[0]) if constrained in self._nodes else 0
+        return npmath.eulerFromMatrices(rotation, order)
+
+    def _eval_pointConstraint(self, name, data):
+        matrices, weights = self._constraintTargets(name, data)
+        position = np.sum(matrices[..., 3, :3] * weights[..., np.newaxis], axis=0)
+        parentInverse = self._constrainedParentInverse(data)
+        local = np.einsum('fi,fij->fj', position, parentInverse[..., :3, :3]) + parentInverse[..., 3, :3]
+        self.setVector(name, 'constraintTranslate', local + self.vector(name, 'offset'))
+
+    def _eval_orientConstraint(self, name, data):
+        matrices, weights = self._constraintTargets(name, data)
+        rotation = npmath.blendRotations(npmath.normalize(matrices[..., :3, :3]), weights)
+        offset = npmath.matricesFromEuler(self.vector(name, 'offset'))
+        rotation = np.matmul(offset, rotation)
+        self.setVector(name, 'constraintRotate',
+                       self._localRotation(data, rotation, self._constrainedParentInverse(data)))
+
+    def _eval_parentConstraint(self, name, data):
+        matrices, weights = self._constraintTargets(name, data)
+        position = np.sum(matrices[..., 3, :3] * weights[..., np.newaxis], axis=0)
+        rotation = npmath.blendRotations(npmath.normalize(matrices[..., :3, :3]), weights)
+
+        parentInverse = self._constrainedParentInverse(data)
+        local = np.einsum('fi,fij->fj', position, parentInverse[..., :3, :3]) + parentInverse[..., 3, :3]
+        self.setVector(name, 'constraintTranslate', local)
+        self.setVector(name, 'constraintRotate', self._localRotation(data, rotation, parentInverse))
+
+
+def benchmark(graph, frames=1000, seed=0):
+    """
+    Evaluates frames random values on the graph's inputs, in the -10 to 10 range
+    Returns frames per second
+    """
+    evaluator = PoseEvaluator(graph)
+    rng = np.random.RandomState(seed)
+    inputs = dict((plug, rng.uniform(-10.0, 10.0, frames)) for plug in graph['inputs'])
+
+    start = time.time()
+    evaluator.evaluate(inputs, frames)
+    elapsed = max(time.time() - start, 1e-9)
+
+    return frames / elapsed
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Evaluate an exported rig pose graph outside of Maya')
+    parser.add_argument('graph', help='json file written by rigeval.exportGraph')
+    parser.add_argument('--frames', type=int, default=1000, help='number of random frames to evaluate')
+    options = parser.parse_args(args)
+
+    graph = loadGraph(options.graph)
+    fps = benchmark(graph, options.frames)
+    print('{0:d} nodes, {1:d} inputs: {2:.1f} frames per second'.format(len(graph['nodes']), len(graph['inputs']),
+                                                                       fps))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,373 @@
+__author__ = 'Sergio Sykes'
+__version__ = 'Fall 2015'
+
+import random
+
+import numpy as np
+import pymel.core as pmc
+
+FOLDABLE_TYPES = ('multiplyDivide', 'reverse', 'setRange', 'clamp', 'condition', 'plusMinusAverage',
+                  'blendColors', 'remapValue')
+
+# range used to sample channels without min/max values
+DEFAULT_SAMPLE_RANGES = {'rotateX': 45.0, 'rotateY': 45.0, 'rotateZ': 45.0,
+                         'translateX': 5.0, 'translateY': 5.0, 'translateZ': 5.0}
+
+
+def _inputs(node):
+    return pmc.listConnections(node, source=True, destination=False, connections=True, plugs=True)
+
+
+def _outputs(node):
+    """
+    Returns (plug on node, destination plug) pairs, leaving out the message connection shadingNode()
+    makes to the render utility list. Returns None if the node has any other message output
+    """
+    outputs = list()
+    for src, dst in pmc.listConnections(node, source=False, destination=True, connections=True, plugs=True):
+        if src.attrName(longName=True) == 'message':
+            if dst.node().type() == 'renderUtilityList':
+                continue
+            return None
+        outputs.append((src, dst))
+
+    return outputs
+
+
+def _rewire(outputs, upstream):
+    """
+    Moves every destination in outputs onto upstream, a plug or a constant value
+    """
+    for src, dst in outputs:
+        src.disconnect(dst)
+        if isinstance(upstream, pmc.Attribute):
+            upstream.connect(dst, force=True)
+        else:
+            dst.set(upstream)
+
+
+def foldConstantNode(node):
+    """
+    A node with no inputs always computes the same values. Sets them on the destinations and deletes the node
+    Returns True if the node was folded
+    """
+    if _inputs(node):
+        return False
+
+    outputs = _outputs(node)
+    if outputs is None or any(dst.isLocked() for src, dst in outputs):
+        return False
+
+    values = [src.get() for src, dst in outputs]
+    for (src, dst), value in zip(outputs, values):
+        _rewire([(src, dst)], value)
+
+    pmc.delete(node)
+    return True
+
+
+def _passThroughInput(node, channel):
+    """
+    Returns the input plug a multiplyDivide passes straight through on channel, None if it changes the value
+    """
+    operation = node.operation.get()
+    input2 = node.attr('input2' + channel)
+    if operation != 0 and (input2.isConnected() or node.input2.isConnected() or input2.get() != 1.0):
+        return None
+
+    return node.attr('input1' + channel)
+
+
+def foldIdentityNode(node):
+    """
+    Removes a multiplyDivide that multiplies, divides or raises to the power of 1 on every channel it outputs,
+    its destinations are connected to its inputs instead
+    Returns True if the node was folded
+    """
+    if node.type() != 'multiplyDivide' or node.input1.isConnected():
+        return False
+
+    outputs = _outputs(node)
+    if not outputs:
+        return False
+
+    rewires = list()
+    for src, dst in outputs:
+        if src.isCompound():
+            return False
+
+        inputPlug = _passThroughInput(node, src.attrName(longName=True)[-1])
+        if inputPlug is None:
+            return False
+
+        upstream = inputPlug.inputs(plugs=True)
+        rewires.append(((src, dst), upstream[0] if upstream else inputPlug.get()))
+
+    for output, upstream in rewires:
+        _rewire([output], upstream)
+
+    pmc.delete(node)
+    return True
+
+
+def _scaleFactor(node, channel):
+    """
+    Returns the constant factor a unitConversion or a multiplyDivide channel scales its input by,
+    dividing by a constant counts as multiplying by its reciprocal. None if it isn't a constant scale
+    """
+    if node.type() == 'unitConversion':
+        return node.conversionFactor.get()
+
+    if node.type() != 'multiplyDivide' or node.input2.isConnected():
+        return None
+
+    input2 = node.attr('input2' + channel)
+    if input2.isConnected():
+        return None
+
+    operation = node.operation.get()
+    if operation == 1:
+        return input2.get()
+    if operation == 2 and input2.get() != 0.0:
+        return 1.0 / input2.get()
+
+    return None
+
+
+def _setScaleFactor(node, channel, factor):
+    """
+    Makes a scale stage scale by factor, a divide keeps dividing
+    """
+    if node.type() == 'unitConversion':
+        node.conversionFactor.set(factor)
+    elif node.operation.get() == 2:
+        node.attr('input2' + channel).set(1.0 / factor)
+    else:
+        node.attr('input2' + channel).set(factor)
+
+
+def _scaleStage(plug, role, nodes):
+    """
+    Returns (node, channel) if plug is the scaled input or the output, depending on role,
+    of a constant scale stage among nodes, else None
+    """
+    node = plug.node()
+    if node not in nodes or plug.isCompound():
+        return None
+
+    name = plug.attrName(longName=True)
+    if node.type() == 'unitConversion':
+        channel = ''
+    else:
+        channel = name[-1]
+        role = role + '1' if role == 'input' else role
+
+    if name != role + channel or _scaleFactor(node, channel) is None:
+        return None
+
+    return node, channel
+
+
+def _upstreamScales(node, outputs, factors, nodes):
+    """
+    Plans folding node into the scale stages feeding it, each one can't feed anything else
+    Returns ({(stage, channel): factor}, [(output, new upstream plug)]) or None
+    """
+    scales = dict()
+    rewires = list()
+    for src, dst in outputs:
+        channel = src.attrName(longName=True)[-1]
+        upstream = node.attr('input1' + channel).inputs(plugs=True)
+        stage = _scaleStage(upstream[0], 'output', nodes) if upstream else None
+        if stage is None or len(pmc.listConnections(upstream[0], source=False, destination=True)) != 1:
+            return None
+
+        scales[stage] = _scaleFactor(*stage) * factors[channel]
+        rewires.append(((src, dst), upstream[0]))
+
+    return scales, rewires
+
+
+def _downstreamScales(node, outputs, factors, nodes):
+    """
+    Plans folding node into the scale stages it feeds, like the unitConversion Maya inserts before a rotation
+    Returns ({(stage, channel): factor}, [(output, new upstream plug)]) or None
+    """
+    scales = dict()
+    rewires = list()
+    for src, dst in outputs:
+        channel = src.attrName(longName=True)[-1]
+        upstream = node.attr('input1' + channel).inputs(plugs=True)
+        stage = _scaleStage(dst, 'input', nodes)
+        if stage is None or not upstream:
+            return None
+
+        scales[stage] = _scaleFactor(*stage) * factors[channel]
+        rewires.append(((src, dst), upstream[0]))
+
+    return scales, rewires
+
+
+def foldScaleChain(node, nodes):
+    """
+    Folds a multiplyDivide multiplying or dividing by constants into the constant scales next to it,
+    either the ones feeding it when they feed only this node, or every one it feeds.
+    Scales are multiplyDivides with a constant input2 and unitConversions, only ones among nodes are changed
+    Returns True if the node was folded
+    """
+    if node.type() != 'multiplyDivide' or node.input1.isConnected():
+        return False
+
+    outputs = _outputs(node)
+    if not outputs or any(src.isCompound() for src, dst in outputs):
+        return False
+
+    factors = dict()
+    for src, dst in outputs:
+        channel = src.attrName(longName=True)[-1]
+        factors[channel] = _scaleFactor(node, channel)
+        if factors[channel] is None:
+            return False
+
+    plan = _upstreamScales(node, outputs, factors, nodes) or _downstreamScales(node, outputs, factors, nodes)
+    if plan is None:
+        return False
+
+    scales, rewires = plan
+    # a divide can't take over a factor of zero
+    if any(stage.type() == 'multiplyDivide' and stage.operation.get() == 2 and factor == 0.0
+           for (stage, channel), factor in scales.items()):
+        return False
+
+    for (stage, channel), factor in scales.items():
+        _setScaleFactor(stage, channel, factor)
+
+    for output, upstream in rewires:
+        _rewire([output], upstream)
+
+    pmc.delete(node)
+    return True
+
+
+def foldNodes(nodes):
+    """
+    Repeats the folds over nodes until none of them change anything. Only nodes among nodes are changed
+    or removed, besides the destinations a folded node fed
+    Returns the names of the removed nodes
+    """
+    removed = list()
+    nodes = set(node for node in nodes if node.exists())
+    pending = [node for node in nodes if node.type() in FOLDABLE_TYPES]
+
+    changed = True
+    while changed:
+        changed = False
+        for node in pending:
+            if not node.exists():
+                continue
+
+            name = node.name()
+            if foldConstantNode(node) or foldIdentityNode(node) or foldScaleChain(node, nodes):
+                removed.append(name)
+                changed = True
+
+        pending = [node for node in pending if node.exists()]
+
+    return removed
+
+
+def _samplePlugs(controls):
+    plugs = list()
+    for control in set(pmc.PyNode(ctl) for ctl in controls):
+        for attr in pmc.listAttr(control, keyable=True, scalar=True) or []:
+            plug = control.attr(attr)
+            if plug.isLocked() or plug.isConnected() or plug.type() not in ('double', 'doubleLinear',
+                                                                               'doubleAngle', 'float'):
+                continue
+
+            default = plug.get()
+            spread = DEFAULT_SAMPLE_RANGES.get(attr, 10.0)
+            low = plug.getMin() if plug.getMin() is not None else default - spread
+            high = plug.getMax() if plug.getMax() is not None else default + spread
+            plugs.append((plug, default, low, high))
+
+    return plugs
+
+
+def samplePoses(controls, watch, samples=4, seed=0):
+    """
+    Sets the controls' keyable channels to random values inside their limits and records the world matrices
+    of the watch nodes. The first sample is the current pose. Channels are restored afterwards
+    Returns an array of shape (samples, len(watch), 16)
+    """
+    rng = random.Random(seed)
+    plugs = _samplePlugs(controls)
+
+    poses = list()
+    try:
+        for i in xrange(samples):
+            if i:
+                for plug, default, low, high in plugs:
+                    plug.set(rng.uniform(low, high))
+
+            poses.append([pmc.xform(node, q=True, worldSpace=True, matrix=True) for node in watch])
+    finally:
+        for plug, default, low, high in plugs:
+            plug.set(default)
+
+    return np.array(poses)
+
+
+def foldConstants(nodes, controls=(), watch=(), samples=4, tolerance=1e-4):
+    """
+    Folds constant utility chains among nodes. If watch nodes are given, their world matrices are compared
+    at sampled control values before and after, the folding is undone if any moved more than tolerance
+    Returns the names of the removed nodes
+    """
+    nodes = [pmc.PyNode(node) for node in nodes]
+    if watch and not pmc.undoInfo(q=True, state=True):
+        raise ValueError('rigopt :: Undo is off, a fold that changes the rig could not be rolled back')
+
+    # sampling and folding share one chunk, undoing it rolls back the fold and every sampled setAttr together
+    error = 0.0
+    pmc.undoInfo(openChunk=True)
+    try:
+        before = samplePoses(controls, watch, samples) if watch else None
+        removed = foldNodes(nodes)
+        if removed and watch:
+            error = np.abs(samplePoses(controls, watch, samples) - before).max()
+    finally:
+        pmc.undoInfo(closeChunk=True)
+
+    if error > tolerance:
+        pmc.undo()
+        pmc.warning('rigopt :: Folding changed the rig by {0:.6f}, undone'.format(error))
+        return list()
+
+    return removed
+
+
+def optimizeModules(modules, samples=4, tolerance=1e-4):
+    """
+    Runs foldConstants over the nodes each cogbiped Rigging module created,
+    checked against the module's joints at sampled values of its controls.
+    A last pass over the nodes of all the modules together folds scale chains that cross module boundaries.
+    The modules have to be built inside a cogbiped.NodeTracker, otherwise they have no created nodes
+    Returns a dictionary of module name to number of removed nodes, the last pass is under None
+    """
+    report = dict()
+    allNodes, allControls, allJoints = list(), list(), list()
+    for module in modules:
+        removed = foldConstants(module.createdNodes(), module.controls(), module.joints(), samples, tolerance)
+        report[module.name()] = len(removed)
+        print '{0}: {1:d} nodes removed'.format(module.name(), len(removed))
+
+        allNodes.extend(module.createdNodes())
+        allControls.extend(module.controls())
+        allJoints.extend(module.joints())
+
+    removed = foldConstants(allNodes, allControls, allJoints, samples, tolerance)
+    report[None] = len(removed)
+    print 'across modules: {0:d} nodes removed'.format(len(removed))
+
+    return report
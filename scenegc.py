@@ -0,0 +1,105 @@
+"""
+Usage:
+To report leftover nodes from the rigging tools without deleting anything:
+    import scenegc; scenegc.collectGarbage(dryRun=True)
+
+To delete them:
+    import scenegc; scenegc.collectGarbage()
+
+"""
+__author__ = 'Sergio Sykes'
+__version__ = 'Fall 2015'
+
+import pymel.core as pmc
+
+# Names the rigging tools leave behind
+#   curveGuide       - polevec / hellamath getPoleVectorPosition
+#   loc_*_parentMe   - cogbiped Rigging modules built without a parent
+#   *_TEMP*          - duplicated joint chains from cogbiped that never got renamed
+#   fkTEMP*, ikTEMP* - the same from ikfk
+#   curveInfo*       - unnamed curveInfo from stretchy.stretchySplineIk
+#   pre_ctl_*_gimbal - gimbal pre transforms from cogbiped RiggingArm
+GARBAGE_PATTERNS = ('curveGuide*', 'loc_*_parentMe', '*_TEMP*', 'fkTEMP*', 'ikTEMP*', 'curveInfo*',
+                    'pre_ctl_*_gimbal')
+
+# patterns only matched against one node type, so user nodes that happen to share the name are left alone
+PATTERN_TYPES = {'*_TEMP*': 'joint', 'fkTEMP*': 'joint', 'ikTEMP*': 'joint', 'curveInfo*': 'curveInfo'}
+
+# connections to these node types don't count as a node being used
+IGNORED_CONSUMER_TYPES = ('renderUtilityList', 'shadingEngine', 'hyperLayout', 'displayLayer')
+
+
+def _consumers(node):
+    """
+    Returns the nodes that use node: destinations of its and its shapes' outputs, and non shape children
+    """
+    sources = [node]
+    consumers = set()
+
+    if isinstance(node, pmc.nodetypes.Transform):
+        shapes = node.getShapes()
+        sources.extend(shapes)
+        consumers.update(child for child in node.getChildren() if child not in shapes)
+
+    for source in sources:
+        for dst in pmc.listConnections(source, source=False, destination=True) or []:
+            if dst.type() not in IGNORED_CONSUMER_TYPES and dst not in sources:
+                consumers.add(dst)
+
+    return consumers
+
+
+def findGarbage(patterns=GARBAGE_PATTERNS):
+    """
+    Returns a dictionary of pattern to the nodes matching it that nothing outside the garbage uses
+    """
+    found = dict()
+    for pattern in patterns:
+        matches = pmc.ls(pattern, type=PATTERN_TYPES[pattern]) if pattern in PATTERN_TYPES else pmc.ls(pattern)
+        nodes = [node for node in matches if not isinstance(node, pmc.nodetypes.Shape)]
+        if nodes:
+            found[pattern] = nodes
+
+    garbage = set(node for nodes in found.values() for node in nodes)
+    consumers = dict((node, _consumers(node)) for node in garbage)
+
+    # a node stays garbage while all its consumers are garbage too
+    changed = True
+    while changed:
+        changed = False
+        for node in list(garbage):
+            if not consumers[node] <= garbage:
+                garbage.discard(node)
+                changed = True
+
+    return dict((pattern, [node for node in nodes if node in garbage]) for pattern, nodes in found.items())
+
+
+def collectGarbage(patterns=GARBAGE_PATTERNS, dryRun=False):
+    """
+    Deletes the leftover nodes found by findGarbage in one batch. If dryRun is True, only reports them
+    Returns the names of the nodes found
+    """
+    found = findGarbage(patterns)
+
+    names = list()
+    for pattern in patterns:
+        nodes = found.get(pattern, [])
+        if nodes:
+            print '{0}: {1}'.format(pattern, ', '.join(node.name() for node in nodes))
+
+        for node in nodes:
+            if node.name() not in names:
+                names.append(node.name())
+
+    if not names:
+        print 'No leftover nodes found'
+        return names
+
+    if dryRun:
+        print '{0:d} leftover nodes found, nothing deleted'.format(len(names))
+    else:
+        pmc.delete(names)
+        print '{0:d} leftover nodes deleted'.format(len(names))
+
+    return names
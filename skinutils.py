@@ -1,32 +1,119 @@
+import json
+import os
+import time
+
+import maya.OpenMaya as om
+import maya.OpenMayaAnim as oma
+import numpy as np
 import pymel.core as pmc
 
+from advutils import batchSetAttr
+
+# joint prefixes weights can be moved between, rig_ skeletons and jnt_ game skeletons
+INFLUENCE_PREFIXES = ('rig_', 'jnt_')
+
+BIND_SNAPSHOT_VERSION = 1
+SNAPSHOT_CHANNELS = ('translate', 'rotate', 'scale', 'jointOrient')
+
 def rebuildDagPose():
     """
     Walks through bind pose data in selected skeleton and consolidates it down to one new bindPose node
     Directly inspired by Nathan Horne's NT_rebuildDagPose.mel script
     """
 
-    dagPoses = set()
-    connectedSkinClusters = set()
-    selection = pmc.selected()
-    joints = pmc.listRelatives(selection[0], path=True, allDescendents=True, type='joint')
-    joints.insert(0, selection[0])
+    return rebuildDagPoses(pmc.selected())
+
+
+def _skinClusters(joints, dagPoses):
+    skins = set(pmc.listConnections(joints, type='skinCluster', source=False, destination=True) or [])
+    if dagPoses:
+        skins.update(pmc.listConnections(list(dagPoses), type='skinCluster') or [])
+    return skins
+
+
+def isConsolidated(joints, dagPoses, skinClusters):
+    """
+    True if the joints have a single bind pose holding all of them, that every skinCluster uses.
+    The pose can hold more, dagPose stores the parents of its members too
+    """
+    if len(dagPoses) != 1:
+        return False
+
+    dagPose = list(dagPoses)[0]
+    if not dagPose.bindPose.get():
+        return False
 
-    for jnt in joints:
-        dagPoses.update(jnt.listConnections(type='dagPose'))
+    members = set(pmc.listConnections(dagPose.members, source=True, destination=False) or [])
+    if not set(joints) <= members:
+        return False
 
-    for dag in dagPoses:
-        connectedSkinClusters.update(dag.listConnections(type='skinCluster'))
+    return all(skin.bindPose.inputs() == [dagPose] for skin in skinClusters)
+
+
+def _skeletonGroups(roots):
+    """
+    Gathers the joints, dagPoses and skinClusters of each skeleton under roots, skeletons sharing a skinCluster
+    or a dagPose are merged into one group since they need one bind pose between them
+    Returns a list of (roots, joints, dagPoses, skinClusters)
+    """
+    groups = list()
+    for root in roots:
+        root = pmc.PyNode(root)
+        joints = [root] + (pmc.listRelatives(root, path=True, allDescendents=True, type='joint') or [])
+        dagPoses = set(pmc.listConnections(joints, type='dagPose') or [])
+        group = ([root], joints, dagPoses, _skinClusters(joints, dagPoses))
+
+        for other in [other for other in groups if (other[2] & group[2]) or (other[3] & group[3])]:
+            groups.remove(other)
+            group = (other[0] + group[0], other[1] + group[1], other[2] | group[2], other[3] | group[3])
+        groups.append(group)
+
+    return groups
+
+
+def rebuildDagPoses(roots, force=False):
+    """
+    Consolidates the bind pose data of each skeleton under roots into one new bindPose node.
+    dagPoses and skinClusters are gathered with one query per skeleton. Skeletons sharing a skinCluster get one
+    bind pose between them, a skinCluster can only use one. Skeletons that already have a single bind pose used
+    by all their skinClusters are skipped unless force is True.
+    skinClusters are rewired to the new poses in one pass at the end
+    Returns a dictionary of root to its new dagPose, None for skipped skeletons
+    """
 
-    pmc.delete(dagPoses)    
-    pmc.select(joints, replace=True)            
-    newDagPose = pmc.dagPose(save=True, selection=True, bindPose=True)
+    results = dict()
+    rewires = list()
 
-    print 'New dagPose, {0}, created'.format(newDagPose.shortName())
+    for groupRoots, joints, dagPoses, skinClusters in _skeletonGroups(roots):
+        start = time.time()
+        label = ', '.join(root.shortName() for root in groupRoots)
+
+        if not force and isConsolidated(joints, dagPoses, skinClusters):
+            results.update((root, None) for root in groupRoots)
+            print '{0}: bind pose already consolidated, skipped ({1:.3f}s)'.format(label, time.time() - start)
+            continue
+
+        if dagPoses:
+            pmc.delete(list(dagPoses))
+        pmc.select(joints, replace=True)
+        newDagPose = pmc.dagPose(save=True, selection=True, bindPose=True)
+        if isinstance(newDagPose, (list, tuple)):
+            newDagPose = newDagPose[0]
+        newDagPose = pmc.PyNode(newDagPose)
+
+        rewires.extend((newDagPose, skin) for skin in skinClusters)
+        results.update((root, newDagPose) for root in groupRoots)
+
+        print '{0}: new dagPose {1}, {2:d} joints, {3:d} dagPoses removed, {4:d} skinClusters ({5:.3f}s)'.format(
+            label, newDagPose.shortName(), len(joints), len(dagPoses), len(skinClusters), time.time() - start)
+
+    if rewires:
+        pmc.mel.eval('\n'.join('connectAttr -f "{0}.message" "{1}.bindPose";'.format(dag.name(), skin.name())
+                                for dag, skin in rewires))
+        print 'Connected {0:d} skinClusters to their new bind poses'.format(len(rewires))
+
+    return results
 
-    for sc in connectedSkinClusters:
-        print 'Connecting {0}.message to {1}.bindPose'.format(newDagPose.shortName(), sc.shortName())
-        newDagPose.message.connect(sc.bindPose)
 
 def updateBindPose():
     """
@@ -37,3 +124,437 @@ def updateBindPose():
     objects = pmc.dagPose(dag, q=True, members=True)
     for obj in objects:
         pmc.dagPose(obj, reset=True, name=dag[0])
+
+
+def getSkinCluster(mesh):
+    skins = pmc.listHistory(mesh, type='skinCluster')
+    if not skins:
+        raise ValueError('skinutils :: {0} has no skinCluster'.format(mesh))
+
+    return skins[0]
+
+
+def _skinData(skin):
+    """
+    Returns the skinCluster function set, the deformed shape's dag path and a component holding all its vertices
+    """
+    skin = pmc.PyNode(skin)
+    fnSkin = oma.MFnSkinCluster(skin.__apimobject__())
+
+    shapePath = om.MDagPath()
+    fnSkin.getPathAtIndex(0, shapePath)
+
+    fnComponent = om.MFnSingleIndexedComponent()
+    components = fnComponent.create(om.MFn.kMeshVertComponent)
+    fnComponent.setCompleteData(om.MFnMesh(shapePath).numVertices())
+
+    return fnSkin, shapePath, components
+
+
+def getInfluences(skin):
+    fnSkin, shapePath, components = _skinData(skin)
+    paths = om.MDagPathArray()
+    fnSkin.influenceObjects(paths)
+    return [paths[i].partialPathName().split('|')[-1] for i in xrange(paths.length())]
+
+
+def _indexArray(count):
+    indices = om.MIntArray()
+    for i in xrange(count):
+        indices.append(i)
+    return indices
+
+
+def getWeights(skin):
+    """
+    Reads every vertex weight of skin with one api call
+    Returns a (vertices, influences) array and the influence names
+    """
+    influences = getInfluences(skin)
+    fnSkin, shapePath, components = _skinData(skin)
+
+    weights = om.MDoubleArray()
+    fnSkin.getWeights(shapePath, components, _indexArray(len(influences)), weights)
+
+    return np.array(weights, dtype=np.float64).reshape(-1, len(influences)), influences
+
+
+def setWeights(skin, weights, influences=None):
+    """
+    Writes a (vertices, influences) array to skin with one api call, nothing is normalized.
+    influences - names for the columns of weights, in the skinCluster's order if None
+    """
+    skinInfluences = getInfluences(skin)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    if influences is not None:
+        columns = [skinInfluences.index(name) for name in influences]
+        ordered = np.zeros((weights.shape[0], len(skinInfluences)))
+        ordered[:, columns] = weights
+        weights = ordered
+
+    fnSkin, shapePath, components = _skinData(skin)
+    if weights.shape != (om.MFnMesh(shapePath).numVertices(), len(skinInfluences)):
+        raise ValueError('skinutils :: Weights of shape {0} do not fit {1}'.format(weights.shape, skin))
+
+    values = weights.ravel().tolist()
+    util = om.MScriptUtil()
+    util.createFromList(values, len(values))
+
+    oldValues = om.MDoubleArray()
+    fnSkin.setWeights(shapePath, components, _indexArray(len(skinInfluences)),
+                      om.MDoubleArray(util.asDoublePtr(), len(values)), False, oldValues)
+
+
+def saveWeights(path, weights, influences, mesh=None, sparse=False, threshold=0.0):
+    """
+    Writes a weights array to path. A .npy path is written dense and can be memory mapped on load,
+    the influences and mesh go to a .json file next to it.
+    A .npz path holds everything, sparse stores only the weights above threshold as vertex, influence, value lists
+    """
+    weights = np.asarray(weights, dtype=np.float32)
+
+    if path.endswith('.npy'):
+        np.save(path, weights)
+        with open(path[:-4] + '.json', 'w') as f:
+            json.dump({'influences': list(influences), 'mesh': mesh}, f, indent=1)
+        return path
+
+    header = {'influences': np.array(influences), 'mesh': np.array(mesh or '')}
+    if sparse:
+        vertices, columns = np.nonzero(weights > threshold)
+        np.savez(path, vertices=vertices.astype(np.int32), columns=columns.astype(np.int32),
+                 values=weights[vertices, columns], shape=np.array(weights.shape), **header)
+    else:
+        np.savez(path, weights=weights, **header)
+
+    return path
+
+
+def loadWeights(path, mmap=True):
+    """
+    Reads a file written by saveWeights. Returns the (vertices, influences) array, influence names and mesh name
+    .npy weights are memory mapped unless mmap is False
+    """
+    if path.endswith('.npy'):
+        weights = np.load(path, mmap_mode='r' if mmap else None)
+        with open(path[:-4] + '.json') as f:
+            header = json.load(f)
+        return weights, header['influences'], header['mesh']
+
+    data = np.load(path)
+    influences = [str(name) for name in data['influences']]
+    mesh = str(data['mesh']) or None
+
+    if 'weights' in data.files:
+        return data['weights'], influences, mesh
+
+    weights = np.zeros(tuple(data['shape']), dtype=np.float32)
+    weights[data['vertices'], data['columns']] = data['values']
+    return weights, influences, mesh
+
+
+def remapInfluences(influences, available):
+    """
+    Matches influence names to available ones, directly or by swapping the rig_/jnt_ prefix
+    Returns a list with the matching name or None for each influence
+    """
+    available = set(available)
+    result = list()
+    for name in influences:
+        match = name if name in available else None
+        for prefix in INFLUENCE_PREFIXES:
+            if match is None and name.startswith(prefix):
+                for other in INFLUENCE_PREFIXES:
+                    if other + name[len(prefix):] in available:
+                        match = other + name[len(prefix):]
+                        break
+        result.append(match)
+
+    return result
+
+
+def _lockedMask(weights, locked):
+    mask = np.zeros(weights.shape[1], dtype=bool)
+    if locked is not None:
+        mask[list(locked)] = True
+    return mask
+
+
+def pruneWeights(weights, threshold=0.001, locked=None):
+    """
+    Zeroes weights below threshold, except on the locked influence columns. Doesn't normalize
+    """
+    weights = np.array(weights, dtype=np.float64)
+    weights[(weights < threshold) & ~_lockedMask(weights, locked)] = 0.0
+    return weights
+
+
+def capInfluences(weights, maxInfluences=4, locked=None):
+    """
+    Keeps the maxInfluences largest weights of each vertex and zeroes the rest. Doesn't normalize
+    Non zero locked weights are always kept and count towards maxInfluences. Vertices with more of them than
+    maxInfluences keep all their locked weights, lose every unlocked one and are reported with a warning
+    """
+    weights = np.array(weights, dtype=np.float64)
+    if weights.shape[1] <= maxInfluences:
+        return weights
+
+    keep = _lockedMask(weights, locked) & (weights > 0.0)
+    rank = np.where(keep, np.inf, weights)
+    drop = np.argpartition(rank, weights.shape[1] - maxInfluences, axis=1)[:, :weights.shape[1] - maxInfluences]
+
+    dropMask = np.zeros(weights.shape, dtype=bool)
+    dropMask[np.arange(weights.shape[0])[:, np.newaxis], drop] = True
+    weights[dropMask & ~keep] = 0.0
+
+    overCap = int((keep.sum(axis=1) > maxInfluences).sum())
+    if overCap:
+        pmc.warning('skinutils :: {0:d} vertices have more than {1:d} locked influences, '
+                    'their locked weights were kept'.format(overCap, maxInfluences))
+
+    return weights
+
+
+def normalizeWeights(weights, locked=None):
+    """
+    Scales each vertex's unlocked weights so the vertex sums to 1, locked weights keep their value.
+    Vertices whose locked weights already reach 1 get their unlocked weights zeroed, the ones going over 1
+    are reported with a warning. Vertices with no unlocked weight and locked weights under 1 can't honour
+    their locks, all their weights are scaled to sum to 1 and they're reported with a warning
+    """
+    weights = np.array(weights, dtype=np.float64)
+    mask = _lockedMask(weights, locked)
+
+    lockedTotal = weights[:, mask].sum(axis=1)
+    unlockedTotal = weights[:, ~mask].sum(axis=1)
+    full = (lockedTotal >= 1.0) | np.isclose(lockedTotal, 1.0)
+
+    valid = (unlockedTotal > 0.0) & ~full
+    scale = np.where(valid, (1.0 - lockedTotal) / np.where(valid, unlockedTotal, 1.0), 1.0)
+    scale[full] = 0.0
+    weights[:, ~mask] *= scale[:, np.newaxis]
+
+    over = full & ~np.isclose(lockedTotal, 1.0)
+    if over.any():
+        pmc.warning('skinutils :: {0:d} vertices have locked weights summing over 1, '
+                    'their unlocked weights were zeroed'.format(int(over.sum())))
+
+    lockedOnly = (unlockedTotal == 0.0) & (lockedTotal > 0.0) & ~full
+    if lockedOnly.any():
+        weights[lockedOnly] /= lockedTotal[lockedOnly][:, np.newaxis]
+        pmc.warning('skinutils :: {0:d} vertices had only locked weights left, '
+                    'their locked weights were normalized'.format(int(lockedOnly.sum())))
+
+    return weights
+
+
+def lockedInfluences(skin):
+    """
+    Returns the column indices of influences with lockInfluenceWeights on
+    """
+    return [i for i, name in enumerate(getInfluences(skin))
+            if pmc.attributeQuery('lockInfluenceWeights', node=name, exists=True) and
+            pmc.getAttr(name + '.lockInfluenceWeights')]
+
+
+def cleanWeights(mesh, threshold=0.001, maxInfluences=4, locked=None):
+    """
+    Prunes, caps and renormalizes the skin weights of mesh in one bulk read and one bulk write
+    locked - influence column indices to leave untouched, the influences' lockInfluenceWeights if None
+    Returns the number of weights zeroed and the largest influence count per vertex left
+    """
+    start = time.time()
+    skin = getSkinCluster(mesh)
+    weights, influences = getWeights(skin)
+    if locked is None:
+        locked = lockedInfluences(skin)
+
+    cleaned = pruneWeights(weights, threshold, locked)
+    if maxInfluences:
+        cleaned = capInfluences(cleaned, maxInfluences, locked)
+    cleaned = normalizeWeights(cleaned, locked)
+
+    setWeights(skin, cleaned)
+
+    removed = int(np.count_nonzero(weights) - np.count_nonzero(cleaned))
+    maxCount = int((cleaned != 0.0).sum(axis=1).max()) if cleaned.size else 0
+    print '{0}: {1:d} weights removed, at most {2:d} influences per vertex, {3:.2f}s'.format(
+        mesh, removed, maxCount, time.time() - start)
+
+    return removed, maxCount
+
+
+def exportWeights(meshes, directory, extension='.npz', sparse=False, threshold=0.0):
+    """
+    Saves each mesh's skin weights to directory/meshname + extension
+    Returns the written paths
+    """
+    paths = list()
+    for mesh in meshes:
+        mesh = pmc.PyNode(mesh)
+        weights, influences = getWeights(getSkinCluster(mesh))
+        path = os.path.join(directory, mesh.shortName().replace(':', '_') + extension)
+        paths.append(saveWeights(path, weights, influences, mesh.shortName(), sparse, threshold))
+
+    return paths
+
+
+def importWeights(mesh, path):
+    """
+    Loads weights from path onto mesh's skinCluster, influences are matched by name or rig_/jnt_ prefix.
+    Weights of influences the skinCluster doesn't have are dropped and each vertex is renormalized
+    Returns the names of the dropped influences
+    """
+    skin = getSkinCluster(mesh)
+    weights, influences, sourceMesh = loadWeights(path)
+
+    matches = remapInfluences(influences, getInfluences(skin))
+    missing = [name for name, match in zip(influences, matches) if match is None]
+    if missing:
+        pmc.warning('skinutils :: {0} missing influences, weights dropped: {1}'.format(len(missing),
+                                                                                     ', '.join(missing)))
+
+    keep = [i for i, match in enumerate(matches) if match is not None]
+    weights = np.asarray(weights, dtype=np.float64)[:, keep]
+    totals = weights.sum(axis=1)[:, np.newaxis]
+    weights = np.where(totals > 0.0, weights / np.where(totals > 0.0, totals, 1.0), weights)
+
+    setWeights(skin, weights, [matches[i] for i in keep])
+    return missing
+
+
+def benchmarkWeights(meshes, repeat=3):
+    """
+    Times bulk reads and writes of each mesh's weights, prints vertices per second
+    Returns a dictionary of mesh name to (read seconds, write seconds) for one pass
+    """
+    report = dict()
+    for mesh in meshes:
+        mesh = pmc.PyNode(mesh)
+        skin = getSkinCluster(mesh)
+
+        start = time.time()
+        for i in xrange(repeat):
+            weights, influences = getWeights(skin)
+        readTime = (time.time() - start) / repeat
+
+        start = time.time()
+        for i in xrange(repeat):
+            setWeights(skin, weights)
+        writeTime = (time.time() - start) / repeat
+
+        count = weights.shape[0]
+        print '{0}: {1:d} vertices x {2:d} influences'.format(mesh.shortName(), count, len(influences))
+        print '    read  {0:.3f}s, {1:.0f} vertices/s'.format(readTime, count / max(readTime, 1e-9))
+        print '    write {0:.3f}s, {1:.0f} vertices/s'.format(writeTime, count / max(writeTime, 1e-9))
+        report[mesh.shortName()] = (readTime, writeTime)
+
+    return report
+
+
+def _skeletonJoints(roots):
+    joints = list()
+    for root in roots:
+        root = pmc.PyNode(root)
+        for jnt in [root] + list(reversed(pmc.listRelatives(root, allDescendents=True, type='joint') or [])):
+            if jnt not in joints:
+                joints.append(jnt)
+    return joints
+
+
+def captureBindPose(roots, path=None):
+    """
+    Snapshots the channels, local and world matrices of every joint under roots.
+    Writes them to path (.npz) if given. Returns the snapshot dictionary
+    """
+    joints = _skeletonJoints(roots)
+
+    snapshot = {'version': np.array(BIND_SNAPSHOT_VERSION), 'joints': np.array([jnt.name() for jnt in joints]),
+                'rotateOrder': np.array([jnt.rotateOrder.get() for jnt in joints], dtype=np.int32),
+                'local': np.array([list(jnt.matrix.get()) for jnt in joints], dtype=np.float64),
+                'world': np.array([list(jnt.worldMatrix[0].get()) for jnt in joints], dtype=np.float64)}
+    for channel in SNAPSHOT_CHANNELS:
+        snapshot[channel] = np.array([list(jnt.attr(channel).get()) for jnt in joints], dtype=np.float64)
+
+    if path:
+        np.savez(path, **snapshot)
+
+    return snapshot
+
+
+def loadBindPose(snapshot):
+    """
+    Returns the snapshot dictionary for a path or an already loaded snapshot
+    """
+    if isinstance(snapshot, dict):
+        return snapshot
+
+    data = np.load(snapshot)
+    if int(data['version']) != BIND_SNAPSHOT_VERSION:
+        raise ValueError('skinutils :: Unsupported bind pose snapshot version {0}'.format(data['version']))
+    return dict((key, data[key]) for key in data.files)
+
+
+def restoreBindPose(snapshot):
+    """
+    Sets every joint in the snapshot that still exists back to its snapshot channels in one batched write.
+    Locked or connected channels are skipped
+    Returns the number of channels set
+    """
+    snapshot = loadBindPose(snapshot)
+
+    plugValues = list()
+    skipped = 0
+    for i, name in enumerate(snapshot['joints']):
+        name = str(name)
+        if not pmc.objExists(name):
+            continue
+
+        for channel in SNAPSHOT_CHANNELS:
+            plug = pmc.PyNode(name).attr(channel)
+            if plug.isSettable() and all(child.isSettable() for child in plug.getChildren()):
+                plugValues.append((plug.name(), snapshot[channel][i]))
+            else:
+                skipped += 1
+
+    if skipped:
+        pmc.warning('skinutils :: {0:d} locked or connected channels not restored'.format(skipped))
+
+    return batchSetAttr(plugValues)
+
+
+def diffBindPose(snapshot, tolerance=1e-3):
+    """
+    Compares the current world matrices of the snapshot's joints to the snapshot in one pass
+    Returns a dictionary of joint name to (translation drift, rotation drift in degrees)
+    for joints over tolerance, and prints them
+    """
+    snapshot = loadBindPose(snapshot)
+
+    names = [str(name) for name in snapshot['joints']]
+    present = [i for i, name in enumerate(names) if pmc.objExists(name)]
+    current = np.array([pmc.xform(names[i], q=True, worldSpace=True, matrix=True) for i in present],
+                       dtype=np.float64).reshape(-1, 4, 4)
+    stored = snapshot['world'][present]
+
+    translation = np.linalg.norm(current[:, 3, :3] - stored[:, 3, :3], axis=1)
+
+    def rotations(matrices):
+        rows = matrices[:, :3, :3]
+        return rows / np.linalg.norm(rows, axis=2)[:, :, np.newaxis]
+
+    cosine = (np.einsum('nij,nij->n', rotations(current), rotations(stored)) - 1.0) / 2.0
+    rotation = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+    drifted = dict()
+    for j in np.nonzero((translation > tolerance) | (rotation > tolerance))[0]:
+        drifted[names[present[j]]] = (float(translation[j]), float(rotation[j]))
+
+    missing = len(names) - len(present)
+    print '{0:d} of {1:d} joints drifted from the bind pose{2}'.format(
+        len(drifted), len(present), ', {0:d} missing'.format(missing) if missing else '')
+    for name, (move, turn) in sorted(drifted.items(), key=lambda item: -max(item[1])):
+        print '    {0}: {1:.4f} units, {2:.4f} degrees'.format(name, move, turn)
+
+    return drifted
@@ -74,8 +74,58 @@ import maya.cmds as cmds
 #                 cmds.parent(jnt2, dupe)
 
 
+import re
+
+import numpy as np
 import pymel.core as pmc
 
+import npmath
+from stretchy import stretchySplineIk
+
+SPLIT_UNIFORM = 'uniform'
+SPLIT_BIAS = 'bias'
+SPLIT_EASE = 'ease'
+SPLIT_WEIGHTS = 'weights'
+SPLIT_DISTRIBUTIONS = (SPLIT_UNIFORM, SPLIT_BIAS, SPLIT_EASE, SPLIT_WEIGHTS)
+
+
+def splitFractions(divisions, distribution=SPLIT_UNIFORM, bias=0.0, weights=None):
+    """
+    Returns the divisions - 1 split points along a bone as fractions of its length
+    uniform - evenly spaced
+    bias - pushes the splits toward the start (bias > 0) or end (bias < 0) of the bone, -1 < bias < 1
+    ease - clusters the splits at both ends of the bone (ease-in/out), 0 <= bias <= 1 sets the strength
+    weights - segment lengths are proportional to weights, one weight per division
+    """
+
+    if distribution == SPLIT_WEIGHTS:
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != (divisions,) or weights.min() <= 0.0:
+            raise ValueError('Splitter :: need {0:d} positive weights, got {1}'.format(divisions, weights))
+
+        return np.cumsum(weights)[:-1] / weights.sum()
+
+    t = np.arange(1, divisions, dtype=float) / divisions
+
+    if distribution == SPLIT_UNIFORM:
+        return t
+
+    if distribution == SPLIT_BIAS:
+        if not -1.0 < bias < 1.0:
+            raise ValueError('Splitter :: bias must be between -1 and 1, got {0}'.format(bias))
+
+        return t ** ((1.0 + bias) / (1.0 - bias))
+
+    if distribution == SPLIT_EASE:
+        if not 0.0 <= bias <= 1.0:
+            raise ValueError('Splitter :: ease strength must be between 0 and 1, got {0}'.format(bias))
+
+        # sine offset is zero at both ends and keeps the curve increasing for strengths up to 1
+        return t - bias * np.sin(2.0 * np.pi * t) / (2.0 * np.pi)
+
+    raise ValueError('Splitter :: unknown distribution {0}, use one of {1}'.format(distribution,
+                                                                                  SPLIT_DISTRIBUTIONS))
+
 
 class Splitter(object):
     WINDOW_NAME = 'JointSplitterPyMel'
@@ -85,11 +135,17 @@ class Splitter(object):
         self._divisions = 2
         self._win = None
         self._slider = None
+        self._distributionMenu = None
+        self._biasSlider = None
 
     def GUI(self):
         self._win = pmc.window(self.WINDOW_NAME, title=self.WINDOW_TITLE)
         pmc.columnLayout(adjustableColumn=True)
         self._slider = pmc.intSliderGrp(label='Segments', field=True, min=2, max=100, value=2)
+        self._distributionMenu = pmc.optionMenu(label='Distribution')
+        for distribution in SPLIT_DISTRIBUTIONS[:-1]:
+            pmc.menuItem(label=distribution)
+        self._biasSlider = pmc.floatSliderGrp(label='Bias', field=True, min=-0.95, max=0.95, value=0.0)
         pmc.button(label='Okay', c=pmc.Callback(self._callback))
         pmc.button(label='Cancel', c=pmc.Callback(pmc.deleteUI, self._win))
         self._win.show()
@@ -100,36 +156,257 @@ class Splitter(object):
             return
 
         self._divisions = self._slider.getValue()
-        self.doSplit(joints, self._divisions)
+        distribution = self._distributionMenu.getValue()
+        bias = self._biasSlider.getValue()
+        if distribution == SPLIT_EASE:
+            bias = abs(bias)
+
+        self.doBatchSplit(joints, self._divisions, distribution, bias)
 
     @staticmethod
     def doSplit(joints, divisions):
+        return Splitter.doBatchSplit(joints, divisions)
+
+    @staticmethod
+    def doBatchSplit(joints, divisions, distribution=SPLIT_UNIFORM, bias=0.0, weights=None):
+        """
+        Splits the bones between each joint and its first child joint.
+        Split positions for every bone are computed in one pass, see splitFractions for the distributions.
+        New joints are created straight into the hierarchy without changing the selection,
+        zeroed so they keep the orientation of the joint they split. Other children are left alone
+        Returns a list with the new joints of each bone
+        """
+
         if isinstance(joints, (str, pmc.PyNode)):
             joints = [joints]
 
-        for jnt in joints:
+        bones = list()
+        for jnt in map(pmc.nodetypes.Joint, joints):
+            children = jnt.getChildren(type='joint')
+            if children:
+                bones.append((jnt, children[0]))
+
+        if not bones or divisions < 2:
+            return list()
+
+        fractions = splitFractions(divisions, distribution, bias, weights)
+        steps = np.diff(np.concatenate(([0.0], fractions)))
+
+        # the child's translate is the bone in the joint's local space
+        # each new joint is parented to the last one, so it only needs the step from it
+        offsets = np.array([child.translate.get() for jnt, child in bones])
+        translations = steps[np.newaxis, :, np.newaxis] * offsets[:, np.newaxis, :]
+
+        result = list()
+        for (jnt, child), boneTranslations in izip(bones, translations.tolist()):
+            rotateOrder = jnt.rotateOrder.get()
+            radius = jnt.radius.get()
+
+            dupes = list()
+            parent = jnt
+            for i, translation in enumerate(boneTranslations, 1):
+                dupe = pmc.createNode('joint', name='{0}_split{1:d}'.format(jnt.shortName(), i),
+                                      parent=parent, skipSelect=True)
+                parent.scale.connect(dupe.inverseScale)
+                dupe.translate.set(translation)
+                dupe.rotateOrder.set(rotateOrder)
+                dupe.radius.set(radius)
+
+                dupes.append(dupe)
+                parent = dupe
+
+            # reparent child to last joint we made, completing the joint chain
+            pmc.parent(child, parent)
+            result.append(dupes)
+
+        return result
+
+
+def curveSamples(curve, count):
+    """
+    Returns world positions (count, 3) spaced at equal arc length from start to end of a nurbs curve
+    """
+
+    if isinstance(curve, basestring):
+        curve = pmc.PyNode(curve)
+
+    if isinstance(curve, pmc.nodetypes.Transform):
+        curve = curve.getShape()
+
+    cvs = np.array([tuple(cv) for cv in curve.getCVs(space='world')])
+    knots = npmath.mayaKnotsToFull(curve.getKnots())
+    degree = curve.degree()
+
+    params = npmath.arcLengthParams(cvs, knots, degree, count)
+    return npmath.bsplinePoints(cvs, knots, degree, params)
+
+
+def buildChain(positions, rotations, names, parent=None):
+    """
+    Creates a joint chain in one pass from world positions (N, 3) and world rotations (N, 3, 3)
+    Orientation goes into jointOrient, rotate channels are left at zero
+    """
+
+    parentMatrix = None
+    kwargs = dict()
+    if parent:
+        parent = pmc.PyNode(parent)
+        parentMatrix = np.array(parent.getMatrix(worldSpace=True))
+        kwargs['parent'] = parent
+
+    translations, orients = npmath.jointLocals(positions, rotations, parentMatrix)
+
+    joints = list()
+    for name, translation, orient in izip(names, translations.tolist(), orients.tolist()):
+        jnt = pmc.createNode('joint', name=name, skipSelect=True, **kwargs)
+        if isinstance(kwargs.get('parent'), pmc.nodetypes.Joint):
+            kwargs['parent'].scale.connect(jnt.inverseScale)
+
+        jnt.translate.set(translation)
+        jnt.jointOrient.set(orient)
+
+        joints.append(jnt)
+        kwargs['parent'] = jnt
 
-            # get first child, make sure it's a joint
-            jnt2 = jnt.getChildren(type='joint')[0]
+    return joints
 
-            # get distance between joints
-            a = jnt.getTranslation('world')
-            b = jnt2.getTranslation('world')
-            div = (b - a) / divisions
 
-            # increment through divisions and create joints
-            # insert new joints into hierarchy and freeze orientation
-            jnt.select(replace=True)
-            dupe = None
-            for i in xrange(1, divisions):
-                dupe = pmc.joint(position=a + (div * i))
-                pmc.makeIdentity(dupe, apply=True, jointOrient=True)
+def resampleChain(source, count, name=None, upVector=(0, 1, 0), upAxis=1, replace=False):
+    """
+    Builds a chain of count joints at equal arc length along a curve, x axis aiming down the chain
+    source is either a nurbs curve, or a list of joints (root first) to fit a curve through.
+    A list holding only a root joint is expanded to its chain
+    upVector is the world direction the upAxis of each joint is kept closest to
+    If replace is True and source is a joint chain, the new chain takes the old chain's place:
+    it's parented where the old root was, other children of the old joints move to the nearest new joint
+    and the old chain is deleted
+    Returns the new joints and the curve they were sampled on
+    """
 
-            if dupe:
-                jnt2.setParent(dupe)
+    if count < 2:
+        raise ValueError('Resampler :: need at least 2 joints, got {0:d}'.format(count))
+
+    oldJoints = None
+    parent = None
+    if isinstance(source, (list, tuple)):
+        oldJoints = map(pmc.nodetypes.Joint, source)
+        if len(oldJoints) == 1:
+            # a lone root stands for its chain, followed through the first child joint
+            while True:
+                children = oldJoints[-1].getChildren(type='joint')
+                if not children:
+                    break
+                oldJoints.append(children[0])
+
+        if len(oldJoints) < 2:
+            raise ValueError('Resampler :: {0} has no child joints, need a chain of at least 2 joints'.format(
+                oldJoints[0]))
+
+        basename = re.sub(r'\d+$', '', oldJoints[0].shortName())
+        if name is None:
+            name = basename
+
+        points = [jnt.getTranslation('world') for jnt in oldJoints]
+        curve = pmc.curve(degree=min(3, len(points) - 1), editPoint=points,
+                          name='spl_{0}_resample'.format(name.replace('rig_', '', 1)))
+
+        if replace:
+            parent = oldJoints[0].firstParent2()
+    else:
+        curve = pmc.PyNode(source)
+        if name is None:
+            name = 'rig_' + curve.shortName().replace('spl_', '', 1)
+
+    positions = curveSamples(curve, count)
+    rotations = npmath.aimMatrices(positions, upVector, aimAxis=0, upAxis=upAxis)
+
+    joints = buildChain(positions, rotations, ['{0}{1:d}'.format(name, i) for i in xrange(count)], parent)
+
+    if replace and oldJoints:
+        chain = set(oldJoints)
+        for jnt in oldJoints:
+            for child in jnt.getChildren(type='transform'):
+                if child in chain:
+                    continue
+
+                distances = np.linalg.norm(positions - np.array(child.getTranslation('world')), axis=1)
+                pmc.parent(child, joints[int(np.argmin(distances))])
+
+        pmc.delete(oldJoints[0])
+
+    return joints, curve
+
+
+def makeResampledSplineIk(source, count, name=None, upVector=(0, 1, 0), upAxis=1, replace=False,
+                          stretchy=True, **stretchyKwargs):
+    """
+    Resamples source with resampleChain and puts a spline IK on the new chain using the same curve.
+    If stretchy is True, stretchySplineIk is run on the handle with any extra keyword arguments
+    Returns the joints, the ik handle and the stretchy normalize node (None if not stretchy)
+    """
+
+    joints, curve = resampleChain(source, count, name, upVector, upAxis, replace)
+
+    handle = pmc.ikHandle(sj=joints[0], ee=joints[-1], sol='ikSplineSolver', createCurve=False, curve=curve,
+                          parentCurve=False, rootOnCurve=True,
+                          n='sik_{0}'.format(joints[0].shortName().replace('rig_', '', 1)))[0]
+
+    normalizeNode = None
+    if stretchy:
+        normalizeNode = stretchySplineIk(handle, **stretchyKwargs)
+
+    return joints, handle, normalizeNode
+
+
+class Resampler(object):
+    WINDOW_NAME = 'JointResamplerPyMel'
+    WINDOW_TITLE = 'Joint Resampler PyMel'
+
+    def __init__(self):
+        self._win = None
+        self._slider = None
+        self._replaceCheck = None
+        self._splineIkCheck = None
+
+    def GUI(self):
+        self._win = pmc.window(self.WINDOW_NAME, title=self.WINDOW_TITLE)
+        pmc.columnLayout(adjustableColumn=True)
+        pmc.text(label='Select a curve or a joint chain', align='center')
+        self._slider = pmc.intSliderGrp(label='Joints', field=True, min=2, max=100, value=10)
+        self._replaceCheck = pmc.checkBox(label='Replace selected chain', value=False)
+        self._splineIkCheck = pmc.checkBox(label='Stretchy Spline IK', value=False)
+        pmc.button(label='Okay', c=pmc.Callback(self._callback))
+        pmc.button(label='Cancel', c=pmc.Callback(pmc.deleteUI, self._win))
+        self._win.show()
+
+    def _callback(self):
+        selection = pmc.selected()
+        if len(selection) == 0:
+            return
+
+        source = selection[0]
+        joints = pmc.ls(selection, type='joint')
+        if joints:
+            source = joints
+
+        count = self._slider.getValue()
+        replace = self._replaceCheck.getValue()
+        if self._splineIkCheck.getValue():
+            makeResampledSplineIk(source, count, replace=replace)
+        else:
+            joints, curve = resampleChain(source, count, replace=replace)
+            if isinstance(source, list):
+                # the curve was only fit to sample the joints, nothing uses it
+                pmc.delete(curve)
 
 
 def draw():
     global MAIN_WINDOW
     MAIN_WINDOW = Splitter()
     MAIN_WINDOW.GUI()
+
+
+def drawResampler():
+    global MAIN_WINDOW
+    MAIN_WINDOW = Resampler()
+    MAIN_WINDOW.GUI()
@@ -168,13 +168,11 @@ def stretchySplineIk(ikHndl, useScale=False, stretchLimits=None, globalScaleAttr
             outputAttr.connect(uniformNode.input1X)
             uniformNode.input2X.set(endJoint.tx.get())
 
-            uniformNode.outputX.connect()
-
     for jnt in joints:
         if useScale:
             outputAttr.connect(jnt.scaleX)
         elif uniformNode:
-            outputAttr.connect(jnt.translateX)
+            uniformNode.outputX.connect(jnt.translateX)
         else:
             stretchNode = pmc.createNode('multiplyDivide', n=('mul_{0}_stretchy'.format(jnt)))
             outputAttr.connect(stretchNode.input1X)